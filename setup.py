@@ -29,6 +29,7 @@ setup(
     version=crisis_prediction.__version__,
     packages=find_packages(where='src'),
     install_requires=get_requirements(),
+    extras_require={'onnx': ['onnxruntime>=1.8.0']},
     url='https://github.com/Icedgarr/crisis_prediction.git',
     package_dir={'': 'src'},
     description=SHORT,
@@ -5,8 +5,9 @@ from crisis_prediction.features.utils import convert_camel_case_column_to_snake_
 
 
 class WellbeingAssessmentStateFeature(StateFeature):
+    windowed = True
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         first_known = str(data['patient_table']['first_year_month'].iloc[0])
         patients_first_known_date = first_known_to_date(first_known)
         if data['wellbeing_screening_table'].empty:
@@ -16,7 +17,8 @@ class WellbeingAssessmentStateFeature(StateFeature):
         wellbeing_data = data['wellbeing_screening_table'].copy() \
             .set_index(['anonymous_pat_id', 'review_period_start_date', 'review_period_end_date']).sort_index()
         wellbeing_data.columns = [self._to_correct_column_format(col) for col in wellbeing_data.columns]
-        wellbeing_features = self.state_stats_per_week(wellbeing_data, patients_first_known_date)
+        wellbeing_features = self.state_stats_per_week(wellbeing_data, patients_first_known_date,
+                                                       window_start=window_start)
         return wellbeing_features
 
     def transform_empty(self, patient_id, patients_first_known_date):
@@ -1,10 +1,14 @@
 import datetime
 from abc import ABCMeta, abstractmethod
+from numbers import Number
 
+import numpy as np
 import pandas as pd
-from isoweek import Week
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
 
 from crisis_prediction.features.exceptions import SchemaException
+from crisis_prediction.features.utils import first_known_to_date, read_only_projection, smallest_dtypes
+from crisis_prediction.features.week_calendar import get_week_calendar
 
 
 class Transformer(metaclass=ABCMeta):
@@ -16,7 +20,11 @@ class Transformer(metaclass=ABCMeta):
 
     @staticmethod
     def apply_schemata(func):
-        def new_func(self, data):
+        """Decorates transform so that it receives, for every table of self.schema, a validated read-only
+        projection of the columns of the schema instead of the whole table. Tables outside of the schema are
+        passed as they are, and so are the rest of arguments of transform.
+        """
+        def new_func(self, data, *args, **kwargs):
             schema = self.schema
             data_needed = data.copy()
             for table in schema.keys():
@@ -25,17 +33,27 @@ class Transformer(metaclass=ABCMeta):
                 elif data[table].empty:
                     data_needed[table] = data[table]
                     # raise SchemaException('{} DataFrame passed to {} was empty'.format(table, self.__class__.__name__))
-                elif any(c not in data[table].columns for c in schema[table]):
-                    missing_column = next(c for c in schema[table] if c not in data[table].columns)
-                    raise SchemaException('{} DataFrame passed to {} missing the {} column'
-                                          .format(table, self.__class__.__name__, missing_column))
                 else:
-                    data_needed[table] = data[table][[*schema[table].keys()]]
+                    self.validate_table(data[table], table, schema[table])
+                    data_needed[table] = read_only_projection(data[table], [*schema[table].keys()])
 
-            return func(self, data_needed)
+            return func(self, data_needed, *args, **kwargs)
 
         return new_func
 
+    def validate_table(self, table_data, table, table_schema):
+        """Checks that table_data has the columns of table_schema with compatible dtypes. The check only reads the
+        dtypes, so it runs on every call instead of being remembered, as preprocessors modify tables in place.
+        """
+        if any(c not in table_data.columns for c in table_schema):
+            missing_column = next(c for c in table_schema if c not in table_data.columns)
+            raise SchemaException('{} DataFrame passed to {} missing the {} column'
+                                  .format(table, self.__class__.__name__, missing_column))
+        for column, column_type in table_schema.items():
+            if column_type in (int, float, Number) and not is_numeric_dtype(table_data[column]):
+                raise SchemaException('{} DataFrame passed to {} has non numeric dtype {} in the {} column'
+                                      .format(table, self.__class__.__name__, table_data[column].dtype, column))
+
     @staticmethod
     def check_schemata(func):
         def new_func(self, data):
@@ -102,24 +120,125 @@ class Preprocessor(Transformer):
 
 
 class Feature(Transformer):
+    # Names of the features whose outputs are read from the data dict by transform
+    dependencies = []
+    # Whether transform accepts the window_start and seeds arguments of transform_incremental
+    windowed = False
+
     def __init__(self, end_date: datetime.date = None):
         super(Feature, self).__init__()
         self.end_date = self.end_date = datetime.date.today() if end_date is None else end_date
 
+    @property
+    def calendar(self):
+        return get_week_calendar(self.end_date)
+
     def create_features_empty_data(self, patient_id, patients_first_known_date, column_value_dict):
-        patients_first_known_date = patients_first_known_date.isocalendar()
-        monday_first_week = Week(patients_first_known_date[0], patients_first_known_date[1]).monday()
-        full_dates = pd.date_range(monday_first_week, self.end_date,
-                                   freq='W-MON', normalize=True, closed='left')
-        full_history = pd.DataFrame({
-            'year': [d.isocalendar()[0] for d in full_dates],
-            'week': [d.isocalendar()[1] for d in full_dates],
-            'anonymous_pat_id': [patient_id] * len(full_dates)
-        }).set_index(['anonymous_pat_id', 'year', 'week'])
+        full_history = self.create_full_history_batch(pd.Series({patient_id: patients_first_known_date}))
         for key, value in column_value_dict.items():
             full_history[key] = value
         return full_history
 
+    def create_full_history_batch(self, patients_first_known_dates, window_start=None):
+        """
+        Input:
+            patients_first_known_dates (pandas.Series): first known date
+            of each patient indexed by anonymous_pat_id.
+            window_start (int) [optional]: ordinal of the first week
+            to return -see WeekCalendar.to_ordinal-.
+        Returns:
+            full_history: empty pandas.DataFrame indexed by anonymous_pat_id,
+            year and week with one row for every week from the week of the
+            first known date of each patient -or window_start if later-
+            until end_date.
+        """
+        first_ordinals = self.calendar.to_ordinal(patients_first_known_dates.values)
+        num_weeks = self.calendar.num_weeks_to_end_date(patients_first_known_dates.values)
+        if window_start is not None:
+            num_weeks = np.maximum(num_weeks - np.maximum(window_start - first_ordinals, 0), 0)
+            first_ordinals = np.maximum(first_ordinals, window_start)
+        weeks_offset = np.arange(num_weeks.sum()) - np.repeat(np.cumsum(num_weeks) - num_weeks, num_weeks)
+        years, weeks = self.calendar.year_week(np.repeat(first_ordinals, num_weeks) + weeks_offset)
+        full_history = pd.DataFrame({
+            'year': years,
+            'week': weeks,
+            'anonymous_pat_id': np.repeat(patients_first_known_dates.index.values, num_weeks)
+        }).set_index(['anonymous_pat_id', 'year', 'week'])
+        return full_history
+
+    @property
+    def history_weeks(self):
+        """Number of previous weeks, besides the cumulative statistics, that a week of the output depends on."""
+        return 0
+
+    def transform_incremental(self, data, state=None):
+        """
+        Takes the same dictionary of dataframes of one patient as transform and the state
+        returned by the previous call, and returns the features of the weeks after the
+        last week of the state until end_date together with the new state. The output is
+        the same as the rows of those weeks in transform.
+        Windowed features only aggregate again the weeks from history_weeks weeks before
+        the first new week, passing that week as window_start to transform, and continue
+        the cumulative statistics -the time_since_last_*, *_ever and ever_* columns- from
+        the seeds of the state, taken at the week before the window. Their data must
+        contain every event or state since the window start and must not be empty if the
+        patient had older ones. The rest of features compute the full history and only
+        return the new weeks. Without state the full history is computed.
+        """
+        window_start, seeds = None, None
+        if self.windowed and state is not None:
+            first_known = str(data['patient_table']['first_year_month'].iloc[0])
+            first_week = self.calendar.to_ordinal([first_known_to_date(first_known)])[0]
+            if state['week'] + 1 - self.history_weeks > first_week:
+                window_start, seeds = state['week'] + 1 - self.history_weeks, state['seeds']
+        if self.windowed:
+            features = self.transform(data, window_start=window_start, seeds=seeds)
+        else:
+            features = self.transform(data)
+
+        last_week = self.calendar.last_week()
+        weeks = self.get_week_ordinals(features)
+        seed_week = features[weeks == last_week - self.history_weeks]
+        new_seeds = {}
+        if self.windowed and not seed_week.empty:
+            new_seeds = {column: seed_week[column].iloc[0] for column in features.columns
+                         if column.startswith(('time_since_last_', 'ever_')) or column.endswith('_ever')}
+        if state is not None:
+            features = features[weeks > state['week']]
+        return features, {'week': last_week, 'seeds': new_seeds}
+
+    def get_week_ordinals(self, data):
+        return self.calendar.from_year_week(data.index.get_level_values('year'), data.index.get_level_values('week'))
+
+    def downcast(self, output):
+        """
+        Takes the output of transform and returns it with the numeric columns of schema_out
+        stored in the smallest dtype that holds their values -see utils.smallest_dtypes-.
+        Integer columns with missing values become float32, except the time_since_last_*
+        ones, where a missing value means that there was no event yet, which become nullable
+        Int. Float columns always become float32. The rest of columns are kept as they are.
+        """
+        schema = self.schema_out
+        if not isinstance(schema, dict):
+            return output
+        columns = [column for column, values in output.items() if schema.get(column) in (int, float, Number)
+                   and is_numeric_dtype(values) and not is_bool_dtype(values)]
+        if not columns:
+            return output
+        values = output[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        dtypes = smallest_dtypes(values, integer=[schema[column] is not float for column in columns],
+                                 nullable=[column.startswith('time_since_last') for column in columns])
+        downcast = {}
+        for i, (column, dtype) in enumerate(zip(columns, dtypes)):
+            if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+                missing = np.isnan(values[:, i])
+                downcast[column] = pd.arrays.IntegerArray(np.where(missing, 0, values[:, i]).astype(dtype.numpy_dtype),
+                                                          missing)
+            else:
+                downcast[column] = values[:, i].astype(dtype)
+        return pd.DataFrame({column: downcast.get(column, output[column].values) for column in output.columns},
+                            index=output.index)
+
     @property
     @abstractmethod
     def schema_out(self):
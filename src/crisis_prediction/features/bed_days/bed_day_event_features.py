@@ -3,19 +3,29 @@ import datetime
 import numpy as np
 
 from crisis_prediction.features.event_feature import EventFeature
-from crisis_prediction.features.utils import dummitize, first_known_to_date
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import first_known_to_date
 
 
 class BedDayEventFeatures(EventFeature):
+    windowed = True
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), t_weeks_stats=[4, 8, 12, 16, 20, 24, 52],
-                 in_between_t_weeks_stats_to_keep=[4, 12]):
+                 in_between_t_weeks_stats_to_keep=[4, 12], with_t_weeks_stats: bool = False):
+        """
+        :param with_t_weeks_stats: whether to add the {col}_{i}_weeks_ago and {col}_in_last_{k}_weeks
+        columns of every column of columns_for_t_weeks_stats -about 180 columns with the default t_weeks_stats-.
+        """
         super().__init__(end_date)
         self.activity_categories = ['acute_assessment', 'medium_secure', 'rehab', 'hdu', 'picu', 'continuing_care',
                                     'other']
         self.activity_columns = ['hospitalization_activity_{}'.format(name) for name in self.activity_categories]
         self.level_of_obs_columns = ['hospitalization_level_of_obs_{}'.format(name) for name in [1, 2, 3, 4]]
+        self.activity_encoder = OneHotEncoder(self.activity_columns, 'hospitalization_activity', lower=True)
+        self.level_of_obs_encoder = OneHotEncoder(self.level_of_obs_columns, 'hospitalization_level_of_obs', lower=True)
         self.t_weeks_stats = t_weeks_stats
         self.in_between_t_weeks_stats_to_keep = in_between_t_weeks_stats_to_keep
+        self.with_t_weeks_stats = with_t_weeks_stats
         self.columns_for_t_weeks_stats = {'hospitalization_sum': 'sum',
                                           **{'hospitalization_level_of_obs_{}_sum'.format(num): 'sum' for num in
                                              range(1, 5)},
@@ -23,7 +33,11 @@ class BedDayEventFeatures(EventFeature):
                                              self.activity_categories}
                                           }
 
-    def transform(self, data):
+    @property
+    def history_weeks(self):
+        return max(self.t_weeks_stats) if self.with_t_weeks_stats else 0
+
+    def transform(self, data, window_start=None, seeds=None):
         """
         Takes a dictionary of dataframes and returns the features related to Hospitalizations indexed by patient,
         year and week.
@@ -34,22 +48,23 @@ class BedDayEventFeatures(EventFeature):
             patient_id = data['patient_table']['anonymous_pat_id'].iloc[0]
             return self.transform_empty(patient_id, patients_first_known_date)
         hospitalization_data = data['hospitalization_table']
-        hospitalization_data.set_index(['anonymous_pat_id', 'date_in_bed'], inplace=True)
+        hospitalization_data = hospitalization_data.set_index(['anonymous_pat_id', 'date_in_bed'])
         hospitalization_data['hospitalization_activity'] = hospitalization_data['activity_category'] \
             .map(data['bed_day_activity_category_code']['Category'].to_dict())
         hospitalization_data['hospitalization_level_of_obs'] = hospitalization_data['level_of_observation'] \
             .map({'LEVEL1': '1', 'LEVEL2': '2', 'LEVEL3': '3', 'LEVEL4': '4'}).fillna('1')
         hospitalization_data = self.add_activity_and_level_of_obs_category(hospitalization_data)
-        hospitalization_features = self.add_event_stat_features(hospitalization_data, patients_first_known_date)
-        hospitalization_features = self.add_time_since_last_features(hospitalization_features)
+        hospitalization_features = self.add_event_stat_features(hospitalization_data, patients_first_known_date,
+                                                                window_start)
+        hospitalization_features = self.add_time_since_last_features(hospitalization_features, seeds)
         hospitalization_features = self.add_event_ever_stat_features(hospitalization_features,
-                                                                     self.columns_for_t_weeks_stats)
-        '''hospitalization_features = self.add_event_t_weeks_stat_features(hospitalization_features,
-                                                                        self.columns_for_t_weeks_stats,
-                                                                        self.t_weeks_stats)
-        hospitalization_features = self.drop_intermediary_t_weeks_stats_columns(hospitalization_features,
-                                                                                self.columns_for_t_weeks_stats,
-                                                                                self.in_between_t_weeks_stats_to_keep)'''
+                                                                     self.columns_for_t_weeks_stats, seeds)
+        if self.with_t_weeks_stats:
+            hospitalization_features = self.add_event_t_weeks_stat_features(hospitalization_features,
+                                                                            self.columns_for_t_weeks_stats,
+                                                                            self.t_weeks_stats)
+            hospitalization_features = self.drop_intermediary_t_weeks_stats_columns(
+                hospitalization_features, self.columns_for_t_weeks_stats, self.in_between_t_weeks_stats_to_keep)
         return hospitalization_features
 
     def transform_empty(self, patient_id, patients_first_known_date):
@@ -58,13 +73,10 @@ class BedDayEventFeatures(EventFeature):
         return self.create_features_empty_data(patient_id, patients_first_known_date, column_value_dict)
 
     def add_activity_and_level_of_obs_category(self, data):
-        data[self.activity_columns] = dummitize(data['hospitalization_activity'].str.lower(),
-                                                self.activity_columns)
-        data[self.level_of_obs_columns] = dummitize(data['hospitalization_level_of_obs'].str.lower(),
-                                                    self.level_of_obs_columns)
-        return data
+        data = self.activity_encoder.transform(data['hospitalization_activity'], out=data)
+        return self.level_of_obs_encoder.transform(data['hospitalization_level_of_obs'], out=data)
 
-    def add_event_stat_features(self, data, patients_first_known_date):
+    def add_event_stat_features(self, data, patients_first_known_date, window_start=None):
         stats_dict = {
             **{'hospitalization': ['sum', 'max']},
             **{k: 'sum' for k in self.activity_columns},
@@ -73,7 +85,7 @@ class BedDayEventFeatures(EventFeature):
         hospitalization_features = self.event_stats_per_week(
             data, patients_first_known_date,
             column_prefix='hospitalization',
-            stats=stats_dict).sort_index()
+            stats=stats_dict, window_start=window_start).sort_index()
         return hospitalization_features.astype(int)
 
     def add_event_t_weeks_stat_features(self, hospitalization_features,
@@ -81,13 +93,15 @@ class BedDayEventFeatures(EventFeature):
                                         t=[4, 8, 12, 16, 20, 24, 52]):
         hospitalization_features = self.event_stats_per_t_weeks(data=hospitalization_features,
                                                                 columns_for_t_weeks_stats=columns_for_t_weeks_stats,
-                                                                t=t)
+                                                                t=t,
+                                                                lags=range(*self.in_between_t_weeks_stats_to_keep))
         return hospitalization_features
 
     def add_event_ever_stat_features(self, hospitalization_features,
-                                     columns_for_t_weeks_stats):
+                                     columns_for_t_weeks_stats, seeds=None):
         hospitalization_features = self.event_stats_ever(data=hospitalization_features,
-                                                         columns_for_t_weeks_stats=columns_for_t_weeks_stats)
+                                                         columns_for_t_weeks_stats=columns_for_t_weeks_stats,
+                                                         seeds=seeds)
         return hospitalization_features
 
     def drop_intermediary_t_weeks_stats_columns(self, hospitalization_features, columns_for_t_weeks_stats,
@@ -96,14 +110,13 @@ class BedDayEventFeatures(EventFeature):
                            i not in range(in_between_t_weeks_stats_to_keep[0], in_between_t_weeks_stats_to_keep[1])]
         intermediary_columns_to_drop = ['{}_{}_{}'.format(col, i, 'weeks_ago') for col in columns_for_t_weeks_stats for
                                         i in t_weeks_to_drop]
-        hospitalization_features.drop(columns=intermediary_columns_to_drop, inplace=True)
+        hospitalization_features.drop(columns=intermediary_columns_to_drop, inplace=True, errors='ignore')
         return hospitalization_features
 
-    def add_time_since_last_features(self, contacts_features):
-        for col in self.activity_columns + self.level_of_obs_columns + ['hospitalization']:
-            contacts_features['time_since_last_{}'.format(col)] = \
-                self.get_time_since_last_event(contacts_features['{}_sum'.format(col)].astype(bool))
-        return contacts_features
+    def add_time_since_last_features(self, contacts_features, seeds=None):
+        columns = self.activity_columns + self.level_of_obs_columns + ['hospitalization']
+        return self.add_time_since_last_events(contacts_features, ['{}_sum'.format(col) for col in columns], columns,
+                                               seeds=seeds)
 
     def _get_out_column_names(self):
         basic_cols = ['hospitalization_sum', 'hospitalization_max',
@@ -112,7 +125,16 @@ class BedDayEventFeatures(EventFeature):
                                    self.activity_columns + self.level_of_obs_columns]
         event_columns = ['{}_sum'.format(k) for k in self.activity_columns + self.level_of_obs_columns]
         ever_columns = ['{}_ever'.format(col) for col in self.columns_for_t_weeks_stats.keys()]
-        return basic_cols + time_since_last_columns + event_columns + ever_columns
+        return basic_cols + time_since_last_columns + event_columns + ever_columns + self._get_t_weeks_column_names()
+
+    def _get_t_weeks_column_names(self):
+        if not self.with_t_weeks_stats:
+            return []
+        return ['{}_{}_{}'.format(col, i, 'weeks_ago') for i in
+                range(self.in_between_t_weeks_stats_to_keep[0], self.in_between_t_weeks_stats_to_keep[1])
+                for col in self.columns_for_t_weeks_stats.keys()
+                ] + ['{}_in_last_{}_{}'.format(col, k, 'weeks') for k in self.t_weeks_stats for col
+                     in self.columns_for_t_weeks_stats.keys()]
 
     @property
     def schema_out(self):
@@ -124,4 +146,5 @@ class BedDayEventFeatures(EventFeature):
         schema_events = {'{}_sum'.format(k): int for k in self.activity_columns + self.level_of_obs_columns}
         schema_time_since_last_cols = {k: int for k in time_since_last_columns}
         schema_ever = {'{}_ever'.format(col): int for col in self.columns_for_t_weeks_stats.keys()}
-        return {**schema_basic, **schema_events, **schema_time_since_last_cols, **schema_ever}
+        schema_t_weeks = {k: int for k in self._get_t_weeks_column_names()}
+        return {**schema_basic, **schema_events, **schema_time_since_last_cols, **schema_ever, **schema_t_weeks}
@@ -2,50 +2,69 @@ import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.base import Feature
-from crisis_prediction.features.utils import dummitize
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
 
 
 class BedDayPeriod(Feature):
     level_of_obs_columns = ['level_of_obs_1', 'level_of_obs_2', 'level_of_obs_3', 'level_of_obs_4']
+    level_of_obs_encoder = OneHotEncoder(level_of_obs_columns, 'level_of_obs')
 
     def transform(self, data):
+        """
+        Takes a dictionary of dataframes with the hospitalization_table of one or several patients and returns the
+        features of every bed day period -the bed days from an admission to the next one of the same patient-
+        indexed by patient and first and last bed day of the period. The bed days of all the patients are sorted
+        once and every period is aggregated with numpy reductions between the admissions. The bed days without
+        date_in_bed are left out.
+        """
         if data['hospitalization_table'].empty:
             return pd.DataFrame()
-        bed_days_data = data['hospitalization_table'].copy().sort_values(['anonymous_pat_id', 'date_in_bed'])
-        bed_days_data.rename(columns={'level_of_observation': 'level_of_obs',
-                                      'date_leave': 'leave_day',
-                                      'date_in_bed': 'bed_day'}, inplace=True)
-        bed_days_data['level_of_obs'] = bed_days_data['level_of_obs'] \
+        bed_days_data = data['hospitalization_table'].assign(
+            date_in_bed=lambda table: pd.to_datetime(table['date_in_bed']))
+        bed_days_data = bed_days_data[bed_days_data['date_in_bed'].notna()]
+        bed_days_data = bed_days_data.iloc[np.lexsort((bed_days_data['date_in_bed'].to_numpy(),
+                                                       bed_days_data['anonymous_pat_id'].to_numpy()))]
+        bed_days_data = bed_days_data[self.compute_number_of_admissions(bed_days_data) > 0]
+        period_starts = np.flatnonzero(bed_days_data['date_admission'].to_numpy() == 1)
+        return self.compute_bed_day_features(bed_days_data, period_starts)
+
+    def compute_bed_day_features(self, bed_days_data, period_starts):
+        level_of_obs = bed_days_data['level_of_observation'] \
             .map({'LEVEL1': 1, 'LEVEL2': 2, 'LEVEL3': 3, 'LEVEL4': 4}).fillna(1).astype(int)
-        bed_days_data[self.level_of_obs_columns] = dummitize(bed_days_data['level_of_obs'], self.level_of_obs_columns)
-        bed_days_data['bed_day_period_number'] = self.compute_bed_day_period_number(bed_days_data['date_admission'])
-        bed_days_features = self.compute_bed_day_features(bed_days_data).reset_index() \
-            .drop(columns='bed_day_period_number')
-
-        return bed_days_features.set_index(['anonymous_pat_id', 'start_bed_day_period', 'end_bed_day_period'])
-
-    def compute_bed_day_features(self, bed_days_data):
-        bed_days_features = bed_days_data.groupby(['anonymous_pat_id', 'bed_day_period_number']).agg({
-            **{col: ['max', 'sum'] for col in self.level_of_obs_columns},
-            **{'level_of_obs': 'max',
-               'leave_day': 'sum',
-               'bed_day': ['count', 'max', 'min']}
-        })
-        bed_days_features.columns = bed_days_features.columns.map('_'.join)
-        bed_days_features.rename(columns={
-            **{'level_of_obs_{}_max'.format(num): 'level_of_obs_{}'.format(num) for num in range(1, 5)},
-            **{'level_of_obs_{}_sum'.format(num): 'level_of_obs_{}_number_of_days'.format(num) for num in range(1, 5)},
-            **{'bed_day_count': 'number_of_bed_days', 'leave_day_sum': 'number_of_leave_days',
-               'bed_day_min': 'start_bed_day_period', 'bed_day_max': 'end_bed_day_period'}
-        }, inplace=True)
-        return bed_days_features
+        level_of_obs_matrix = self.level_of_obs_encoder.encode(level_of_obs)
+        level_of_obs_max = np.maximum.reduceat(level_of_obs_matrix, period_starts, axis=0)
+        level_of_obs_number_of_days = np.add.reduceat(level_of_obs_matrix, period_starts, axis=0, dtype=np.int64)
+        bed_days_features = {}
+        for num, column in enumerate(self.level_of_obs_columns):
+            bed_days_features[column] = level_of_obs_max[:, num]
+            bed_days_features['{}_number_of_days'.format(column)] = level_of_obs_number_of_days[:, num]
+        bed_days_features['level_of_obs_max'] = np.maximum.reduceat(level_of_obs.to_numpy(), period_starts)
+        bed_days_features['number_of_leave_days'] = np.add.reduceat(
+            bed_days_data['date_leave'].fillna(0).to_numpy(), period_starts)
+
+        period_ends = np.append(period_starts[1:], len(bed_days_data))
+        bed_days_features['number_of_bed_days'] = period_ends - period_starts
+        bed_days = bed_days_data['date_in_bed']
+        index = pd.MultiIndex.from_arrays([
+            bed_days_data['anonymous_pat_id'].array[period_starts], bed_days.array[period_starts],
+            bed_days.array[period_ends - 1]
+        ], names=['anonymous_pat_id', 'start_bed_day_period', 'end_bed_day_period'])
+        return pd.DataFrame(bed_days_features, index=index)
 
     @staticmethod
-    def compute_bed_day_period_number(admit_data):
-        admit_days = admit_data[admit_data == 1]
-        bed_day_period_number = admit_data.map({0: np.nan})
-        bed_day_period_number[admit_days.index] = range(1, len(admit_days) + 1)
-        return bed_day_period_number.ffill()
+    def compute_number_of_admissions(bed_days_data):
+        """
+        Takes the bed days ordered by patient and bed day and returns for every bed day the number of admissions
+        of its patient until it, so that the bed days before the first admission of every patient can be dropped.
+        """
+        rows = np.arange(len(bed_days_data))
+        patients = bed_days_data['anonymous_pat_id'].to_numpy()
+        new_patient = np.ones(len(bed_days_data), dtype=bool)
+        new_patient[1:] = patients[1:] != patients[:-1]
+        first_rows = np.maximum.accumulate(np.where(new_patient, rows, 0))
+        admissions = bed_days_data['date_admission'].to_numpy() == 1
+        number_of_admissions = np.cumsum(admissions)
+        return number_of_admissions - number_of_admissions[first_rows] + admissions[first_rows]
 
     @property
     def schema_out(self):
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from crisis_prediction.features.base import Preprocessor
+
+
+class CategoricalPreprocessor(Preprocessor):
+    """Converts the code columns of the raw event tables that are encoded directly by the
+    features to pandas categoricals, so that the mappings and dummy encodings done downstream
+    work on the integer codes of a small vocabulary instead of on Python strings. The
+    vocabulary of a column is the index of its lookup table followed by the values of the
+    column missing from it -or only the values of the column if it has no lookup table-, so
+    no value is lost. It is meant to run first, once for the whole cohort before
+    Pipeline.transform_cohort splits it. The code columns that are mapped to a category
+    before being encoded -contact_event_code, contact_service_code, discharge_category and
+    source_category- are categoricals of the categories of their lookup table built by
+    ContactPreprocessor and ReferralPreprocessor, so their raw columns are left as they are.
+    """
+    # Lookup table whose index gives the vocabulary of every code column (None when there is no lookup table)
+    vocabularies = {
+        'contacts_table': {'attendance': None},
+        'crisis_table': {'crisis_contact_allocation': 'crisis_severity', 'crisis_type': None},
+    }
+
+    def transform(self, data):
+        data = data.copy()
+        for table, columns in self.vocabularies.items():
+            if table not in data:
+                continue
+            table_data = data[table].copy()
+            for column, lookup_table in columns.items():
+                if column in table_data.columns:
+                    lookup = data[lookup_table].index if lookup_table in data else []
+                    table_data[column] = self.to_categorical(table_data[column], lookup)
+            data[table] = table_data
+        return data
+
+    @staticmethod
+    def to_categorical(values, lookup):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        categories = pd.Index(lookup).dropna().unique()
+        missing = pd.Index(values.dropna().unique()).difference(categories)
+        return values.astype(pd.CategoricalDtype(categories.append(missing)))
@@ -3,21 +3,25 @@ import datetime
 import numpy as np
 
 from crisis_prediction.features.event_feature import EventFeature
-from crisis_prediction.features.utils import dummitize, first_known_to_date
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import first_known_to_date, map_values
 
 
 class ContactEventFeatures(EventFeature):
+    windowed = True
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), t_weeks_stats=[4, 8, 12, 16, 20, 24],
                  in_between_t_weeks_stats_to_keep=[4, 12]):
         super().__init__(end_date)
         self.event_code_categories = ['fso', 'gro', 'ts', 'carer', 'rev', 'other']
         self.event_code_columns = ['contact_event_code_{}'.format(name) for name in self.event_code_categories]
+        self.event_code_encoder = OneHotEncoder(self.event_code_columns, 'contact_event_code', lower=True)
         self.t_weeks_stats = t_weeks_stats
         self.in_between_t_weeks_stats_to_keep = in_between_t_weeks_stats_to_keep
         self.columns_for_t_weeks_stats = {'contacts_sum': 'sum', 'contact_unplanned_sum': 'sum',
                                           'contact_dna_sum': 'sum'}
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         """
         Takes a dictionary of dataframes and returns the features related to Contacts indexed by patient,
         year and week.
@@ -28,13 +32,14 @@ class ContactEventFeatures(EventFeature):
         if contacts_data.empty:
             patient_id = data['patient_table']['anonymous_pat_id'].iloc[0]
             return self.transform_empty(patient_id, patients_first_known_date)
-        contacts_data.set_index(['anonymous_pat_id', 'contacts_datetime'], inplace=True)
-        contacts_data['contact_dna'] = contacts_data['attendance'].map({
+        contacts_data = contacts_data.set_index(['anonymous_pat_id', 'contacts_datetime'])
+        contacts_data['contact_dna'] = map_values(contacts_data['attendance'], {
             'Did not attend (DNA) or not in': 1}).fillna(0)
-        contacts_data['contact_unplanned'] = contacts_data['contact_service_code'].map({'Unplanned': 1, 'Planned': 0})
+        contacts_data['contact_unplanned'] = map_values(contacts_data['contact_service_code'],
+                                                        {'Unplanned': 1, 'Planned': 0})
         contacts_data = self.add_event_code_category(contacts_data)
-        contacts_features = self.add_event_stat_features(contacts_data, patients_first_known_date)
-        contacts_features = self.add_time_since_last_features(contacts_features)
+        contacts_features = self.add_event_stat_features(contacts_data, patients_first_known_date, window_start)
+        contacts_features = self.add_time_since_last_features(contacts_features, seeds)
         contacts_features['contact_within_last_4_weeks'] = (
                 contacts_features['time_since_last_contacts_max'] <= 4).astype(
             int)
@@ -49,7 +54,7 @@ class ContactEventFeatures(EventFeature):
         ).astype(int)
         contacts_features = self.add_event_t_weeks_stat_features(contacts_features, self.columns_for_t_weeks_stats,
                                                                  self.t_weeks_stats)
-        contacts_features = self.add_event_ever_stat_features(contacts_features, self.columns_for_t_weeks_stats)
+        contacts_features = self.add_event_ever_stat_features(contacts_features, self.columns_for_t_weeks_stats, seeds)
         contacts_features = self.drop_intermediary_t_weeks_stats_columns(contacts_features,
                                                                          self.columns_for_t_weeks_stats,
                                                                          self.in_between_t_weeks_stats_to_keep)
@@ -65,11 +70,9 @@ class ContactEventFeatures(EventFeature):
         return self.create_features_empty_data(patient_id, patients_first_known_date, column_value_dict)
 
     def add_event_code_category(self, contacts_data):
-        contacts_data[self.event_code_columns] = dummitize(contacts_data['contact_event_code'].str.lower(),
-                                                           self.event_code_columns)
-        return contacts_data
+        return self.event_code_encoder.transform(contacts_data['contact_event_code'], out=contacts_data)
 
-    def add_event_stat_features(self, contacts_data, patients_first_known_date):
+    def add_event_stat_features(self, contacts_data, patients_first_known_date, window_start=None):
         stats_dict = {
             **{'contacts': ['sum', 'min', 'max'],
                'contact_unplanned': ['sum', 'max'],
@@ -79,7 +82,7 @@ class ContactEventFeatures(EventFeature):
         contacts_features = self.event_stats_per_week(
             contacts_data, patients_first_known_date,
             column_prefix='contacts',
-            stats=stats_dict).sort_index()
+            stats=stats_dict, window_start=window_start).sort_index()
         contacts_features.rename(columns={
             **{'{}_max'.format(k): k for k in self.event_code_columns}}, inplace=True)
         return contacts_features.astype(int)
@@ -88,13 +91,14 @@ class ContactEventFeatures(EventFeature):
                                         columns_for_t_weeks_stats,
                                         t=[4, 8, 12, 16, 20, 24]):
         contacts_features = self.event_stats_per_t_weeks(data=contacts_features,
-                                                         columns_for_t_weeks_stats=columns_for_t_weeks_stats, t=t)
+                                                         columns_for_t_weeks_stats=columns_for_t_weeks_stats, t=t,
+                                                         lags=range(*self.in_between_t_weeks_stats_to_keep))
         return contacts_features
 
     def add_event_ever_stat_features(self, contacts_features,
-                                     columns_for_t_weeks_stats):
+                                     columns_for_t_weeks_stats, seeds=None):
         contacts_features = self.event_stats_ever(data=contacts_features,
-                                                  columns_for_t_weeks_stats=columns_for_t_weeks_stats)
+                                                  columns_for_t_weeks_stats=columns_for_t_weeks_stats, seeds=seeds)
         return contacts_features
 
     def drop_intermediary_t_weeks_stats_columns(self, contacts_features, columns_for_t_weeks_stats,
@@ -103,14 +107,13 @@ class ContactEventFeatures(EventFeature):
                            i not in range(in_between_t_weeks_stats_to_keep[0], in_between_t_weeks_stats_to_keep[1])]
         intermediary_columns_to_drop = ['{}_{}_{}'.format(col, i, 'weeks_ago') for col in columns_for_t_weeks_stats for
                                         i in t_weeks_to_drop]
-        contacts_features.drop(columns=intermediary_columns_to_drop, inplace=True)
+        contacts_features.drop(columns=intermediary_columns_to_drop, inplace=True, errors='ignore')
         return contacts_features
 
-    def add_time_since_last_features(self, contacts_features):
-        for col in self.event_code_columns + ['contacts_max', 'contact_unplanned_max', 'contact_dna_max']:
-            contacts_features['time_since_last_{}'.format(col)] = \
-                self.get_time_since_last_event(contacts_features[col].astype(bool))
-        return contacts_features
+    def add_time_since_last_features(self, contacts_features, seeds=None):
+        return self.add_time_since_last_events(
+            contacts_features, self.event_code_columns + ['contacts_max', 'contact_unplanned_max', 'contact_dna_max'],
+            seeds=seeds)
 
     def _get_out_column_names(self):
         basic_cols = ['contacts_sum', 'contacts_min', 'contacts_max',
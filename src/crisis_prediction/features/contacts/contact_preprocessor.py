@@ -1,6 +1,7 @@
 import pandas as pd
 
 from crisis_prediction.features.base import Preprocessor
+from crisis_prediction.features.utils import map_to_categorical
 
 
 class ContactPreprocessor(Preprocessor):
@@ -13,12 +14,15 @@ class ContactPreprocessor(Preprocessor):
         return data
 
     def create_mapping(self, data):
+        """The code categories are categoricals whose vocabulary is the Category column of their lookup table."""
         contacts_data = data['contacts_table']
-        contacts_data['contact_event_code'] = contacts_data['event_code'] \
-            .map(data['contact_eventformat_code']['Category'].to_dict())
+        event_code_categories = data['contact_eventformat_code']['Category']
+        contacts_data['contact_event_code'] = map_to_categorical(
+            contacts_data['event_code'], event_code_categories.to_dict(), event_code_categories)
 
-        contacts_data['contact_service_code'] = contacts_data['service'] \
-            .map(data['service_code']['Category'].to_dict())
+        service_code_categories = data['service_code']['Category']
+        contacts_data['contact_service_code'] = map_to_categorical(
+            contacts_data['service'], service_code_categories.to_dict(), service_code_categories)
         return contacts_data
 
     def filter_cancelled_appointments(self, data):
@@ -3,10 +3,13 @@ import datetime
 import numpy as np
 
 from crisis_prediction.features.event_feature import EventFeature
-from crisis_prediction.features.utils import dummitize, convert_camel_case_column_to_snake_case, first_known_to_date
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import convert_camel_case_column_to_snake_case, first_known_to_date, map_values
 
 
 class CrisisEventFeatures(EventFeature):
+    windowed = True
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), t_weeks_stats=[4, 8, 12, 16, 20, 24],
                  in_between_t_weeks_stats_to_keep=[4, 12]):
         super().__init__(end_date)
@@ -15,11 +18,13 @@ class CrisisEventFeatures(EventFeature):
                                 'BM_PDU_Day', 'BM_PoS_Day', 'OOA', 'RNC']
         self.contact_columns = ['crisis_contact_allocation_{}'.format(c) for c in self.contact_methods]
         self.type_columns = ['crisis_type_{}'.format(c) for c in self.type_codes]
+        self.contact_encoder = OneHotEncoder(self.contact_columns, 'crisis_contact_allocation')
+        self.type_encoder = OneHotEncoder(self.type_columns, 'crisis_type')
         self.t_weeks_stats = t_weeks_stats
         self.in_between_t_weeks_stats_to_keep = in_between_t_weeks_stats_to_keep
         self.columns_for_t_weeks_stats = {'crisis_sum': 'sum', 'severity_max': 'max'}
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         """This function takes a dictionary of dataframes
         with the table names as keys and returns features
         for crisis.
@@ -32,13 +37,13 @@ class CrisisEventFeatures(EventFeature):
         crisis_data = data['crisis_table'].set_index(['anonymous_pat_id', 'event_date'])
         crisis_data = self.add_dummy_columns(crisis_data)
         crisis_data['severity'] = self.get_crisis_severity(crisis_data, data['crisis_severity'])
-        crisis_features = self.add_event_stat_features(crisis_data, patients_first_known_date)
+        crisis_features = self.add_event_stat_features(crisis_data, patients_first_known_date, window_start)
         crisis_features['time_since_last_crisis'] = self.get_time_since_last_event(
-            crisis_features['crisis_max'].astype(bool))
+            crisis_features['crisis_max'].astype(bool), seed=(seeds or {}).get('time_since_last_crisis'))
         crisis_features.columns = [convert_camel_case_column_to_snake_case(col) for col in crisis_features.columns]
         crisis_features = self.add_event_t_weeks_stat_features(crisis_features, self.columns_for_t_weeks_stats,
                                                                self.t_weeks_stats)
-        crisis_features = self.add_event_ever_stat_features(crisis_features, self.columns_for_t_weeks_stats)
+        crisis_features = self.add_event_ever_stat_features(crisis_features, self.columns_for_t_weeks_stats, seeds)
         crisis_features = self.drop_intermediary_t_weeks_stats_columns(crisis_features, self.columns_for_t_weeks_stats,
                                                                        self.in_between_t_weeks_stats_to_keep)
         crisis_features['crisis_within_last_4_weeks'] = (crisis_features['time_since_last_crisis'] <= 4).astype(int)
@@ -52,16 +57,13 @@ class CrisisEventFeatures(EventFeature):
 
     @staticmethod
     def get_crisis_severity(crisis_data, crisis_severity):
-        return crisis_data['crisis_contact_allocation'].map(crisis_severity['Severity'].to_dict())
+        return map_values(crisis_data['crisis_contact_allocation'], crisis_severity['Severity'].to_dict())
 
     def add_dummy_columns(self, crisis_data):
-        crisis_data[self.type_columns] = dummitize(
-            crisis_data['crisis_type'], self.type_columns)
-        crisis_data[self.contact_columns] = dummitize(
-            crisis_data['crisis_contact_allocation'], self.contact_columns)
-        return crisis_data
+        crisis_data = self.type_encoder.transform(crisis_data['crisis_type'], out=crisis_data)
+        return self.contact_encoder.transform(crisis_data['crisis_contact_allocation'], out=crisis_data)
 
-    def add_event_stat_features(self, crisis_data, patients_first_known_date):
+    def add_event_stat_features(self, crisis_data, patients_first_known_date, window_start=None):
         stats_dict = {
             **{'crisis': ['sum', 'min', 'max'],
                'severity': 'max'},
@@ -70,17 +72,18 @@ class CrisisEventFeatures(EventFeature):
         crisis_features = self.event_stats_per_week(
             crisis_data, patients_first_known_date,
             column_prefix='crisis',
-            stats=stats_dict).sort_index()
+            stats=stats_dict, window_start=window_start).sort_index()
         return crisis_features
 
     def add_event_t_weeks_stat_features(self, crisis_features, columns_for_t_weeks_stats, t=[4, 8, 12, 16, 20, 24]):
         crisis_features = self.event_stats_per_t_weeks(data=crisis_features,
-                                                       columns_for_t_weeks_stats=columns_for_t_weeks_stats, t=t)
+                                                       columns_for_t_weeks_stats=columns_for_t_weeks_stats, t=t,
+                                                       lags=range(*self.in_between_t_weeks_stats_to_keep))
         return crisis_features
 
-    def add_event_ever_stat_features(self, crisis_features, columns_for_t_weeks_stats):
+    def add_event_ever_stat_features(self, crisis_features, columns_for_t_weeks_stats, seeds=None):
         crisis_features = self.event_stats_ever(data=crisis_features,
-                                                columns_for_t_weeks_stats=columns_for_t_weeks_stats)
+                                                columns_for_t_weeks_stats=columns_for_t_weeks_stats, seeds=seeds)
         return crisis_features
 
     def drop_intermediary_t_weeks_stats_columns(self, crisis_features, columns_for_t_weeks_stats,
@@ -89,7 +92,7 @@ class CrisisEventFeatures(EventFeature):
                            i not in range(in_between_t_weeks_stats_to_keep[0], in_between_t_weeks_stats_to_keep[1])]
         intermediary_columns_to_drop = ['{}_{}_{}'.format(col, i, 'weeks_ago') for col in
                                         columns_for_t_weeks_stats.keys() for i in t_weeks_to_drop]
-        crisis_features.drop(columns=intermediary_columns_to_drop, inplace=True)
+        crisis_features.drop(columns=intermediary_columns_to_drop, inplace=True, errors='ignore')
         return crisis_features
 
     def _get_out_column_names(self):
@@ -1,30 +1,65 @@
 import datetime
 
+import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.event_feature import EventFeature
 
 
 class CrisisInNWeeksFeature(EventFeature):
+    dependencies = ['InCrisisPeriod']
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), n=4):
+        """
+        :param n: number of weeks to look ahead for a crisis burst, or a list of them to build the labels of
+        several horizons at once
+        """
         super().__init__(end_date)
         self.n = n
 
+    @property
+    def horizons(self):
+        return list(self.n) if isinstance(self.n, (list, tuple)) else [self.n]
+
     def transform(self, data):
         """This function takes a dictionary of dataframes
         with the table names as keys and returns features
         for crisis.
         """
         crisis_data = data['InCrisisPeriod'].sort_index()['crisis_burst_1week']
-        crisis_features = self.crisis_in_n_weeks(crisis_data).rename('crisis_in_{}_weeks'.format(self.n))
-        return pd.DataFrame(crisis_features).fillna(0)
+        return self.crisis_in_n_weeks(crisis_data).fillna(0).astype(np.int8)
 
     def crisis_in_n_weeks(self, crisis_data):
-        return pd.concat([crisis_data.shift(-i) for i in range(1, self.n + 1)], axis=1).max(axis=1, skipna=False)
+        """
+        Takes the crisis bursts of one or several patients ordered by patient and week and returns
+        the crisis_in_{n}_weeks column of every horizon: the maximum of the next n weeks of the
+        patient, NaN when some of them are missing or beyond the last week of the patient. All the
+        horizons are computed at once from the next burst row after every week.
+        """
+        values = crisis_data.to_numpy(dtype=float)
+        rows = np.arange(len(values))
+        patients = crisis_data.index.get_level_values(0)
+        last_week = np.ones(len(values), dtype=bool)
+        last_week[:-1] = patients[1:] != patients[:-1]
+        last_rows = self.next_row(last_week, after=False)
+        next_burst_rows = self.next_row(values != 0)
+        next_missing_rows = self.next_row(np.isnan(values))
+        labels = {}
+        for n in self.horizons:
+            window_end = rows + n
+            label = (next_burst_rows <= window_end).astype(float)
+            label[(window_end > last_rows) | (next_missing_rows <= window_end)] = np.nan
+            labels['crisis_in_{}_weeks'.format(n)] = label
+        return pd.DataFrame(labels, index=crisis_data.index)
+
+    @staticmethod
+    def next_row(mask, after=True):
+        """Takes a boolean array and returns for every row the first row -after it, or from it if after is
+        False- where mask is True, len(mask) if there is none."""
+        next_rows = np.minimum.accumulate(np.where(mask, np.arange(len(mask)), len(mask))[::-1])[::-1]
+        return np.append(next_rows[1:], len(mask)) if after else next_rows
 
     @property
     def schema_out(self):
-        schema = {
-            'crisis_in_{}_weeks'.format(self.n): float,
-        }
+        schema = {'crisis_in_{}_weeks'.format(n): int for n in self.horizons}
         return schema
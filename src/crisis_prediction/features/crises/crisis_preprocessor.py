@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.base import Preprocessor
@@ -12,7 +13,13 @@ class CrisisPreprocessor(Preprocessor):
 
     @staticmethod
     def add_date_columns(data):
+        """
+        Adds the ISO year and week of event_date, the same convention as the index of the weekly features, so a
+        crisis at the end of December joins the week it is counted in. They are floats if some date is missing.
+        """
         data['event_date'] = pd.to_datetime(data['event_date'])
-        data['year'] = data['event_date'].dt.year
-        data['week'] = data['event_date'].dt.week
+        iso_calendar = data['event_date'].dt.isocalendar()
+        dtype = np.float64 if iso_calendar.isna().values.any() else np.int64
+        data['year'] = iso_calendar['year'].astype(dtype)
+        data['week'] = iso_calendar['week'].astype(dtype)
         return data
@@ -1,67 +1,116 @@
 import datetime
 
+import numpy as np
+import pandas as pd
+
 from crisis_prediction.features.base import Feature
 
 
 class InCrisisPeriod(Feature):
+    dependencies = ['CrisisEventFeatures']
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), weeks_before_new_burst=1):
         """
         :param weeks_before_new_burst: number of weeks to pass without a crisis to consider that the patient is not in
-        the crisis period anymore. It has to be an integer
+        the crisis period anymore. It has to be an integer, or a list of integers to compute the columns of several
+        definitions of crisis period at once
         """
         super().__init__(end_date)
         self.weeks_before_new_burst = weeks_before_new_burst
 
+    @property
+    def weeks_before_new_bursts(self):
+        if isinstance(self.weeks_before_new_burst, (list, tuple)):
+            return list(self.weeks_before_new_burst)
+        return [self.weeks_before_new_burst]
+
     def transform(self, data):
         """
-        :param data: Dictionary of dataframes that contains the key 'CrisisEvents' that has as value a dataframe
-        with at least the next columns:
-        ['anonymous_pat_id' (int), 'event_date' (object)]
-        :return:
+        :param data: Dictionary of dataframes that contains the key 'CrisisEventFeatures' with the weekly crisis
+        features of one or several patients -the weeks of every patient in consecutive rows ordered by week- with at
+        least the columns ['crisis_max', 'time_since_last_crisis']
+        :return: the crisis period columns of every weeks_before_new_burst, with the same index
         """
-        crisis_event_features = data['CrisisEventFeatures'].copy()
-        crisis_event_features = self.add_crisis_burst(crisis_event_features)
-        crisis_event_features = self.add_in_crisis_period(crisis_event_features)
-
-        columns_to_return = ['crisis_burst_{}week'.format(self.weeks_before_new_burst),
-                             'number_crisis_burst_{}week'.format(self.weeks_before_new_burst),
-                             'in_crisis_period_burst_{}week'.format(self.weeks_before_new_burst),
-                             'number_crises_burst_{}week_passed'.format(self.weeks_before_new_burst)]
-        return crisis_event_features[columns_to_return].astype(int)
+        return self.get_crisis_periods(data['CrisisEventFeatures']).astype(int)
 
-    def add_crisis_burst(self, data):
-        data['crisis_burst_{}week'.format(self.weeks_before_new_burst)] = 0
-        data.loc[(data['crisis_max'] == 1) &
-                 ((data['time_since_last_crisis'].shift(1) >= self.weeks_before_new_burst) |
-                  (data['time_since_last_crisis'].shift(1).isnull())),
-                 'crisis_burst_{}week'.format(self.weeks_before_new_burst)] = 1
-        return data
+    def transform_incremental(self, data, state=None):
+        """
+        Takes the same dictionary of dataframes as transform, where 'CrisisEventFeatures' only needs the weeks
+        after the last week of the state, and the state returned by the previous call. Returns the features of
+        those weeks, continuing the burst numbering from the state, together with the new state. Without state
+        the full history is computed.
+        """
+        crisis_event_features = data['CrisisEventFeatures'].sort_index()
+        weeks = self.get_week_ordinals(crisis_event_features)
+        if state is not None:
+            crisis_event_features = pd.concat([state['last_week'], crisis_event_features[weeks > state['week']]])
+        crisis_periods = self.get_crisis_periods(crisis_event_features, state)
+        if state is not None:
+            crisis_event_features, crisis_periods = crisis_event_features.iloc[1:], crisis_periods.iloc[1:]
 
-    def add_in_crisis_period(self, data):
-        bursts = data.loc[data['crisis_burst_{}week'.format(self.weeks_before_new_burst)] == 1]
+        at_last_week = self.get_week_ordinals(crisis_event_features) == self.calendar.last_week()
+        new_state = {
+            'week': self.calendar.last_week(),
+            'last_week': crisis_event_features.loc[at_last_week, ['crisis_max', 'time_since_last_crisis']],
+            'number_crisis_burst': crisis_periods.loc[at_last_week, [
+                'number_crisis_burst_{}week'.format(n) for n in self.weeks_before_new_bursts]],
+            'number_crises_burst_passed': crisis_periods.loc[at_last_week, [
+                'number_crises_burst_{}week_passed'.format(n) for n in self.weeks_before_new_bursts]]
+        }
+        return crisis_periods.astype(int), new_state
 
-        data.loc[data['crisis_burst_{}week'.format(self.weeks_before_new_burst)] == 1,
-                 'number_crisis_burst_{}week'.format(self.weeks_before_new_burst)] = range(1, len(bursts) + 1)
+    def get_crisis_periods(self, data, state=None):
+        """
+        Takes the weekly crisis features -the weeks of every patient in consecutive rows ordered by week- and
+        returns for every weeks_before_new_burst N:
+            crisis_burst_Nweek: 1 on the crisis weeks after at least N weeks without crises.
+            number_crisis_burst_Nweek: number of the burst the week belongs to, 0 from N weeks after its last crisis.
+            in_crisis_period_burst_Nweek: 1 on the weeks of a burst.
+            number_crises_burst_Nweek_passed: number of bursts started until the week.
+        All the patients and values of N are computed at once, restarting the shifts, cumulative sums and forward
+        fills at the first week of every patient. With the state of an incremental run -of a single patient- the
+        first row of data is the last week of the state and the burst numbering continues from it.
+        """
+        rows = np.arange(len(data))
+        patients = data.index.get_level_values(0)
+        new_patient = np.ones(len(data), dtype=bool)
+        new_patient[1:] = patients[1:] != patients[:-1]
+        first_rows = np.maximum.accumulate(np.where(new_patient, rows, 0))
+        crisis = data['crisis_max'].to_numpy() == 1
+        time_since_last = data['time_since_last_crisis'].to_numpy(dtype=float)
+        previous_time_since_last = np.roll(time_since_last, 1)
+        previous_time_since_last[new_patient] = np.nan
 
-        data.loc[(data['time_since_last_crisis'] == self.weeks_before_new_burst) |
-                 (data['time_since_last_crisis'].isnull()),
-                 'number_crisis_burst_{}week'.format(self.weeks_before_new_burst)] = 0.
+        crisis_periods = {}
+        for n in self.weeks_before_new_bursts:
+            burst = crisis & ((previous_time_since_last >= n) | np.isnan(previous_time_since_last))
+            bursts_passed = 0
+            if state is not None:
+                burst[0] = False
+                bursts_passed = state['number_crises_burst_passed']['number_crises_burst_{}week_passed'.format(n)] \
+                    .iloc[0]
+            bursts = np.cumsum(burst)
+            bursts = bursts - (bursts[first_rows] - burst[first_rows]) + bursts_passed
 
-        data['number_crisis_burst_{}week'.format(self.weeks_before_new_burst)].ffill(inplace=True)
+            number_burst = np.where(burst, bursts, np.nan)
+            number_burst[(time_since_last == n) | np.isnan(time_since_last)] = 0.
+            if state is not None:
+                number_burst[0] = state['number_crisis_burst']['number_crisis_burst_{}week'.format(n)].iloc[0]
+            last_numbered = np.maximum.accumulate(np.where(np.isnan(number_burst), -1, rows))
+            number_burst = np.where(last_numbered >= first_rows, number_burst[last_numbered], np.nan)
 
-        data['in_crisis_period_burst_{}week'.format(self.weeks_before_new_burst)] = 1.
+            crisis_periods['crisis_burst_{}week'.format(n)] = burst.astype(float)
+            crisis_periods['number_crisis_burst_{}week'.format(n)] = number_burst
+            crisis_periods['in_crisis_period_burst_{}week'.format(n)] = np.where(number_burst == 0, 0., 1.)
+            crisis_periods['number_crises_burst_{}week_passed'.format(n)] = bursts.astype(float)
+        return pd.DataFrame(crisis_periods, index=data.index)
 
-        data.loc[data['number_crisis_burst_{}week'.format(self.weeks_before_new_burst)] == 0,
-                 'in_crisis_period_burst_{}week'.format(self.weeks_before_new_burst)] = 0.
-        data['number_crises_burst_{}week_passed'.format(self.weeks_before_new_burst)] = data[
-            'crisis_burst_{}week'.format(self.weeks_before_new_burst)].cumsum()
-        return data
+    def _get_out_column_names(self):
+        return [column.format(n) for n in self.weeks_before_new_bursts
+                for column in ['crisis_burst_{}week', 'number_crisis_burst_{}week', 'in_crisis_period_burst_{}week',
+                               'number_crises_burst_{}week_passed']]
 
     @property
     def schema_out(self):
-        columns_to_return = ['crisis_burst_{}week'.format(self.weeks_before_new_burst),
-                             'number_crisis_burst_{}week'.format(self.weeks_before_new_burst),
-                             'in_crisis_period_burst_{}week'.format(self.weeks_before_new_burst),
-                             'number_crises_burst_{}week_passed'.format(self.weeks_before_new_burst)]
-        schema = {k: int for k in columns_to_return}
+        schema = {k: int for k in self._get_out_column_names()}
         return schema
@@ -5,8 +5,9 @@ from crisis_prediction.features.utils import first_known_to_date
 
 
 class CrisisPlanEventFeatures(EventFeature):
+    windowed = True
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         """
         Takes a dictionary of dataframes and returns the features related to CrisisPlan indexed by patient,
         year and week.
@@ -17,9 +18,9 @@ class CrisisPlanEventFeatures(EventFeature):
             patient_id = data['patient_table']['anonymous_pat_id'].iloc[0]
             return self.transform_empty(patient_id, patients_first_known_date)
         crisis_plan_data = data['crisis_plan_table']
-        crisis_plan_data.set_index(['anonymous_pat_id', 'plan_updated_date'], inplace=True)
-        crisis_plan_features = self.add_event_stat_features(crisis_plan_data, patients_first_known_date)
-        crisis_plan_features = self.add_time_since_last_features(crisis_plan_features)
+        crisis_plan_data = crisis_plan_data.set_index(['anonymous_pat_id', 'plan_updated_date'])
+        crisis_plan_features = self.add_event_stat_features(crisis_plan_data, patients_first_known_date, window_start)
+        crisis_plan_features = self.add_time_since_last_features(crisis_plan_features, seeds)
         crisis_plan_features['crisis_plan_up_to_date'] = \
             (crisis_plan_features['time_since_last_crisis_plan_update'] <= 52).astype(int)
         return crisis_plan_features
@@ -30,18 +31,16 @@ class CrisisPlanEventFeatures(EventFeature):
                              'crisis_plan_update': 0}
         return self.create_features_empty_data(patient_id, patients_first_known_date, column_value_dict)
 
-    def add_event_stat_features(self, crisis_plan_data, patients_first_known_date):
+    def add_event_stat_features(self, crisis_plan_data, patients_first_known_date, window_start=None):
         stats_dict = {'crisis_plan_update': 'max'}
         crisis_plan_features = self.event_stats_per_week(
             crisis_plan_data, patients_first_known_date,
             column_prefix='crisis_plan_update',
-            stats=stats_dict).sort_index()
+            stats=stats_dict, window_start=window_start).sort_index()
         return crisis_plan_features.astype(int)
 
-    def add_time_since_last_features(self, crisis_plan_features):
-        crisis_plan_features['time_since_last_crisis_plan_update'] = \
-            self.get_time_since_last_event(crisis_plan_features['crisis_plan_update'].astype(bool))
-        return crisis_plan_features
+    def add_time_since_last_features(self, crisis_plan_features, seeds=None):
+        return self.add_time_since_last_events(crisis_plan_features, ['crisis_plan_update'], seeds=seeds)
 
     @property
     def schema_out(self):
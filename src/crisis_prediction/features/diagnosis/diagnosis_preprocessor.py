@@ -1,3 +1,6 @@
+import re
+
+import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.base import Preprocessor
@@ -21,13 +24,58 @@ class DiagnosisPreprocessor(Preprocessor):
         return data
 
     def create_mappings(self, diagnosis_data, diagnosis_codes, root):
-        for category in diagnosis_codes['Category'].unique():
-            root_codes = set(diagnosis_codes.loc[diagnosis_codes['Category'] == category, 'DiagnosisCodeRoot'])
-            diagnosis_data['{}_{}'.format(root, category.lower())] = pd.concat(
-                [diagnosis_data[col].str.contains(code) for col in self.diagnosis_code_columns for code in root_codes],
-                axis=1).any(axis=1).astype(int)
+        """
+        Adds a {root}_{category} column for every category of diagnosis_codes that is 1 when any of the
+        diagnosis code columns contains -as str.contains does- one of the root codes of the category.
+        Every distinct diagnosis code is resolved to its categories once, using the index of create_codes_index.
+        """
+        categories = diagnosis_codes['Category'].unique()
+        codes_index = self.create_codes_index(diagnosis_codes, categories)
+        codes, unique_codes = pd.factorize(diagnosis_data[self.diagnosis_code_columns].values.ravel())
+        # The extra last row, with no categories, is the one picked by the missing codes (-1)
+        unique_codes_categories = np.zeros((len(unique_codes) + 1, len(categories)), dtype=bool)
+        for i, code in enumerate(unique_codes):
+            unique_codes_categories[i] = self.get_code_categories(code, codes_index, len(categories))
+        codes = codes.reshape(len(diagnosis_data), len(self.diagnosis_code_columns))
+        diagnosis_categories = np.zeros((len(diagnosis_data), len(categories)), dtype=bool)
+        for column in range(len(self.diagnosis_code_columns)):
+            diagnosis_categories |= unique_codes_categories[codes[:, column]]
+        for i, category in enumerate(categories):
+            diagnosis_data['{}_{}'.format(root, category.lower())] = diagnosis_categories[:, i].astype(int)
         return diagnosis_data
 
+    @staticmethod
+    def create_codes_index(diagnosis_codes, categories):
+        """
+        Returns a dict from every root code to the boolean mask of the categories it belongs to, the length
+        of the longest one and the list of (compiled pattern, category position) of the root codes with
+        regex special characters.
+        """
+        literal_codes, pattern_codes = {}, []
+        for i, category in enumerate(categories):
+            for code in set(diagnosis_codes.loc[diagnosis_codes['Category'] == category, 'DiagnosisCodeRoot']):
+                if re.escape(code) != code:
+                    pattern_codes.append((re.compile(code), i))
+                else:
+                    literal_codes.setdefault(code, np.zeros(len(categories), dtype=bool))[i] = True
+        return literal_codes, max((len(code) for code in literal_codes), default=0), pattern_codes
+
+    @staticmethod
+    def get_code_categories(code, codes_index, num_categories):
+        """Returns the boolean mask of the categories whose root codes are contained in code."""
+        literal_codes, max_length, pattern_codes = codes_index
+        categories = np.zeros(num_categories, dtype=bool)
+        if not isinstance(code, str):
+            return categories
+        for start in range(len(code) + 1):
+            for end in range(start, min(start + max_length, len(code)) + 1):
+                if code[start:end] in literal_codes:
+                    categories |= literal_codes[code[start:end]]
+        for pattern, category in pattern_codes:
+            if pattern.search(code):
+                categories[category] = True
+        return categories
+
     @property
     def schema_out(self):
         schema = {
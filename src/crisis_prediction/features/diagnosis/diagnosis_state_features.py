@@ -8,6 +8,8 @@ from crisis_prediction.features.utils import first_known_to_date
 
 
 class DiagnosisStateFeatures(StateFeature):
+    windowed = True
+
     def __init__(self, end_date: datetime.date = datetime.date.today()):
         super().__init__(end_date=end_date)
         self.granular_categories = granular_category_columns
@@ -19,7 +21,7 @@ class DiagnosisStateFeatures(StateFeature):
                         'current_dual_diagnosis', 'ever_dual_diagnosis', 'number_of_ever_broad_diagnosis',
                         'number_of_ever_granular_diagnosis']
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         """This function takes a dictionary of dataframes
         with the table names as keys and returns features
         for diagnosis.
@@ -32,10 +34,11 @@ class DiagnosisStateFeatures(StateFeature):
         diagnosis_data = data['diagnosis_table'].set_index(
             ['anonymous_pat_id', 'diagnosis_start_date', 'diagnosis_end_date'])
 
-        diagnosis_features = self.create_current_diagnosis_features(diagnosis_data, patients_first_known_date)
+        diagnosis_features = self.create_current_diagnosis_features(diagnosis_data, patients_first_known_date,
+                                                                    window_start)
         diagnosis_features = self.add_number_of_current_diagnosis_features(diagnosis_features)
         diagnosis_features = self.add_dual_diagnosis_feature(diagnosis_features)
-        diagnosis_features = self.add_ever_diagnosed_features(diagnosis_features)
+        diagnosis_features = self.add_ever_diagnosed_features(diagnosis_features, seeds)
 
         return diagnosis_features
 
@@ -43,9 +46,9 @@ class DiagnosisStateFeatures(StateFeature):
         column_value_dict = {column: 0 for column in self.fields}
         return self.create_features_empty_data(patient_id, patients_first_known_date, column_value_dict)
 
-    def create_current_diagnosis_features(self, data, patients_first_known_date):
+    def create_current_diagnosis_features(self, data, patients_first_known_date, window_start=None):
         diagnosis_features = self.state_stats_per_week(data[self.granular_categories + self.broad_category],
-                                                       patients_first_known_date).fillna(0)
+                                                       patients_first_known_date, window_start=window_start).fillna(0)
         diagnosis_features.rename(columns={col: 'current_' + col for col in self.state_columns},
                                   inplace=True)
         return diagnosis_features
@@ -64,11 +67,14 @@ class DiagnosisStateFeatures(StateFeature):
                                           (data['current_diagnosis_broad_substance_misuse'] == 1)).astype(int)
         return data
 
-    def add_ever_diagnosed_features(self, data):
+    def add_ever_diagnosed_features(self, data, seeds=None):
+        """seeds, keyed by the ever columns, are their values at the week before data in an incremental run."""
         current_diagnosis_columns = ['current_dual_diagnosis'] + ['current_' + col for col in self.state_columns]
         ever_diagnosis_columns = ['ever_dual_diagnosis'] + ['ever_' + col.replace('diagnosis', 'diagnosed') for col in
                                                             self.state_columns]
-        data[ever_diagnosis_columns] = data[current_diagnosis_columns].replace({0: np.nan}).ffill().fillna(0)
+        ever_diagnosed = data[current_diagnosis_columns].replace({0: np.nan}).ffill().to_numpy()
+        seeds = np.array([(seeds or {}).get(col, 0) for col in ever_diagnosis_columns], dtype=float)
+        data[ever_diagnosis_columns] = np.where(np.isnan(ever_diagnosed), seeds, ever_diagnosed)
 
         broad_diagnosis_columns = [col for col in ever_diagnosis_columns if 'broad' in col]
         data['number_of_ever_broad_diagnosis'] = data[broad_diagnosis_columns].sum(axis=1)
@@ -1,19 +1,20 @@
+import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.crisis_period_feature import CrisisPeriodFeature
 
 
 class BedDaysDuringCrisisPeriod(CrisisPeriodFeature):
+    dependencies = ['CrisisFeaturesDuringCrisisPeriod', 'BedDayPeriod']
 
     def transform(self, data):
         crisis_periods = data['CrisisFeaturesDuringCrisisPeriod']
-        if data['BedDayPeriod'].empty:
+        if data['BedDayPeriod'].empty or crisis_periods.empty:
             return self.transform_empty(crisis_periods)
-        bed_day_periods = data['BedDayPeriod']
-        bed_day_features = crisis_periods.apply(self.get_aggregation_features(bed_day_periods.reset_index()), axis=1)
-        return bed_day_features
+        return self.get_aggregation_features(crisis_periods, data['BedDayPeriod'].reset_index())
 
     def transform_empty(self, crisis_periods):
+        crisis_periods = crisis_periods.copy()
         columns = ['number_of_bed_days', 'number_of_leave_days', 'level_of_obs_max', 'max_length_stay']
         columns += ['level_of_obs_{}'.format(num) for num in range(1, 5)]
         columns += ['level_of_obs_{}_number_of_days'.format(num) for num in range(1, 5)]
@@ -21,30 +22,63 @@ class BedDaysDuringCrisisPeriod(CrisisPeriodFeature):
             crisis_periods[col] = 0
         return crisis_periods
 
+    def get_aggregation_features(self, crisis_periods, bed_day_periods):
+        """
+        Takes the crisis periods and the bed day periods of one or several patients and returns for every crisis
+        period the aggregated features of the bed day periods of the patient that start and end within it, 0 when
+        there are none. Every bed day period is added to its crisis period with unbuffered numpy ufunc.at reductions.
+        """
+        start = pd.to_datetime(crisis_periods['start_crisis_period_monday'])
+        end = pd.to_datetime(crisis_periods['end_crisis_period_monday'])
+        crisis_period_rows = self.get_crisis_period_rows(
+            crisis_periods.index.get_level_values('anonymous_pat_id').to_numpy(), start.to_numpy(), end.to_numpy(),
+            bed_day_periods)
+        in_crisis_period = crisis_period_rows >= 0
+        crisis_period_rows, bed_day_periods = crisis_period_rows[in_crisis_period], bed_day_periods[in_crisis_period]
+
+        def aggregate(ufunc, column):
+            values = bed_day_periods[column].to_numpy()
+            features = np.zeros(len(crisis_periods), dtype=np.result_type(values.dtype, np.int64))
+            ufunc.at(features, crisis_period_rows, values)
+            return features
+
+        features = {
+            **{'level_of_obs_{}'.format(num): aggregate(np.maximum, 'level_of_obs_{}'.format(num))
+               for num in range(1, 5)},
+            **{'level_of_obs_{}_number_of_days'.format(num):
+                   aggregate(np.add, 'level_of_obs_{}_number_of_days'.format(num)) for num in range(1, 5)},
+            **{'number_of_bed_days': aggregate(np.add, 'number_of_bed_days'),
+               'max_length_stay': aggregate(np.maximum, 'number_of_bed_days'),
+               'number_of_leave_days': aggregate(np.add, 'number_of_leave_days'),
+               'level_of_obs_max': aggregate(np.maximum, 'level_of_obs_max'),
+               'start_crisis_period_monday': start.to_numpy(),
+               'end_crisis_period_monday': end.to_numpy()}
+        }
+        return pd.DataFrame(features, index=crisis_periods.index)
+
     @staticmethod
-    def get_aggregation_features(bed_day_periods):
-        def currying_function(crisis_period):
-            start = pd.to_datetime(crisis_period['start_crisis_period_monday'])
-            end = pd.to_datetime(crisis_period['end_crisis_period_monday'])
-            bed_day_periods_in_crisis_period = bed_day_periods[(bed_day_periods['start_bed_day_period'] >= start) &
-                                                               (bed_day_periods['end_bed_day_period'] <= end)]
-            features = {
-                **{'level_of_obs_{}'.format(num): max(bed_day_periods_in_crisis_period['level_of_obs_{}'.format(num)],
-                                                      default=0) for num in range(1, 5)},
-                **{
-                    'level_of_obs_{}_number_of_days'.format(num):
-                        sum(bed_day_periods_in_crisis_period['level_of_obs_{}_number_of_days'.format(num)])
-                    for num in range(1, 5)},
-                **{'number_of_bed_days': sum(bed_day_periods_in_crisis_period['number_of_bed_days']),
-                   'max_length_stay': max(bed_day_periods_in_crisis_period['number_of_bed_days'], default=0),
-                   'number_of_leave_days': sum(bed_day_periods_in_crisis_period['number_of_leave_days']),
-                   'level_of_obs_max': max(bed_day_periods_in_crisis_period['level_of_obs_max'], default=0),
-                   'start_crisis_period_monday': start,
-                   'end_crisis_period_monday': end}
-            }
-            return pd.Series(features)
-
-        return currying_function
+    def get_crisis_period_rows(patients, start, end, bed_day_periods):
+        """
+        Takes the patient and the start and end Mondays of every crisis period and the bed day periods, and returns
+        for every bed day period the row of the crisis period of the same patient that contains it, -1 if none does.
+        The crisis periods of a patient do not overlap, so the only candidate is the last one starting before the
+        bed day period, found for all of them with a single sort of the starts of both.
+        """
+        patients = np.concatenate([patients, bed_day_periods['anonymous_pat_id'].to_numpy()])
+        starts = np.concatenate([start, bed_day_periods['start_bed_day_period'].to_numpy()])
+        is_bed_day_period = np.arange(len(patients)) >= len(start)
+        order = np.lexsort((is_bed_day_period, starts, patients))
+        positions = np.arange(len(order))
+        last_crisis_period = np.maximum.accumulate(np.where(is_bed_day_period[order], -1, positions))
+        candidates = np.empty(len(order), dtype=np.int64)
+        candidates[order] = np.where(last_crisis_period >= 0, order[last_crisis_period], -1)
+        candidates = candidates[len(start):]
+
+        found = candidates >= 0
+        rows = np.where(found, candidates, 0)
+        contained = found & (patients[rows] == patients[len(start):]) & \
+            (bed_day_periods['end_bed_day_period'].to_numpy() <= end[rows])
+        return np.where(contained, candidates, -1)
 
     @property
     def schema_out(self):
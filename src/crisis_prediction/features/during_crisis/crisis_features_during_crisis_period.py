@@ -1,12 +1,14 @@
 import datetime
 
 import pandas as pd
-from isoweek import Week
 
 from crisis_prediction.features.crisis_period_feature import CrisisPeriodFeature
+from crisis_prediction.features.utils import map_values
 
 
 class CrisisFeaturesDuringCrisisPeriod(CrisisPeriodFeature):
+    dependencies = ['InCrisisPeriod']
+
     def __init__(self, end_date: datetime.date = datetime.date.today(), weeks_before_new_burst=1):
         super().__init__(end_date=end_date)
         self.weeks_before_new_burst = weeks_before_new_burst
@@ -24,7 +26,7 @@ class CrisisFeaturesDuringCrisisPeriod(CrisisPeriodFeature):
 
     @staticmethod
     def get_crisis_severity(crisis_data, crisis_severity):
-        return crisis_data['crisis_contact_allocation'].map(crisis_severity['Severity'].to_dict())
+        return map_values(crisis_data['crisis_contact_allocation'], crisis_severity['Severity'].to_dict())
 
     def get_crisis_periods(self, crisis_data, crisis_burst):
         crisis_periods = crisis_burst.join(crisis_data, how='left').sort_index()
@@ -33,17 +35,24 @@ class CrisisFeaturesDuringCrisisPeriod(CrisisPeriodFeature):
         return crisis_periods
 
     def get_aggregations_features(self, crisis_periods):
-        crisis_periods['monday_of_week'] = crisis_periods.apply(
-            lambda row: Week(int(row.name[1]), int(row.name[2])).day(0), axis=1)
+        """
+        Takes the crisis period weeks of one or several patients and returns per patient and burst number the
+        number of crises and of crisis days, the maximum severity and the Mondays of the first and last weeks.
+        The weeks are aggregated as integer ordinals and only the Mondays of the aggregated weeks are computed.
+        """
+        crisis_periods['monday_of_week'] = self.calendar.from_year_week(
+            crisis_periods.index.get_level_values('year'), crisis_periods.index.get_level_values('week'))
         crisis_periods = crisis_periods.groupby(
             ['anonymous_pat_id', 'number_crisis_burst_{}week'.format(self.weeks_before_new_burst)]).agg(
-            {'event_date': ['count', 'nunique'], 'severity': 'max', 'monday_of_week': ['first', 'last']})
+            {'event_date': ['count', 'nunique'], 'severity': 'max', 'monday_of_week': ['min', 'max']})
+        for column in [('monday_of_week', 'min'), ('monday_of_week', 'max')]:
+            crisis_periods[column] = self.calendar.monday(crisis_periods[column]).astype(object)
         return crisis_periods
 
     @staticmethod
     def rename_feature_columns(crisis_periods):
-        rename_columns = {'monday_of_week_first': 'start_crisis_period_monday',
-                          'monday_of_week_last': 'end_crisis_period_monday',
+        rename_columns = {'monday_of_week_min': 'start_crisis_period_monday',
+                          'monday_of_week_max': 'end_crisis_period_monday',
                           'severity_max': 'max_severity_crisis', 'event_date_count': 'number_of_crisis',
                           'event_date_nunique': 'number_of_days_in_crisis'}
         crisis_periods.columns = crisis_periods.columns.map('_'.join)
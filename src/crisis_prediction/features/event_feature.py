@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-from isoweek import Week
 
 from crisis_prediction.features.base import Feature
 from crisis_prediction.features.utils import is_multiindex
@@ -11,7 +10,12 @@ class EventFeature(Feature):
     def transform(self, *args, **kwargs):
         pass
 
-    def event_stats_per_week(self, data, patients_first_known_date, column_prefix='event', stats=['sum', 'max', 'min']):
+    @property
+    def history_weeks(self):
+        return max(getattr(self, 't_weeks_stats', [0]))
+
+    def event_stats_per_week(self, data, patients_first_known_date, column_prefix='event', stats=['sum', 'max', 'min'],
+                             window_start=None):
         """
         Input:
             data (pandas.DataFrame): dataframe indexed by
@@ -21,62 +25,154 @@ class EventFeature(Feature):
             be used for the name of the event columns.
             stats (list or dict): set of operations to be applied
             to the dataframe columns.
+            window_start (int) [optional]: ordinal of the first week
+            to return, earlier events are ignored.
         Returns:
             event_features: pandas.DataFrame indexed by anonymous_pat_id,
             year and week, the event column and the extra (optional)
             columns aggregated by year and week and summarised by the
             passed statistics.
         """
+        patient_id = data.index.get_level_values(0)[0]
+        return self.event_stats_per_week_batch(data, pd.Series({patient_id: patients_first_known_date}),
+                                               column_prefix=column_prefix, stats=stats, window_start=window_start)
+
+    def event_stats_per_week_batch(self, data, patients_first_known_dates, column_prefix='event',
+                                   stats=['sum', 'max', 'min'], window_start=None):
+        """
+        Input:
+            data (pandas.DataFrame): dataframe indexed by
+            anonymous_pat_id and a date column with the events
+            of several patients and -optionally- with extra columns.
+            patients_first_known_dates (pandas.Series): first known
+            date of each patient indexed by anonymous_pat_id.
+            column_prefix (str) [optional]: prefix that will
+            be used for the name of the event columns.
+            stats (list or dict): set of operations to be applied
+            to the dataframe columns. If it is a dict only its
+            columns are aggregated, the rest are not carried.
+            window_start (int) [optional]: ordinal of the first week
+            to return, earlier events are ignored.
+        Returns:
+            event_features: pandas.DataFrame indexed by anonymous_pat_id,
+            year and week, the same as concatenating the output of
+            event_stats_per_week for each patient.
+        """
+        if isinstance(stats, dict):
+            data = data[[k for k in data.columns if k in stats]]
+        event_weeks = self.calendar.to_ordinal(data.index.get_level_values(1))
+        if window_start is not None:
+            data, event_weeks = data[event_weeks >= window_start], event_weeks[event_weeks >= window_start]
+        years, weeks = self.calendar.year_week(event_weeks)
         events = pd.DataFrame({**{
-            'year': [k[1].isocalendar()[0] for k, d in data.iterrows()],
-            'week': [k[1].isocalendar()[1] for k, d in data.iterrows()],
-            column_prefix: [1] * len(data),
+            'year': years,
+            'week': weeks,
+            column_prefix: np.ones(len(data), dtype=int),
             'anonymous_pat_id': data.index.get_level_values(0)}, **{
-            k: data[k] for k in data.columns
+            k: data[k].values for k in data.columns
         }}).set_index(['anonymous_pat_id', 'year', 'week'])
-        patients_first_known_date = patients_first_known_date.isocalendar()
-        monday_first_week = Week(patients_first_known_date[0], patients_first_known_date[1]).monday()
-        full_dates = pd.date_range(monday_first_week, self.end_date,
-                                   freq='W-MON', normalize=True, closed='left')
-        full_history = pd.DataFrame({
-            'year': [d.isocalendar()[0] for d in full_dates],
-            'week': [d.isocalendar()[1] for d in full_dates],
-            'anonymous_pat_id': [data.index.get_level_values(0)[0]] * len(full_dates),
-        }).set_index(['anonymous_pat_id', 'year', 'week'])
+        full_history = self.create_full_history_batch(patients_first_known_dates, window_start=window_start)
         event_features = full_history.join(events, how='outer').fillna(0) \
             .groupby(['anonymous_pat_id', 'year', 'week']).agg(stats)
         if is_multiindex(event_features.columns):
             event_features.columns = ['_'.join(col).strip() for col in event_features.columns]
         return event_features
 
-    def event_stats_per_t_weeks(self, data, columns_for_t_weeks_stats, t=[4, 8, 12, 16, 20, 24]):
-        for col in columns_for_t_weeks_stats.keys():
-            t_max = max(t)
-            for i in range(1, t_max + 1):
-                if '{}_{}_{}'.format(col, i, 'weeks_ago') not in data.columns:
-                    data['{}_{}_{}'.format(col, i, 'weeks_ago')] = data[col].shift(i)
+    def event_stats_per_t_weeks(self, data, columns_for_t_weeks_stats, t=[4, 8, 12, 16, 20, 24], lags=None):
+        """
+        Input:
+            data (pandas.DataFrame): weekly features of one patient
+            ordered by year and week.
+            columns_for_t_weeks_stats (dict): statistic -a pandas
+            rolling method such as 'sum' or 'max'- to aggregate
+            each column over the previous t weeks.
+            t (list): lengths, in weeks, of the windows.
+            lags (iterable) [optional]: weeks ago whose values are
+            added as columns, all of them until max(t) by default.
+        Returns:
+            data with the {col}_in_last_{k}_weeks and {col}_{i}_weeks_ago
+            columns. Every window is computed with a single rolling pass
+            over the column instead of aggregating its shifted copies, and
+            the new columns are added at once.
+        """
+        lags = range(1, max(t) + 1) if lags is None else lags
+        t_weeks_stats = {}
+        for col, stat in columns_for_t_weeks_stats.items():
+            for i in lags:
+                t_weeks_stats['{}_{}_{}'.format(col, i, 'weeks_ago')] = data[col].shift(i)
+            previous_weeks = data[col].shift(1)
             for k in t:
-                if '{}_in_last_{}_{}'.format(col, k, 'weeks') not in data.columns:
-                    col_list = ['{}_{}_{}'.format(col, i, 'weeks_ago') for i in range(1, k + 1)]
-                    data['{}_in_last_{}_{}'.format(col, k, 'weeks')] = data[col_list].agg(
-                        columns_for_t_weeks_stats.get(col), axis=1)
-        return data
+                t_weeks_stats['{}_in_last_{}_{}'.format(col, k, 'weeks')] = getattr(
+                    previous_weeks.rolling(k, min_periods=0), stat)()
+        t_weeks_stats = {k: v for k, v in t_weeks_stats.items() if k not in data.columns}
+        return pd.concat([data, pd.DataFrame(t_weeks_stats, index=data.index)], axis=1)
 
-    def event_stats_ever(self, data, columns_for_t_weeks_stats):
+    def event_stats_ever(self, data, columns_for_t_weeks_stats, seeds=None):
+        """
+        Adds the {col}_ever column -the cumulative statistic- of every column of columns_for_t_weeks_stats.
+        seeds, keyed by the {col}_ever names, are the values of the week before data in an incremental run.
+        """
+        seeds = seeds or {}
         for col in columns_for_t_weeks_stats.keys():
             if '{}_ever'.format(col) not in data.columns:
                 data['{}_ever'.format(col)] = data[col].agg('cum' + columns_for_t_weeks_stats.get(col))
+                seed = seeds.get('{}_ever'.format(col))
+                if seed is not None and columns_for_t_weeks_stats.get(col) == 'sum':
+                    data['{}_ever'.format(col)] += seed
+                elif seed is not None:
+                    data['{}_ever'.format(col)] = data['{}_ever'.format(col)].clip(lower=seed)
         return data
 
-    @staticmethod
-    def get_time_since_last_event(events):
+    def get_time_since_last_event(self, events, seed=None):
         """
         Given a series of True/False values, it returns the number of records since last True.
-        It requires the series to be already ordered and be only for each user.
+        It requires the series to be already ordered and be only for each user. seed is the
+        value of the week before the series in an incremental run.
+        """
+        return self.get_time_since_last_events(events.to_frame(), seeds=[seed])[events.name]
+
+    def get_time_since_last_events(self, events, seeds=None):
         """
-        x1 = (events == 0).cumsum()
-        x2 = x1.where(events, np.nan).ffill()
-        return (x1 - x2).astype(float)
+        Input:
+            events (pandas.DataFrame): weekly features indexed by
+            anonymous_pat_id, year and week, ordered by patient and
+            week, with the columns whose events are counted.
+            seeds (list-like) [optional]: value of every column at the
+            week before events in an incremental run -None or NaN if
+            there was no event yet-.
+        Returns:
+            time_since_last: pandas.DataFrame with the same index and
+            columns with the number of weeks since the last nonzero
+            week of every column -0 on those weeks and NaN before the
+            first one of each patient-. All the columns and patients
+            are computed at once: the last event row is carried down
+            with a cumulative maximum and compared with the first row
+            of the patient, so the counters restart for every patient.
+        """
+        rows = np.arange(len(events))
+        patients = events.index.get_level_values(0)
+        new_patient = np.ones(len(events), dtype=bool)
+        new_patient[1:] = patients[1:] != patients[:-1]
+        first_rows = np.maximum.accumulate(np.where(new_patient, rows, 0))
+        last_event_rows = np.maximum.accumulate(np.where(events.to_numpy() != 0, rows[:, None], -1), axis=0)
+        time_since_last = (rows[:, None] - last_event_rows).astype(float)
+        before_first_event = last_event_rows < first_rows[:, None]
+        seeds = np.full(events.shape[1], np.nan) if seeds is None else np.array(seeds, dtype=float)
+        time_since_last[before_first_event] = (seeds + (rows - first_rows + 1)[:, None])[before_first_event]
+        return pd.DataFrame(time_since_last, index=events.index, columns=events.columns)
+
+    def add_time_since_last_events(self, data, columns, names=None, seeds=None):
+        """
+        Adds to data the time_since_last_{name} column of every column
+        of columns -named after names if passed- at once. seeds, keyed
+        by the time_since_last_{name} columns, are the values of the
+        week before data in an incremental run.
+        """
+        names = ['time_since_last_{}'.format(name) for name in names or columns]
+        time_since_last = self.get_time_since_last_events(
+            data[columns], seeds=None if seeds is None else [seeds.get(name) for name in names])
+        data[names] = time_since_last.to_numpy()
+        return data
 
     @property
     def schema_out(self):
@@ -0,0 +1,120 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+from crisis_prediction.features.exceptions import SchemaException
+
+INDEX_COLUMNS = ['anonymous_pat_id', 'year', 'week']
+
+
+class FeatureStore:
+    """Columnar on-disk store for the weekly features returned by Pipeline.transform.
+    Every feature is stored as a Parquet dataset under <path>/<feature name>,
+    partitioned by a hash of the patient id and by year, so that reads only
+    touch the patients, years and columns they need.
+    """
+
+    def __init__(self, path: str, num_patient_partitions: int = 16):
+        self.path = path
+        self.num_patient_partitions = num_patient_partitions
+        self.partitioning = ds.partitioning(pa.schema([('patient_hash', pa.int64()), ('year', pa.int64())]),
+                                            flavor='hive')
+
+    def write(self, features: Dict[str, DataFrame]):
+        """Takes a dict of weekly features indexed by anonymous_pat_id, year and week and writes them
+        replacing the rows that already exist for those patients and years. The rows of the rest of
+        patients that share a patient hash and year partition with them are read and written back.
+        """
+        for feature_name, feature in features.items():
+            if list(feature.index.names) != INDEX_COLUMNS:
+                raise SchemaException('Output of {} passed to {} is not indexed by {}'
+                                      .format(feature_name, self.__class__.__name__, INDEX_COLUMNS))
+            feature = feature.reset_index()
+            feature['year'] = feature['year'].astype(np.int64)
+            feature['patient_hash'] = self.get_patient_hash(feature['anonymous_pat_id'])
+            feature = pd.concat([self.read_other_patients_rows(feature_name, feature), feature], ignore_index=True)
+            pq.write_to_dataset(pa.Table.from_pandas(feature, preserve_index=False),
+                                os.path.join(self.path, feature_name),
+                                partitioning=self.partitioning,
+                                existing_data_behavior='delete_matching')
+
+    def read_other_patients_rows(self, feature_name: str, feature: DataFrame) -> DataFrame:
+        """Takes the rows about to be written for a feature, with their patient_hash, and returns the rows
+        already stored in the same patient hash and year partitions that belong to other patients, with
+        the same columns, so that they are not lost when those partitions are replaced.
+        """
+        if not os.path.exists(os.path.join(self.path, feature_name)):
+            return feature.iloc[:0]
+        partitions = pd.MultiIndex.from_frame(feature[['patient_hash', 'year']].drop_duplicates())
+        stored = pq.read_table(os.path.join(self.path, feature_name),
+                               filters=[('patient_hash', 'in', set(partitions.get_level_values(0).tolist())),
+                                        ('year', 'in', set(partitions.get_level_values(1).tolist()))],
+                               partitioning=self.partitioning).to_pandas()
+        stored = stored[pd.MultiIndex.from_frame(stored[['patient_hash', 'year']]).isin(partitions) &
+                        ~stored['anonymous_pat_id'].isin(feature['anonymous_pat_id'])]
+        return stored.reindex(columns=feature.columns)
+
+    def read(self, feature_name: str, start=None, end=None, columns: List[str] = None,
+             patients: List[int] = None) -> DataFrame:
+        """Reads the weeks between start and end (both included) of a feature indexed by
+        anonymous_pat_id, year and week. Only the passed columns -all of them by default-
+        and patients -all of them by default- are read from disk.
+        """
+        columns = self.get_columns(feature_name) if columns is None else list(columns)
+        feature = pq.read_table(os.path.join(self.path, feature_name),
+                                columns=INDEX_COLUMNS + [c for c in columns if c not in INDEX_COLUMNS],
+                                filters=self.get_filters(start, end, patients),
+                                partitioning=self.partitioning).to_pandas()
+        return feature.set_index(INDEX_COLUMNS).sort_index()
+
+    def load(self, start=None, end=None, columns: List[str] = None, feature_names: List[str] = None) -> DataFrame:
+        """Reads the weeks between start and end of several features -all of them by default-
+        and joins them in a single DataFrame. If columns is passed, the features that do not
+        contain any of them are not read at all. If no feature is read the DataFrame is empty.
+        """
+        if feature_names is None:
+            feature_names = sorted(os.listdir(self.path)) if os.path.exists(self.path) else []
+        features = []
+        for feature_name in feature_names:
+            feature_columns = self.get_columns(feature_name)
+            if columns is not None:
+                feature_columns = [c for c in feature_columns if c in columns]
+                if not feature_columns:
+                    continue
+            features.append(self.read(feature_name, start, end, feature_columns))
+        if not features:
+            return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], [], []], names=INDEX_COLUMNS))
+        return pd.concat(features, axis=1, sort=True)
+
+    def get_columns(self, feature_name: str) -> List[str]:
+        schema = ds.dataset(os.path.join(self.path, feature_name), partitioning=self.partitioning).schema
+        return [c for c in schema.names if c not in INDEX_COLUMNS + ['patient_hash']]
+
+    def get_patient_hash(self, patients):
+        return (pd.util.hash_array(np.asarray(patients, dtype=np.int64)) % self.num_patient_partitions) \
+            .astype(np.int64)
+
+    def get_filters(self, start=None, end=None, patients=None):
+        """Builds the Parquet filters, in disjunctive normal form, to keep the weeks between start and end
+        and the passed patients. Filters on year and patient_hash prune whole partitions.
+        """
+        conjunctions = [[]]
+        if start is not None:
+            year, week = pd.Timestamp(start).isocalendar()[:2]
+            conjunctions = [c + s for c in conjunctions for s in [[('year', '>', year)],
+                                                                  [('year', '=', year), ('week', '>=', week)]]]
+        if end is not None:
+            year, week = pd.Timestamp(end).isocalendar()[:2]
+            conjunctions = [c + e for c in conjunctions for e in [[('year', '<', year)],
+                                                                  [('year', '=', year), ('week', '<=', week)]]]
+        if patients is not None:
+            patient_filter = [('patient_hash', 'in', set(self.get_patient_hash(patients).tolist())),
+                              ('anonymous_pat_id', 'in', set(patients))]
+            conjunctions = [c + patient_filter for c in conjunctions]
+        return conjunctions if conjunctions != [[]] else None
@@ -4,6 +4,7 @@ from crisis_prediction.features.last_crisis.last_crisis_features import LastCris
 
 
 class LastCrisisBedDaysFeatures(LastCrisisFeatures):
+    dependencies = ['BedDaysDuringCrisisPeriod', 'InCrisisPeriod']
 
     def transform(self, data):
         if data['BedDaysDuringCrisisPeriod'].empty:
@@ -4,6 +4,7 @@ from crisis_prediction.features.last_crisis.last_crisis_features import LastCris
 
 
 class LastCrisisDuringCrisisFeatures(LastCrisisFeatures):
+    dependencies = ['CrisisFeaturesDuringCrisisPeriod', 'InCrisisPeriod']
 
     def transform(self, data):
         if data['CrisisFeaturesDuringCrisisPeriod'].empty:
@@ -1,7 +1,8 @@
 import datetime
 
+import pandas as pd
+
 from crisis_prediction.features.event_feature import EventFeature
-from crisis_prediction.features.utils import isocalendar_week, isocalendar_year
 
 
 class LastCrisisFeatures(EventFeature):
@@ -12,18 +13,23 @@ class LastCrisisFeatures(EventFeature):
     def transform(self, data):
         return NotImplementedError
 
-    @staticmethod
-    def add_during_crisis_features(during_crisis_period, last_crisis_period, columns_to_drop):
-        during_crisis_period['year'] = during_crisis_period['end_crisis_period_monday'].apply(isocalendar_year)
-        during_crisis_period['week'] = during_crisis_period['end_crisis_period_monday'].apply(isocalendar_week)
-        during_crisis_period = during_crisis_period.reset_index().set_index(['anonymous_pat_id', 'year', 'week'])
-        last_crisis_features = last_crisis_period.join(during_crisis_period)
-        new_columns = [col for col in last_crisis_features.columns if
-                       col not in columns_to_drop and '_last_crisis' not in col]
-        last_crisis_features.loc[:, new_columns] = last_crisis_features.loc[:, new_columns].shift(1).ffill()
-        last_crisis_features.rename(columns={col: col + '_last_crisis' for col in new_columns}, inplace=True)
-        feature_columns = [col for col in last_crisis_features.columns if '_last_crisis' in col]
-        return last_crisis_features[feature_columns]
+    def add_during_crisis_features(self, during_crisis_period, last_crisis_period, columns_to_drop):
+        """
+        Takes the features of every crisis period -indexed by patient and burst number-, the weekly crisis periods
+        of the same patients and the columns of the former that are not features. Returns every feature of the
+        last crisis period of the same patient finished before each week, suffixed with '_last_crisis', and NaN
+        until the first one ends. The crisis periods are placed on the week of their end_crisis_period_monday,
+        computed arithmetically from its week ordinal, and only count from the week after it.
+        """
+        new_columns = [col for col in during_crisis_period.columns if col not in columns_to_drop]
+        years, weeks = self.calendar.year_week(
+            self.calendar.to_ordinal(during_crisis_period['end_crisis_period_monday'].values))
+        during_crisis_period = during_crisis_period[new_columns].set_axis(pd.MultiIndex.from_arrays(
+            [during_crisis_period.index.get_level_values('anonymous_pat_id'), years, weeks],
+            names=['anonymous_pat_id', 'year', 'week']))
+        last_crisis_features = last_crisis_period[[]].join(during_crisis_period)
+        last_crisis_features = last_crisis_features.groupby(level=0).shift(1).groupby(level=0).ffill()
+        return last_crisis_features.rename(columns={col: col + '_last_crisis' for col in new_columns})
 
     def schema_out(self):
         return NotImplementedError
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+class OneHotEncoder:
+    """One-hot encoder with a fixed vocabulary, meant to be built once per feature.
+    The columns are named like the ones of pd.get_dummies with prefix, that is
+    '{prefix}_{value}', and values outside of the vocabulary or missing are encoded
+    as all zeros. The values are matched once per distinct value -or per category
+    for categorical values- and the rows are encoded by integer code lookup into a
+    preallocated int8 matrix.
+    """
+
+    def __init__(self, column_names, prefix, lower: bool = False):
+        """
+        :param column_names: names of the output columns, all starting with '{prefix}_'. Unlike
+        pd.get_dummies -where such a column would always be zero- a ValueError is raised otherwise
+        :param lower: whether the values are lowercased -as with Series.str.lower, so non
+        string values are missing- before being matched
+        """
+        not_prefixed = [c for c in column_names if not c.startswith('{}_'.format(prefix))]
+        if not_prefixed:
+            raise ValueError('Columns {} do not start with {}_'.format(not_prefixed, prefix))
+        self.columns = list(column_names)
+        self.prefix = prefix
+        self.lower = lower
+        self.vocabulary = pd.Index([c[len(prefix) + 1:] for c in self.columns])
+
+    def get_positions(self, values):
+        """
+        Takes a pandas.Series and returns the position of the column of every value,
+        -1 for the values outside of the vocabulary or missing.
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object)
+        if self.lower:
+            uniques = uniques.str.lower()
+        unique_positions = self.vocabulary.get_indexer(['{}'.format(u) if not pd.isna(u) else None for u in uniques])
+        return np.append(unique_positions, -1)[codes]
+
+    def encode(self, values):
+        """Takes a pandas.Series and returns its one-hot encoding as an int8 numpy matrix."""
+        positions = self.get_positions(values)
+        matrix = np.zeros((len(positions), len(self.columns)), dtype=np.int8)
+        rows = np.flatnonzero(positions >= 0)
+        matrix[rows, positions[rows]] = 1
+        return matrix
+
+    def transform(self, values, out=None):
+        """
+        Takes a pandas.Series and returns its one-hot encoding as a DataFrame with
+        the same index. If out -a DataFrame with the rows of values- is passed the
+        columns are written into it instead and out is returned.
+        """
+        matrix = self.encode(values)
+        if out is None:
+            return pd.DataFrame(matrix, index=values.index, columns=self.columns, copy=False)
+        out[self.columns] = matrix
+        return out
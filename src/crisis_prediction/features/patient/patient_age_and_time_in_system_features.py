@@ -3,10 +3,10 @@ from numbers import Number
 
 import numpy as np
 import pandas as pd
-from isoweek import Week
 
 from crisis_prediction.features import Feature
-from crisis_prediction.features.utils import first_known_to_date, dummitize, get_month, difference_in_months
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import first_known_to_date, get_month
 
 
 class PatientAgeAndTimeInSystemFeatures(Feature):
@@ -16,53 +16,64 @@ class PatientAgeAndTimeInSystemFeatures(Feature):
         self.dict_age_bins = {'(0, 14]': 'child', '(15, 25]': 'teen_adult', '(25, 34]': 'young_adult',
                               '(34, 45]': 'middle_age_adult', '(45, 64]': 'older_adult', '(64, 200]': 'elder'}
         self.age_bins_columns = ['current_age_bin_{}'.format(col) for col in self.dict_age_bins.values()]
+        self.age_bins_encoder = OneHotEncoder(self.age_bins_columns, 'current_age_bin')
 
     def transform(self, data):
-        patients_data = data['patient_table']
-        if patients_data['month_year_birth'].iloc[0] != patients_data['month_year_birth'].iloc[0]:
+        """
+        Takes a dictionary of dataframes with the patient_table of one or several patients and returns their age and
+        time in system features indexed by patient, year and week, with a row for every week from the first known
+        date of each patient until end_date. The patients without month_year_birth or first_year_month have no
+        rows. The weeks of all the patients are computed at once with integer arithmetic on their years, months
+        and ISO weeks.
+        """
+        patients_data = data['patient_table'].drop_duplicates('anonymous_pat_id')
+        patients_data = patients_data[patients_data['month_year_birth'].notna() &
+                                      patients_data['first_year_month'].notna()]
+        if patients_data.empty:
             return pd.DataFrame(columns=['anonymous_pat_id', 'year', 'week'] +
                                         list(self.schema_out.keys())).set_index(['anonymous_pat_id', 'year', 'week'])
-        patients_data['date_of_birth'] = patients_data['month_year_birth'].apply(
-            lambda x: datetime.date(int(str(x)[:4]), int(str(int(x))[4:]), 1) if pd.notnull(x) else np.nan)
-        first_known = str(patients_data['first_year_month'].iloc[0])
-        patients_first_known_date = first_known_to_date(first_known).isocalendar()
-        date_of_birth = patients_data['date_of_birth'].iloc[0]
-        patient = patients_data['anonymous_pat_id'].iloc[0]
-        monday_first_week = Week(patients_first_known_date[0], patients_first_known_date[1]).monday()
-        full_dates = pd.date_range(monday_first_week, self.end_date,
-                                   freq='W-MON', normalize=True, closed='left')
-        age_features = self.create_age_features(patient, full_dates, date_of_birth)
-        features = self.add_time_in_system_features(age_features, first_known)
-        return features.drop(columns=['monday_week_year', 'birth_date', 'current_age_bin',
-                                      'first_known_year_month_1st', 'year_month_1st'])
+        # through int so that a float column -e.g. with missing values in other patients- is not read as 201503.0
+        first_known = patients_data['first_year_month'].astype(int).astype(str)
+        features = self.create_full_history_batch(pd.Series(
+            [first_known_to_date(patient_first_known) for patient_first_known in first_known],
+            index=patients_data['anonymous_pat_id'].values))
+        patient_rows = pd.Index(patients_data['anonymous_pat_id']).get_indexer(
+            features.index.get_level_values('anonymous_pat_id'))
+        month_year_birth = patients_data['month_year_birth'].astype(int).to_numpy()[patient_rows]
+        features = self.create_age_features(features, month_year_birth)
+        return self.add_time_in_system_features(features, first_known.str[:4].astype(int).to_numpy()[patient_rows],
+                                                first_known.str[-2:].astype(int).to_numpy()[patient_rows])
 
-    def create_age_features(self, patient, full_dates, date_of_birth):
-        age_features = pd.DataFrame(
-            {'anonymous_pat_id': patient, 'monday_week_year': full_dates, 'birth_date': pd.to_datetime(date_of_birth)})
-        age_features['current_age'] = (age_features['monday_week_year'].dt.year -
-                                       age_features['birth_date'].dt.year - (age_features['monday_week_year'].dt.month <
-                                                                             age_features['birth_date'].dt.month))
-        age_features['current_age_bin'] = pd.cut(x=age_features['current_age'], bins=self.age_bins)
-        age_features['current_age_bin'] = age_features['current_age_bin'].astype(str).replace(self.dict_age_bins)
-        age_features['older_than_65'] = (age_features['current_age_bin'] == 'elder').astype(int)
-        age_features = age_features.join(dummitize(age_features['current_age_bin'], self.age_bins_columns))
-        return age_features
+    def create_age_features(self, features, month_year_birth):
+        """
+        Takes the weekly rows of the patients and the month_year_birth -yyyymm- of the patient of every row, and
+        adds the age at the Monday of the week, counting the months, and its one-hot encoded age bin.
+        """
+        mondays = self.calendar.monday(self.calendar.from_year_week(features.index.get_level_values('year'),
+                                                                    features.index.get_level_values('week')))
+        monday_years = mondays.astype('datetime64[Y]').astype(np.int64) + 1970
+        monday_months = mondays.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        features['current_age'] = monday_years - month_year_birth // 100 - (monday_months < month_year_birth % 100)
+        # the bins are closed on the right, like the ones of pd.cut, and named after its interval labels
+        age_bins = np.searchsorted(self.age_bins, features['current_age'].to_numpy(), side='left') - 1
+        age_bins[(age_bins < 0) | (age_bins >= len(self.age_bins) - 1)] = -1
+        age_bin_labels = ['({}, {}]'.format(low, high) for low, high in zip(self.age_bins[:-1], self.age_bins[1:])]
+        current_age_bin = pd.Series(pd.Categorical.from_codes(
+            age_bins, [self.dict_age_bins.get(label, label) for label in age_bin_labels]), index=features.index)
+        features['older_than_65'] = (current_age_bin == 'elder').astype(int)
+        return self.age_bins_encoder.transform(current_age_bin, out=features)
 
-    def add_time_in_system_features(self, features, first_known):
-        features['year'] = features['monday_week_year'].apply(lambda d: d.isocalendar()[0])
-        features['week'] = features['monday_week_year'].apply(lambda d: d.isocalendar()[1])
-        features['years_since_known'] = features['year'] - int(str(first_known)[:4])
-        features['first_known_year_month_1st'] = datetime.datetime(int(str(first_known)[:4]),
-                                                                   int(str(first_known)[-2:]), 1)
-
-        features['year_month_1st'] = features.apply(
-            lambda row: datetime.datetime(row['year'], get_month(row['week']), 1), axis=1)
-
-        features['months_since_known'] = features.apply(
-            lambda row: max(0, difference_in_months(row['first_known_year_month_1st'],
-                                                    row['year_month_1st'])), axis=1).astype(int)
-
-        return features.set_index(['anonymous_pat_id', 'year', 'week'])
+    @staticmethod
+    def add_time_in_system_features(features, first_known_year, first_known_month):
+        """
+        Takes the weekly rows of the patients and the year and month of the first_year_month of the patient of every
+        row, and adds the years and months since then, taking the month of every ISO week from get_month.
+        """
+        years, weeks = features.index.get_level_values('year'), features.index.get_level_values('week')
+        features['years_since_known'] = years - first_known_year
+        features['months_since_known'] = np.maximum(
+            0, (years - first_known_year) * 12 + get_month(weeks) - first_known_month)
+        return features
 
     @property
     def schema_out(self):
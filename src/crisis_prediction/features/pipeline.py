@@ -1,24 +1,152 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import List
 
+import pandas as pd
+
 from crisis_prediction.features.base import Preprocessor, Feature
 from crisis_prediction.features.config import TABLE_NAMES
+from crisis_prediction.features.exceptions import SchemaException
+from crisis_prediction.features.valid_users import ValidUsers
 
 
 class Pipeline(Feature):
-    def __init__(self, preprocessors: List[Preprocessor] = [], features: List[Feature] = []):
+    def __init__(self, preprocessors: List[Preprocessor] = [], features: List[Feature] = [], n_jobs: int = 1,
+                 downcast_output: bool = False):
         self.features = features
         self.preprocessors = preprocessors
+        self.n_jobs = n_jobs
+        self.downcast_output = downcast_output
         super(Pipeline, self).__init__()
 
-    def transform(self, data, **kwargs):
+    def transform(self, data, outputs: List[str] = None, **kwargs):
+        """
+        Runs the preprocessors and then the features in dependency order. The output of every
+        feature is added to the data dict under its name so that the features that depend on it
+        can read it. Features that do not depend on each other run concurrently on n_jobs threads.
+        If outputs is passed only the requested features and their upstream features are run.
+        With downcast_output the returned outputs -not the ones read by other features- are downcast
+        with Feature.downcast to the smallest dtypes that hold them.
+        """
         for step in self.preprocessors:
             data = step(data, **kwargs)
 
-        features = {}
-        for feature in self.features:
-            features[feature.__class__.__name__] = feature(data, **kwargs)
+        data = dict(data)
+        features = self.get_features_to_run(outputs)
+        pending = {name: [d for d in feature.dependencies if d in features] for name, feature in features.items()}
+        for name, feature in features.items():
+            missing = next((d for d in feature.dependencies if d not in features and d not in data), None)
+            if missing is not None:
+                raise SchemaException('{} DataFrame not passed to {}'.format(missing, name))
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            running = {}
+            while pending or running:
+                for name in [name for name, dependencies in pending.items() if not dependencies]:
+                    del pending[name]
+                    running[executor.submit(features[name], data, **kwargs)] = name
+                if not running:
+                    raise SchemaException('Circular dependency between {}'.format(', '.join(pending)))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    data[name] = future.result()
+                    for dependencies in pending.values():
+                        if name in dependencies:
+                            dependencies.remove(name)
+
+        return {name: features[name].downcast(data[name]) if self.downcast_output else data[name]
+                for name in (features if outputs is None else outputs)}
+
+    def get_features_to_run(self, outputs=None):
+        features = {feature.__class__.__name__: feature for feature in self.features}
+        if outputs is None:
+            return features
+        to_run, to_visit = {}, list(outputs)
+        while to_visit:
+            name = to_visit.pop()
+            if name not in features:
+                raise SchemaException('{} is not a feature of the pipeline'.format(name))
+            if name not in to_run:
+                to_run[name] = features[name]
+                to_visit.extend(d for d in features[name].dependencies if d in features)
+        return {name: feature for name, feature in features.items() if name in to_run}
+
+    def transform_cohort(self, data, n_processes: int = None, chunk_size: int = 1, valid_patients=None,
+                         max_pending_chunks: int = None, **kwargs):
+        """
+        Runs the pipeline for every patient in data['patient_table'] using a pool
+        of n_processes processes, sending chunk_size patients to each worker at a
+        time. Every worker runs transform, and so the features of its patients on
+        the n_jobs threads of the pipeline, which makes n_processes * n_jobs threads
+        in total. By default n_processes is the number of cores divided by n_jobs,
+        so the pool does not oversubscribe the cores; a pipeline built for cohort
+        runs usually keeps n_jobs=1 and leaves the parallelism to the processes.
+        Tables with an anonymous_pat_id column are split by patient and the rest
+        (e.g. lookup tables) are sent once to every worker when it starts. At most
+        max_pending_chunks chunks (twice n_processes by default) are in flight, so
+        the patients are split as the workers consume them.
+        If valid_patients -the sorted array returned by ValidUsers- is passed, the
+        tables are pruned to those patients before anything else runs.
+        Returns the same dict as transform with the features of all patients concatenated. With
+        downcast_output every patient is downcast in its worker, so the full cohort is never held in
+        the wide dtypes.
+        """
+        if valid_patients is not None:
+            data = ValidUsers.prune_tables(data, valid_patients)
+        patients = data['patient_table']['anonymous_pat_id'].unique()
+        rows_per_patient = {table: df.groupby('anonymous_pat_id').indices for table, df in data.items()
+                            if 'anonymous_pat_id' in df.columns}
+        shared_tables = {table: df for table, df in data.items() if table not in rows_per_patient}
+        chunks = ([self.get_patient_data(data, rows_per_patient, patient) for patient in patients[i:i + chunk_size]]
+                  for i in range(0, len(patients), chunk_size))
+        n_processes = n_processes or max(os.cpu_count() // self.n_jobs, 1)
+        max_pending_chunks = max_pending_chunks or 2 * n_processes
+
+        chunks_features = {}
+        with ProcessPoolExecutor(max_workers=n_processes, initializer=_init_worker,
+                                 initargs=(self, shared_tables, kwargs)) as executor:
+            running = {}
+            for i, chunk in enumerate(chunks):
+                if len(running) >= max_pending_chunks:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    chunks_features.update((running.pop(future), future.result()) for future in done)
+                running[executor.submit(_transform_patients, chunk)] = i
+            done, _ = wait(running)
+            chunks_features.update((running.pop(future), future.result()) for future in done)
+
+        features = defaultdict(list)
+        for i in sorted(chunks_features):
+            for patient_features in chunks_features.pop(i):
+                for name, feature in patient_features.items():
+                    features[name].append(feature)
+
+        if self.downcast_output:
+            return {name: self.concat_downcast(feature) for name, feature in features.items()}
+        return {name: pd.concat(feature) for name, feature in features.items()}
 
-        return features
+    @staticmethod
+    def concat_downcast(features):
+        """
+        Concatenates the downcast outputs of a feature for several patients. The columns whose
+        dtype differs between patients are cast first to the dtype that holds all of them, as
+        pandas concatenates numpy integer columns with all-missing nullable Int ones as object.
+        """
+        dtypes = defaultdict(set)
+        for feature in features:
+            for column, dtype in feature.dtypes.items():
+                dtypes[column].add(dtype)
+        common_dtypes = {column: pd.concat([pd.Series(dtype=dtype) for dtype in column_dtypes]).dtype
+                         for column, column_dtypes in dtypes.items() if len(column_dtypes) > 1}
+        if common_dtypes:
+            features = [feature.astype({c: d for c, d in common_dtypes.items() if c in feature.columns})
+                        for feature in features]
+        return pd.concat(features)
+
+    @staticmethod
+    def get_patient_data(data, rows_per_patient, patient):
+        return {table: data[table].iloc[rows.get(patient, [])] for table, rows in rows_per_patient.items()}
 
     @property
     def required_tables(self):
@@ -44,3 +172,17 @@ class Pipeline(Feature):
     @property
     def schema_out(self):
         return object
+
+
+# Pipeline, lookup tables and transform kwargs of a transform_cohort worker, set once when the worker starts
+_worker_state = {}
+
+
+def _init_worker(pipeline, shared_tables, kwargs):
+    _worker_state.update(pipeline=pipeline, shared_tables=shared_tables, kwargs=kwargs)
+
+
+def _transform_patients(patients_data):
+    pipeline, shared_tables = _worker_state['pipeline'], _worker_state['shared_tables']
+    return [pipeline.transform({**shared_tables, **patient_data}, **_worker_state['kwargs'])
+            for patient_data in patients_data]
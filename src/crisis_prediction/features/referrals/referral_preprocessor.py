@@ -1,4 +1,5 @@
 from crisis_prediction.features.base import Preprocessor
+from crisis_prediction.features.utils import map_to_categorical, map_values
 
 
 class ReferralPreprocessor(Preprocessor):
@@ -9,11 +10,17 @@ class ReferralPreprocessor(Preprocessor):
 
     @staticmethod
     def create_mappings(data):
+        """
+        The discharge and source categories are categoricals whose vocabulary is the Category column of their
+        lookup table, and service_planned is numeric.
+        """
         service_code = {k: (1 if v == 'Planned' else 0) for k, v in data['service_code'].to_dict()['Category'].items()}
         discharge_code = data['discharge_code'].to_dict()['Category']
         source_code = data['source_code'].to_dict()['Category']
         referral_data = data['referral_table']
-        referral_data['service_planned'] = referral_data['service'].map(service_code)
-        referral_data['discharge_category'] = referral_data['discharge_reason'].map(discharge_code)
-        referral_data['source_category'] = referral_data['referral_source'].map(source_code)
+        referral_data['service_planned'] = map_values(referral_data['service'], service_code)
+        referral_data['discharge_category'] = map_to_categorical(referral_data['discharge_reason'], discharge_code,
+                                                                 data['discharge_code']['Category'])
+        referral_data['source_category'] = map_to_categorical(referral_data['referral_source'], source_code,
+                                                              data['source_code']['Category'])
         return referral_data
@@ -1,18 +1,22 @@
 import datetime
 
 from crisis_prediction.features.state_feature import StateFeature
-from crisis_prediction.features.utils import dummitize, first_known_to_date, convert_camel_case_column_to_snake_case
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import first_known_to_date, convert_camel_case_column_to_snake_case
 
 
 class ReferralStateFeatures(StateFeature):
+    windowed = True
+
     def __init__(self, end_date: datetime.date = datetime.date.today()):
         super().__init__(end_date=end_date)
         self.source_categories = ['Acute', 'Ambulance', 'Carer', 'Community', 'GP',
                                   'Internal', 'Local Authority', 'Mental_Health',
                                   'Other Agency', 'Primary Care', 'Self']
         self.source_columns = ['referral_state_source_category_{}'.format(c) for c in self.source_categories]
+        self.source_encoder = OneHotEncoder(self.source_columns, 'referral_state_source_category')
 
-    def transform(self, data):
+    def transform(self, data, window_start=None, seeds=None):
         """This function takes a dictionary of dataframes
         with the table names as keys and returns features
         for referrals.
@@ -23,11 +27,10 @@ class ReferralStateFeatures(StateFeature):
             patient_id = data['patient_table']['anonymous_pat_id'].iloc[0]
             return self.transform_empty(patient_id, patients_first_known_date)
         referral_data = data['referral_table'].set_index(['anonymous_pat_id', 'referral_date', 'discharge_date'])
-        referral_data[self.source_columns] = dummitize(referral_data['source_category']
-                                                       .rename('referral_state_source_category'),
-                                                       self.source_columns)
+        referral_data = self.source_encoder.transform(referral_data['source_category'], out=referral_data)
         referral_features = self.state_stats_per_week(referral_data[self.source_columns],
-                                                      patients_first_known_date, argument='max').fillna(0)
+                                                      patients_first_known_date, argument='max',
+                                                      window_start=window_start).fillna(0)
         referral_features.columns = [convert_camel_case_column_to_snake_case(c)
                                      for c in referral_features.columns]
         return referral_features
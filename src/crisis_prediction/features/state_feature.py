@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
-from isoweek import Week
+from pandas.api.types import is_integer_dtype
 
 from crisis_prediction.features.base import Feature
+from crisis_prediction.features.utils import to_days
 
 
 class StateFeature(Feature):
@@ -9,52 +11,63 @@ class StateFeature(Feature):
     def transform(self, data):
         pass
 
-    def state_stats_per_week(self, data, patients_first_known_date, argument='last'):
+    def state_stats_per_week(self, data, patients_first_known_date, argument='last', window_start=None):
         """This function takes the a dataframe indexed by
         (patient_id, starting_date, ending_date) and some
         columns returns a dataframe with the full story
         of a patient index by anonymous_pat_id, date, and the
-        corresponding features for the state.
+        corresponding features for the state. If window_start
+        is passed only the weeks from that ordinal are returned.
         """
-        extended_state = pd.concat([self.get_extended_state_lambda(k, v) for k, v in data.iterrows()]) \
-            .set_index(['anonymous_pat_id', 'year', 'week'])
-        patients_first_known_date = patients_first_known_date.isocalendar()
-        monday_first_week = Week(patients_first_known_date[0], patients_first_known_date[1]).monday()
-        full_history = self.get_full_history(data, monday_first_week)
-        extended_state = extended_state.join(full_history, how='outer')
+        patient_id = data.index.get_level_values(0)[0]
+        return self.state_stats_per_week_batch(data, pd.Series({patient_id: patients_first_known_date}),
+                                               argument=argument, window_start=window_start)
+
+    def state_stats_per_week_batch(self, data, patients_first_known_dates, argument='last', window_start=None):
+        """This function takes a dataframe indexed by
+        (patient_id, starting_date, ending_date) with the states
+        of several patients and a series with the first known date
+        of each patient indexed by anonymous_pat_id, and returns the
+        same as concatenating the output of state_stats_per_week
+        for each patient.
+        """
+        extended_state = self.get_extended_state(data, window_start).set_index(['anonymous_pat_id', 'year', 'week'])
+        full_history = self.create_full_history_batch(patients_first_known_dates, window_start=window_start)
+        # Weeks without state are missing, so integer columns are always float for the dtypes not to depend on them
+        extended_state = extended_state.astype({column: float for column, dtype in extended_state.dtypes.items()
+                                                if is_integer_dtype(dtype)}).join(full_history, how='outer')
         state_features = extended_state.groupby(['anonymous_pat_id', 'year', 'week']).agg(argument)
         return state_features
 
     def get_full_history(self, data, monday_first_week):
-        full_dates = pd.date_range(monday_first_week, self.end_date, freq='W-MON',
-                                   normalize=True, closed='left')
-        full_history = pd.DataFrame({
-            'anonymous_pat_id': [data.index.get_level_values(0)[0]] * len(full_dates),
-            'year': [d.isocalendar()[0] for d in full_dates],
-            'week': [d.isocalendar()[1] for d in full_dates],
-        }).set_index(['anonymous_pat_id', 'year', 'week'])
-        return full_history
-
-    def get_extended_state_lambda(self, index, row):
-        """This function takes a multi_index (patient_id,
-        starting_date, end_date) of a row as well as its
-        row and returns a dataframe filled with the date
-        in between those dates and the corresponding features."""
-        starting_date = index[1].isocalendar()
-        monday_starting_date = Week(starting_date[0], starting_date[1]).monday()
-        end_date = index[2].isocalendar()
-        monday_end_date = Week(end_date[0], end_date[1]).monday()
-        dates = pd.date_range(monday_starting_date, min(monday_end_date, self.end_date), freq='W-MON', normalize=True)
-        if dates.empty:
-            dates = [index[1]]
+        return self.create_full_history_batch(pd.Series({data.index.get_level_values(0)[0]: monday_first_week}))
 
+    def get_extended_state(self, data, window_start=None):
+        """This function takes a dataframe indexed by
+        (patient_id, starting_date, end_date) and returns a
+        dataframe with one row for every week in between those
+        dates -capped at end_date- with the corresponding features.
+        States starting after the cap are kept in their starting week.
+        If window_start is passed the weeks before it are left out.
+        """
+        starting_week = self.calendar.to_ordinal(data.index.get_level_values(1))
+        end_week = self.calendar.to_ordinal(np.minimum(to_days(data.index.get_level_values(2)),
+                                                       np.datetime64(self.end_date, 'D')))
+        if window_start is not None:
+            in_window = (starting_week >= window_start) | (end_week >= window_start)
+            data, starting_week, end_week = data[in_window], starting_week[in_window], end_week[in_window]
+            starting_week = np.maximum(starting_week, window_start)
+        num_weeks = np.maximum(end_week - starting_week + 1, 1)
+        rows = np.repeat(np.arange(len(data)), num_weeks)
+        weeks_offset = np.arange(len(rows)) - np.repeat(np.cumsum(num_weeks) - num_weeks, num_weeks)
+        years, weeks = self.calendar.year_week(starting_week[rows] + weeks_offset)
         extended_state = pd.DataFrame({
             **{
-                'year': [d.isocalendar()[0] for d in dates],
-                'week': [d.isocalendar()[1] for d in dates],
-                'anonymous_pat_id': [index[0]] * len(dates),
+                'year': years,
+                'week': weeks,
+                'anonymous_pat_id': data.index.get_level_values(0).values[rows],
             },
-            **{k: row[k] for k in row.index},
+            **{k: data[k].values[rows] for k in data.columns},
         })
         return extended_state
 
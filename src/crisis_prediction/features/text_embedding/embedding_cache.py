@@ -0,0 +1,39 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """On-disk cache of text embeddings keyed by a hash of the namespace -the model and
+    the settings that change its output- and the text, so that a note is embedded only
+    once across runs. Every embedding is stored as <path>/<first two characters of the key>/<key>.npy.
+    """
+
+    def __init__(self, path: str, namespace: str):
+        self.path = path
+        self.namespace = namespace
+
+    def get_key(self, text: str) -> str:
+        return hashlib.sha256('{}\0{}'.format(self.namespace, text).encode('utf-8')).hexdigest()
+
+    def get_file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + '.npy')
+
+    def get(self, key: str):
+        """Returns the cached embedding of the key or None if it has not been embedded yet."""
+        try:
+            return np.load(self.get_file(key))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, embedding: np.ndarray):
+        """Writes the embedding of the key. The file is renamed into place once written,
+        so concurrent readers never see a partial file.
+        """
+        file = self.get_file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(file), suffix='.npy', delete=False) as tmp:
+            np.save(tmp, embedding)
+        os.replace(tmp.name, file)
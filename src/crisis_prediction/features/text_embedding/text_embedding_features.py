@@ -1,20 +1,49 @@
-import os, datetime
+import os, datetime, hashlib, inspect, tempfile
 import torch
 import numpy as np
+import pandas as pd
 from crisis_prediction.features.base import Feature
+from crisis_prediction.features.text_embedding.embedding_cache import EmbeddingCache
+from crisis_prediction.features.text_embedding.token_windows import get_token_windows
 from crisis_prediction.features.utils import isocalendar_week, isocalendar_year
 from transformers import DistilBertModel, DistilBertTokenizer
 
 
 class TextEmbeddingFeatures(Feature):
+    # torch runs the fp32 model on device_name, quantized a dynamically int8-quantized copy on CPU
+    # and onnx the model exported to ONNX on CPU with ONNX Runtime
+    backends = ['torch', 'quantized', 'onnx']
+
     def __init__(self, device_name: str = 'cuda', cuda_devices: str = '1',
-                 end_date: datetime.date = datetime.date.today()):
+                 end_date: datetime.date = datetime.date.today(), model_name: str = 'distilbert-base-uncased',
+                 batch_size: int = 32, num_threads: int = None, max_length: int = 512, cache_path: str = None,
+                 chunk_overlap: int = None, backend: str = 'torch', onnx_dir: str = None):
+        """
+        :param onnx_dir: directory where the onnx backend stores the exported model, the temporary directory by
+        default. The file is named after a hash of the model revision and config -see get_onnx_path-.
+        """
         super().__init__(end_date=end_date)
+        if backend not in self.backends:
+            raise ValueError('backend must be one of {}'.format(self.backends))
         os.environ["CUDA_VISIBLE_DEVICES"] = cuda_devices
-        self.device = torch.device(device_name)
-        self.bert_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased')
-        self.bert_model = DistilBertModel.from_pretrained('distilbert-base-uncased')
+        self.backend = backend
+        self.device = torch.device(device_name if backend == 'torch' else 'cpu')
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.chunk_overlap = chunk_overlap
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        self.bert_tokenizer = DistilBertTokenizer.from_pretrained(model_name)
+        self.bert_model = DistilBertModel.from_pretrained(model_name)
         self.bert_model.to(self.device)
+        self.bert_model.eval()
+        if backend == 'quantized':
+            self.quantized_model = torch.quantization.quantize_dynamic(self.bert_model, {torch.nn.Linear},
+                                                                       dtype=torch.qint8)
+        if backend == 'onnx':
+            self.onnx_session = self.load_onnx_session(self.get_onnx_path(model_name, onnx_dir), num_threads)
+        self.cache = EmbeddingCache(cache_path, '{}/{}/{}/{}'.format(model_name, max_length, chunk_overlap, backend)) \
+            if cache_path is not None else None
 
     def transform(self, data):
         """
@@ -28,18 +57,139 @@ class TextEmbeddingFeatures(Feature):
         return progress_notes_data
 
     def add_text_embedding_column(self, data):
-        data['Embeddinganonymized_text'] = data['processed_anonymized_text'].apply(lambda doc:
-                                                                                   self.bert_sentence_embedding(
-                                                                                       self.bert_model,
-                                                                                       self.bert_tokenizer,
-                                                                                       doc))
+        embeddings = self.bert_embeddings(data['processed_anonymized_text'].tolist())
+        data['Embeddinganonymized_text'] = pd.Series(list(embeddings), index=data.index, dtype=object)
         return data
 
-    def bert_sentence_embedding(self, model, tokenizer, txt):
-        tokens = tokenizer.encode(txt, max_length=512)
-        inputs = torch.tensor([tokens])
-        states = model(inputs.to(self.device))
-        return states[0].detach().cpu().numpy().mean(axis=1)[0]
+    def bert_embeddings(self, texts):
+        """
+        Takes a list of texts and returns an array with the mean of the last hidden state over
+        the tokens of each of them. Texts already in the cache and repeated texts are not embedded
+        again. The windows of the rest -see get_token_windows- are sorted by number of tokens and
+        embedded in batches of batch_size padded to the longest window of the batch, so windows of
+        different notes share batches. Notes split in several windows are pooled back weighting
+        each window by its number of tokens.
+        """
+        if not texts:
+            return np.empty((0, self.bert_model.config.hidden_size), dtype=np.float32)
+        keys = [self.cache.get_key(txt) if self.cache is not None else txt for txt in texts]
+        embeddings = {}
+        if self.cache is not None:
+            for key in set(keys):
+                embedding = self.cache.get(key)
+                if embedding is not None:
+                    embeddings[key] = embedding
+        to_embed = {key: txt for key, txt in zip(keys, texts) if key not in embeddings}
+        windows = [(key, tokens) for key, txt in to_embed.items() for tokens in self.get_token_windows(txt)]
+        windows.sort(key=lambda window: len(window[1]))
+        sums, num_tokens = {}, {}
+        for i in range(0, len(windows), self.batch_size):
+            batch = windows[i:i + self.batch_size]
+            for (key, tokens), embedding in zip(batch, self.bert_batch_embedding([tokens for _, tokens in batch])):
+                sums[key] = sums.get(key, 0) + embedding.astype(np.float64) * len(tokens)
+                num_tokens[key] = num_tokens.get(key, 0) + len(tokens)
+        for key in to_embed:
+            embeddings[key] = (sums[key] / num_tokens[key]).astype(np.float32)
+            if self.cache is not None:
+                self.cache.put(key, embeddings[key])
+        return np.stack([embeddings[key] for key in keys])
+
+    def get_token_windows(self, txt):
+        """Takes a text and returns the list of token ids lists to embed -see token_windows.get_token_windows-."""
+        return get_token_windows(self.bert_tokenizer, txt, self.max_length, self.chunk_overlap)
+
+    def bert_batch_embedding(self, batch_tokens, backend=None):
+        """
+        Takes a list of token ids lists and returns the mean of the last hidden state over the tokens of each one,
+        computed with the passed backend -the one of the feature by default-.
+        """
+        max_tokens = max(len(tokens) for tokens in batch_tokens)
+        input_ids = torch.full((len(batch_tokens), max_tokens), self.bert_tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch_tokens), max_tokens), dtype=torch.long)
+        for row, tokens in enumerate(batch_tokens):
+            input_ids[row, :len(tokens)] = torch.tensor(tokens, dtype=torch.long)
+            attention_mask[row, :len(tokens)] = 1
+        with getattr(torch, 'inference_mode', torch.no_grad)():
+            states = self.get_last_hidden_state(input_ids, attention_mask, backend or self.backend)
+            mask = attention_mask.to(states.device).unsqueeze(-1).to(states.dtype)
+            embeddings = (states * mask).sum(dim=1) / mask.sum(dim=1)
+        return embeddings.cpu().numpy()
+
+    def get_last_hidden_state(self, input_ids, attention_mask, backend):
+        if backend == 'onnx':
+            return torch.from_numpy(self.onnx_session.run(None, {'input_ids': input_ids.numpy(),
+                                                                 'attention_mask': attention_mask.numpy()})[0])
+        model = self.quantized_model if backend == 'quantized' else self.bert_model
+        return model(input_ids.to(self.device), attention_mask=attention_mask.to(self.device))[0]
+
+    def get_onnx_path(self, model_name, onnx_dir=None):
+        """
+        Returns the file of onnx_dir -the temporary directory by default- where the model is exported. Its name
+        is a hash of the model name, the revision of the weights -the commit hash resolved by from_pretrained-,
+        the model config and the torch version, so a different model or revision is never read from a stale export.
+        """
+        config = self.bert_model.config
+        key = hashlib.sha256('{}\0{}\0{}\0{}'.format(model_name, getattr(config, '_commit_hash', None),
+                                                     config.to_json_string(), torch.__version__).encode('utf-8'))
+        return os.path.join(onnx_dir or tempfile.gettempdir(),
+                            '{}-{}.onnx'.format(model_name.replace('/', '_'), key.hexdigest()[:16]))
+
+    def load_onnx_session(self, onnx_path, num_threads=None):
+        """
+        Exports the model to onnx_path, unless it was already exported, and returns an ONNX Runtime
+        session with all the graph optimizations enabled to run it on CPU. The model is exported to a
+        temporary file that is renamed into place once written, so concurrent runs never read a partial file.
+        """
+        import onnxruntime
+
+        if not os.path.exists(onnx_path):
+            os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+            dummy_input = torch.full((1, 8), self.bert_tokenizer.pad_token_id, dtype=torch.long)
+            axes = {0: 'batch', 1: 'tokens'}
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(onnx_path), suffix='.onnx')
+            os.close(fd)
+            try:
+                torch.onnx.export(self.bert_model, (dummy_input, torch.ones_like(dummy_input)), tmp_path,
+                                  input_names=['input_ids', 'attention_mask'], output_names=['last_hidden_state'],
+                                  dynamic_axes={'input_ids': axes, 'attention_mask': axes, 'last_hidden_state': axes},
+                                  opset_version=13, **self.get_onnx_export_kwargs())
+                os.replace(tmp_path, onnx_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        return onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+    @staticmethod
+    def get_onnx_export_kwargs():
+        """
+        Returns the arguments that select the TorchScript exporter of torch.onnx.export. Since torch 2.9 the default
+        exporter is the torch.export based one, which needs onnxscript and does not take dynamic_axes.
+        """
+        return {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+
+    def embedding_drift(self, texts):
+        """
+        Takes a list of texts and returns how much the embeddings of their windows computed
+        with the backend of the feature differ from the ones of the fp32 torch model: the
+        mean and minimum cosine similarity and the maximum absolute difference.
+        """
+        windows = sorted((tokens for txt in texts for tokens in self.get_token_windows(txt)), key=len)
+        embeddings, reference = [], []
+        for i in range(0, len(windows), self.batch_size):
+            embeddings.append(self.bert_batch_embedding(windows[i:i + self.batch_size]))
+            reference.append(self.bert_batch_embedding(windows[i:i + self.batch_size], backend='torch'))
+        embeddings, reference = np.concatenate(embeddings), np.concatenate(reference)
+        cosine_similarity = (embeddings * reference).sum(axis=1) / \
+            (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+        return {
+            'mean_cosine_similarity': float(cosine_similarity.mean()),
+            'min_cosine_similarity': float(cosine_similarity.min()),
+            'max_abs_difference': float(np.abs(embeddings - reference).max()),
+        }
 
     @property
     def schema_out(self):
@@ -1,20 +1,60 @@
 from crisis_prediction.features.base import Preprocessor
+import numpy as np
 import re
 
+TAG_PATTERN = re.compile(r'<[^>]*>')
+
 
 class TextEmbeddingPreprocessor(Preprocessor):
 
+    def __init__(self, chunk_size: int = None):
+        """
+        :param chunk_size: number of notes cleaned at once. Only the temporary strings of one chunk are held
+        in memory at the same time. All the notes are cleaned at once by default
+        """
+        super().__init__()
+        self.chunk_size = chunk_size
+
     def transform(self, data):
         data['clinical_notes_table'] = self.add_processed_text_column(data['clinical_notes_table'])
         return data
 
     def add_processed_text_column(self, data):
-        data['processed_anonymized_text'] = data['anonymized_text'].apply(self.preprocess_text)
+        if self.chunk_size is None:
+            data['processed_anonymized_text'] = self.preprocess_texts(data['anonymized_text'])
+        else:
+            processed_texts = np.empty(len(data), dtype=object)
+            for i in range(0, len(data), self.chunk_size):
+                processed_texts[i:i + self.chunk_size] = \
+                    self.preprocess_texts(data['anonymized_text'].iloc[i:i + self.chunk_size]).values
+            data['processed_anonymized_text'] = processed_texts
         return data
 
+    def iter_processed_chunks(self, chunks):
+        """
+        Takes an iterable of chunks of the clinical notes table -for instance the iterator returned by
+        pd.read_csv with chunksize- and yields them with the processed_anonymized_text column, so that
+        the table is never fully loaded.
+        """
+        for chunk in chunks:
+            yield self.add_processed_text_column(chunk)
+
+    @classmethod
+    def preprocess_texts(cls, texts):
+        """Vectorized version of preprocess_text for a series of texts."""
+        return texts.str.replace('&nbsp;', ' ', regex=False).str.replace(TAG_PATTERN, ' ', regex=True) \
+            .map(cls.collapse_whitespace, na_action='ignore')
+
     @staticmethod
-    def preprocess_text(txt):
-        txt = re.sub(r'(&nbsp;)', ' ', txt)
-        txt = re.sub(r'<[^>]*>', ' ', txt)
-        txt = re.sub(r'\s+', ' ', txt)
-        return txt
+    def collapse_whitespace(txt):
+        """Same as re.sub(r'\\s+', ' ', txt) without regex, str.split splits on the characters of \\s."""
+        words = txt.split()
+        if not words:
+            return ' ' if txt else txt
+        return (' ' if txt[0].isspace() else '') + ' '.join(words) + (' ' if txt[-1].isspace() else '')
+
+    @classmethod
+    def preprocess_text(cls, txt):
+        txt = txt.replace('&nbsp;', ' ')
+        txt = TAG_PATTERN.sub(' ', txt)
+        return cls.collapse_whitespace(txt)
@@ -0,0 +1,17 @@
+def get_token_windows(tokenizer, txt, max_length, chunk_overlap=None):
+    """
+    Takes a tokenizer and a text and returns the list of token ids lists to embed. Without chunk_overlap the
+    text is truncated at max_length tokens. With chunk_overlap the text is split in windows of max_length
+    tokens -special tokens included- that overlap in chunk_overlap tokens, the last one ending at the last
+    token, so that the whole text is embedded. A text that fits in one window gives the truncated tokens.
+    """
+    if chunk_overlap is None:
+        return [tokenizer.encode(txt, max_length=max_length, truncation=True)]
+    tokens = tokenizer.encode(txt, add_special_tokens=False)
+    window_size = max_length - tokenizer.num_special_tokens_to_add()
+    if not 0 <= chunk_overlap < window_size:
+        raise ValueError('chunk_overlap must be between 0 and {}'.format(window_size - 1))
+    starts = list(range(0, max(len(tokens) - window_size, 0) + 1, window_size - chunk_overlap))
+    if starts[-1] + window_size < len(tokens):
+        starts.append(len(tokens) - window_size)
+    return [tokenizer.build_inputs_with_special_tokens(tokens[start:start + window_size]) for start in starts]
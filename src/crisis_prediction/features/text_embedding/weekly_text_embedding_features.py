@@ -0,0 +1,110 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.base import Feature
+from crisis_prediction.features.utils import first_known_to_date, monday_of_week, to_days
+
+INDEX_COLUMNS = ['anonymous_pat_id', 'year', 'week']
+
+
+class WeeklyTextEmbeddingFeatures(Feature):
+    dependencies = ['TextEmbeddingFeatures']
+    poolings_available = ['mean', 'max', 'recency']
+
+    def __init__(self, end_date: datetime.date = datetime.date.today(), poolings=['mean', 'max', 'recency'],
+                 embedding_dim: int = 768, dtype=np.float16, recency_half_life_days: float = 2.):
+        """
+        :param poolings: statistics used to pool the embeddings of the notes of every week. recency is the mean
+        weighted by exp(-ln(2) * days until the end of the week / recency_half_life_days)
+        :param dtype: floating point type of the pooled embeddings
+        """
+        super().__init__(end_date)
+        self.poolings = poolings
+        self.embedding_dim = embedding_dim
+        self.dtype = dtype
+        self.recency_half_life_days = recency_half_life_days
+
+    def transform(self, data):
+        """
+        Takes a dictionary of dataframes with the output of TextEmbeddingFeatures -one row per note- and the
+        patient_table, and returns the note embeddings pooled by patient, year and week. The output has one row
+        for every week from the first known date of each patient until end_date -weeks without notes are 0- and
+        the pooled embeddings of every pooling are the columns note_embedding_{pooling}_{i}, all of them backed by
+        a single contiguous dtype matrix, together with the number of notes of the week.
+        """
+        patient_table = data['patient_table'].drop_duplicates('anonymous_pat_id')
+        full_history = self.create_full_history_batch(pd.Series(
+            [first_known_to_date(str(first_known)) for first_known in patient_table['first_year_month']],
+            index=patient_table['anonymous_pat_id'].values))
+        notes = data['TextEmbeddingFeatures']
+        note_weeks = pd.MultiIndex.from_arrays([notes[c].values for c in INDEX_COLUMNS], names=INDEX_COLUMNS)
+        rows = full_history.index.get_indexer(note_weeks)
+        notes, rows = notes[rows >= 0], rows[rows >= 0]
+        order = np.argsort(rows, kind='stable')
+        rows = rows[order]
+        embeddings = np.stack(notes['Embeddinganonymized_text'].values[order]).astype(np.float32) \
+            if len(notes) else np.empty((0, self.embedding_dim), dtype=np.float32)
+        week_rows, starts, num_notes = np.unique(rows, return_index=True, return_counts=True)
+
+        pooled = np.zeros((len(full_history), len(self.poolings) * self.embedding_dim), dtype=self.dtype)
+        for i, pooling in enumerate(self.poolings):
+            pooled[week_rows, i * self.embedding_dim:(i + 1) * self.embedding_dim] = \
+                self.pool(embeddings, starts, num_notes, pooling, notes['entered_datetime'].values[order])
+        features = pd.DataFrame(pooled, index=full_history.index, columns=self._get_embedding_column_names())
+        features['num_notes'] = np.bincount(week_rows, weights=num_notes, minlength=len(full_history)).astype(int)
+        return features
+
+    def pool(self, embeddings, starts, num_notes, pooling, entered_datetimes):
+        """
+        Takes the note embeddings sorted by week, the position of the first note of every week and the number
+        of notes per week, and returns one pooled embedding per week.
+        """
+        if not len(starts):
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        if pooling == 'mean':
+            return np.add.reduceat(embeddings, starts) / num_notes[:, None]
+        if pooling == 'max':
+            return np.maximum.reduceat(embeddings, starts)
+        if pooling == 'recency':
+            days_to_week_end = (monday_of_week(entered_datetimes) + 6 - to_days(entered_datetimes)).astype(np.int64)
+            weights = np.exp(-np.log(2) * days_to_week_end / self.recency_half_life_days).astype(np.float32)
+            return np.add.reduceat(embeddings * weights[:, None], starts) / np.add.reduceat(weights, starts)[:, None]
+        raise ValueError('pooling must be one of {}'.format(self.poolings_available))
+
+    @staticmethod
+    def save(features, path):
+        """
+        Writes the output of transform to the directory path as .npy files -the index, the pooled
+        embeddings, their column names and the number of notes- that load can memory-map.
+        """
+        os.makedirs(path, exist_ok=True)
+        embedding_columns = [c for c in features.columns if c != 'num_notes']
+        np.save(os.path.join(path, 'index.npy'),
+                np.stack([features.index.get_level_values(c).values.astype(np.int64) for c in INDEX_COLUMNS], axis=1))
+        np.save(os.path.join(path, 'embeddings.npy'), np.ascontiguousarray(features[embedding_columns].to_numpy()))
+        np.save(os.path.join(path, 'embedding_columns.npy'), np.array(embedding_columns))
+        np.save(os.path.join(path, 'num_notes.npy'), features['num_notes'].to_numpy())
+
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        """
+        Reads the features written by save. The pooled embeddings are memory-mapped, not read, unless mmap_mode
+        is None, and the returned DataFrame is backed by them without copies.
+        """
+        index = np.load(os.path.join(path, 'index.npy'))
+        features = pd.DataFrame(np.load(os.path.join(path, 'embeddings.npy'), mmap_mode=mmap_mode),
+                                index=pd.MultiIndex.from_arrays(index.T, names=INDEX_COLUMNS),
+                                columns=np.load(os.path.join(path, 'embedding_columns.npy')).tolist(), copy=False)
+        features['num_notes'] = np.load(os.path.join(path, 'num_notes.npy'))
+        return features
+
+    def _get_embedding_column_names(self):
+        return ['note_embedding_{}_{}'.format(pooling, i) for pooling in self.poolings
+                for i in range(self.embedding_dim)]
+
+    @property
+    def schema_out(self):
+        return {**{k: float for k in self._get_embedding_column_names()}, 'num_notes': int}
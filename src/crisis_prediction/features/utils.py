@@ -6,15 +6,88 @@ import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.config import START_DATE
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
 
 
 def dummitize(data, column_names):
     """Takes a pandas.Series (data) and column names
     and returns the dummitized version with all columns.
+    The columns that do not start with the name of data
+    are all zeros. Features encoding the same columns for
+    every patient should build a OneHotEncoder once instead.
     """
-    features = pd.DataFrame(columns=column_names)
-    features = pd.concat([features, pd.get_dummies(data, prefix=data.name)], sort=False).fillna(0)
-    return features[column_names]
+    prefixed = [c for c in column_names if c.startswith('{}_'.format(data.name))]
+    return OneHotEncoder(prefixed, data.name).transform(data).reindex(columns=column_names, fill_value=0)
+
+
+def map_values(data, mapping):
+    """Takes a pandas.Series (data) and a dict or function and returns
+    data.map(mapping) as a plain Series. On a categorical data the mapping
+    is applied once per category -and the result is a categorical whenever
+    the mapped categories are unique-, so it is converted back to the values.
+    """
+    mapped = data.map(mapping)
+    if isinstance(mapped.dtype, pd.CategoricalDtype):
+        mapped = pd.Series(np.asarray(mapped), index=mapped.index, name=mapped.name)
+    return mapped
+
+
+def map_to_categorical(data, mapping, categories):
+    """Takes a pandas.Series (data), a dict and the categories of the result, and
+    returns data.map(mapping) as a categorical with those categories -the values
+    not mapped to one of them are missing-. The mapping is applied once per
+    distinct value of data, so the vocabulary of the result does not depend on
+    the values of data and is the same for every patient.
+    """
+    codes, uniques = pd.factorize(data)
+    categories = pd.Index(categories).dropna().unique()
+    unique_codes = categories.get_indexer(pd.Series(np.asarray(uniques), dtype=object).map(mapping))
+    return pd.Series(pd.Categorical.from_codes(np.append(unique_codes, -1)[codes], categories),
+                     index=data.index, name=data.name)
+
+
+def smallest_dtypes(values, integer, nullable):
+    """Takes a 2-D float numpy array (values) with missing values as NaN and two
+    boolean arrays with one element per column, and returns the smallest dtype
+    that holds every column. Integer valued columns get int8, int16, int32 or
+    int64 -the nullable Int version if they have missing values and nullable is
+    set- when integer is set, and the rest float32 unless that loses integers.
+    """
+    missing = np.isnan(values)
+    has_missing = missing.any(axis=0)
+    filled = np.where(missing, 0, values)
+    integral = (np.isfinite(filled) & (filled == np.round(filled))).all(axis=0)
+    low, high = filled.min(axis=0, initial=0), filled.max(axis=0, initial=0)
+    dtypes = []
+    for i in range(values.shape[1]):
+        if integer[i] and integral[i] and (nullable[i] or not has_missing[i]):
+            dtype = next(np.dtype(t) for t in (np.int8, np.int16, np.int32, np.int64)
+                         if np.iinfo(t).min <= low[i] and high[i] <= np.iinfo(t).max)
+            dtypes.append(pd.api.types.pandas_dtype(dtype.name.capitalize()) if has_missing[i] else dtype)
+        # float32 holds integers exactly only up to 2 ** 24
+        elif integral[i] and max(-low[i], high[i]) > 2 ** 24:
+            dtypes.append(np.dtype(np.float64))
+        else:
+            dtypes.append(np.dtype(np.float32))
+    return dtypes
+
+
+def read_only_projection(data, columns):
+    """Takes a pandas.DataFrame and a list of columns and returns the column
+    subset sharing memory with data instead of copying it. Numpy backed columns
+    are read-only, so in-place writes raise instead of modifying data, while
+    adding or replacing columns works as usual.
+    """
+    if not columns:
+        return data[[]]
+    projection = []
+    for column in columns:
+        values = data[column].values
+        if isinstance(values, np.ndarray):
+            values = values.view()
+            values.flags.writeable = False
+        projection.append(pd.Series(values, index=data.index, name=column, copy=False))
+    return pd.concat(projection, axis=1, copy=False)
 
 
 def add_missing_columns(df, columns):
@@ -75,6 +148,29 @@ def create_patients_data(patient, first_known):
     return patients_data
 
 
+def to_days(dates):
+    """Takes an array-like of dates/datetimes and returns them as a numpy datetime64[D] array."""
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+
+
+def iso_year_week(dates):
+    """Vectorized version of isocalendar for a set of dates. It returns two integer
+    numpy arrays with the ISO year and the ISO week of each date.
+    """
+    days = to_days(dates).astype(np.int64)
+    # 1970-01-01 was a Thursday, ISO weeks belong to the year of their Thursday
+    thursday = days - (days + 3) % 7 + 3
+    iso_year = thursday.astype('datetime64[D]').astype('datetime64[Y]')
+    iso_week = (thursday - iso_year.astype('datetime64[D]').astype(np.int64)) // 7 + 1
+    return iso_year.astype(np.int64) + 1970, iso_week
+
+
+def monday_of_week(dates):
+    """Takes an array-like of dates and returns the Monday of their week as a datetime64[D] array."""
+    days = to_days(dates).astype(np.int64)
+    return (days - (days + 3) % 7).astype('datetime64[D]')
+
+
 def iso_to_gregorian(iso_year, iso_week, iso_day):
     jan4 = datetime.date(iso_year, 1, 4)
     start = jan4 - datetime.timedelta(days=jan4.isoweekday() - 1)
@@ -86,7 +182,8 @@ def cap_dates(dates):
 
 
 def get_month(week):
-    return int(np.ceil(week / 4.42))
+    """Takes an ISO week, or an array-like of them, and returns its approximate month as an integer."""
+    return np.ceil(np.asarray(week) / 4.42).astype(np.int64)
 
 
 def difference_in_months(date_start, date_end):
@@ -1,10 +1,10 @@
 from datetime import date
 
+import numpy as np
 import pandas as pd
 
 from crisis_prediction.features.base import Transformer
 from crisis_prediction.features.config import START_DATE
-from crisis_prediction.features.utils import to_year_month
 
 
 class ValidUsers(Transformer):
@@ -14,22 +14,53 @@ class ValidUsers(Transformer):
         self.minimum_num_days = minimum_num_days
         self.remove_dead = remove_dead
 
+    @Transformer.apply_schemata
     def transform(self, data, end_date: date = date.today()):
-        first_day_month = date(end_date.year, end_date.month, 1)
+        """
+        Returns a sorted numpy array with the ids of the patients with at least minimum_num_crisis
+        crises since START_DATE, known for at least minimum_num_days days before the month of
+        end_date and -if remove_dead- not dead.
+        """
         patients = data['patient_table']
-        crisis_events_table = data['crisis_table'].copy()
-        crisis_events_table['event_date'] = pd.to_datetime(crisis_events_table['event_date'])
-        crisis_events_table = crisis_events_table[crisis_events_table['event_date'] >= pd.to_datetime(START_DATE)]
-        num_crisis = crisis_events_table.groupby('anonymous_pat_id')['event_date'].count()
-        valid_patients = list(num_crisis[num_crisis >= self.minimum_num_crisis].index)
-        valid_patients_df = patients[patients['anonymous_pat_id'].isin(valid_patients)]
-        cond = (first_day_month - valid_patients_df['first_year_month'].apply(
-            to_year_month)).dt.days >= self.minimum_num_days
+        crisis_events_table = data['crisis_table']
+        event_dates = pd.to_datetime(crisis_events_table['event_date'])
+        num_crisis = crisis_events_table['anonymous_pat_id'][event_dates >= pd.to_datetime(START_DATE)].value_counts()
+        cond = patients['anonymous_pat_id'].isin(num_crisis.index[num_crisis >= self.minimum_num_crisis]).values
+        first_day_month = np.datetime64(date(end_date.year, end_date.month, 1), 'D').astype(np.int64)
+        cond &= first_day_month - self.year_month_to_days(patients['first_year_month']) >= self.minimum_num_days
         if self.remove_dead:
-            cond = cond & ((valid_patients_df['month_year_death'] >= 290012) | (
-                valid_patients_df['month_year_death'].isnull()))
-        valid_patients = list(valid_patients_df[cond]['anonymous_pat_id'])
-        return valid_patients
+            cond &= ((patients['month_year_death'] >= 290012) | (patients['month_year_death'].isnull())).values
+        return np.unique(patients['anonymous_pat_id'].values[cond])
+
+    @staticmethod
+    def year_month_to_days(year_months):
+        """Vectorized version of to_year_month, it returns the first day of each YYYYMM value as days
+        since 1970-01-01 in a float array, with NaN for missing values.
+        """
+        year_months = pd.to_numeric(year_months.astype(str).str[:6], errors='coerce').values
+        days = np.full(len(year_months), np.nan)
+        known = ~np.isnan(year_months)
+        months = (year_months[known] // 100 - 1970) * 12 + year_months[known] % 100 - 1
+        days[known] = months.astype(np.int64).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+        return days
+
+    @staticmethod
+    def prune_tables(data, valid_patients):
+        """
+        Takes a dictionary of dataframes and the sorted array returned by transform and returns the
+        same dictionary keeping only the rows of the valid patients in the tables with an
+        anonymous_pat_id column. Lookup tables are returned as they are.
+        """
+        pruned_data = {}
+        for table, df in data.items():
+            if 'anonymous_pat_id' in df.columns and len(valid_patients):
+                patient_ids = df['anonymous_pat_id'].values
+                positions = np.minimum(np.searchsorted(valid_patients, patient_ids), len(valid_patients) - 1)
+                df = df[valid_patients[positions] == patient_ids]
+            elif 'anonymous_pat_id' in df.columns:
+                df = df.iloc[:0]
+            pruned_data[table] = df
+        return pruned_data
 
     @property
     def schema(self):
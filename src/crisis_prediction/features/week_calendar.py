@@ -0,0 +1,71 @@
+import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from crisis_prediction.features.config import START_DATE
+from crisis_prediction.features.utils import iso_year_week, monday_of_week, to_days
+
+
+class WeekCalendar:
+    """Precomputed ISO calendar of the weeks between START_DATE and end_date.
+    Weeks are identified by an integer ordinal (0 is the week of START_DATE)
+    that can be mapped to its Monday and its (year, week) pair. Weeks outside
+    the calendar are computed on the fly.
+    """
+
+    def __init__(self, end_date: datetime.date, start_date: datetime.date = START_DATE):
+        self.end_date = end_date
+        self.first_monday = monday_of_week([start_date])[0]
+        self.end_day = to_days([end_date])[0]
+        num_weeks = max(0, int((self.end_day - self.first_monday).astype(np.int64)) // 7 + 1)
+        self.mondays = self.first_monday + 7 * np.arange(num_weeks)
+        self.years, self.weeks = iso_year_week(self.mondays)
+
+    def __len__(self):
+        return len(self.mondays)
+
+    def to_ordinal(self, dates):
+        """Takes an array-like of dates and returns the ordinal of their week."""
+        return (monday_of_week(dates) - self.first_monday).astype(np.int64) // 7
+
+    def from_year_week(self, years, weeks):
+        """Takes arrays of ISO years and weeks and returns the ordinal of those weeks."""
+        jan_4th = (np.asarray(years, dtype=np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[D]') + 3
+        mondays = monday_of_week(jan_4th) + 7 * (np.asarray(weeks, dtype=np.int64) - 1)
+        return (mondays - self.first_monday).astype(np.int64) // 7
+
+    def last_week(self):
+        """Ordinal of the last week before end_date."""
+        return self.to_ordinal([self.end_day - 1])[0]
+
+    def monday(self, ordinals):
+        return self.first_monday + 7 * np.asarray(ordinals, dtype=np.int64)
+
+    def year_week(self, ordinals):
+        """Takes an array-like of week ordinals and returns two integer arrays with their ISO year and week."""
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        in_calendar = (ordinals >= 0) & (ordinals < len(self))
+        if in_calendar.all():
+            return self.years[ordinals], self.weeks[ordinals]
+        years, weeks = iso_year_week(self.monday(ordinals))
+        years[in_calendar], weeks[in_calendar] = self.years[ordinals[in_calendar]], self.weeks[ordinals[in_calendar]]
+        return years, weeks
+
+    def num_weeks_to_end_date(self, dates):
+        """Number of weeks from the week of each date until end_date, with the same
+        semantics as pd.date_range(monday, end_date, freq='W-MON', closed='left').
+        """
+        days_to_end = (self.end_day - monday_of_week(dates)).astype(np.int64)
+        return np.where(days_to_end > 0, -(-days_to_end // 7), (days_to_end == 0).astype(np.int64))
+
+    def week_range(self, first_date):
+        """Ordinals of the weeks from the week of first_date until end_date."""
+        first_ordinal = self.to_ordinal([first_date])[0]
+        return np.arange(first_ordinal, first_ordinal + self.num_weeks_to_end_date([first_date])[0])
+
+
+@lru_cache(maxsize=None)
+def get_week_calendar(end_date: datetime.date) -> WeekCalendar:
+    """Returns the process-wide calendar for end_date, building it the first time it is requested."""
+    return WeekCalendar(end_date)
@@ -101,7 +101,8 @@ class NeuralNetworkModel(AlphaModel):
             self.model = Model(inputs=[struct_input], outputs=output)
         else:
             self.model = Model(inputs=[struct_input, word_input, time_input], outputs=output)
-            self.feature_names.append(self.embedding_feature)
+            self.feature_names.extend(self.embedding_feature if isinstance(self.embedding_feature, list)
+                                      else [self.embedding_feature])
             self.feature_names.append(self.weeks_elapsed_feature)
 
         self.model.compile(
@@ -123,8 +124,11 @@ class NeuralNetworkModel(AlphaModel):
         if self.struct_features_only:
             input_data = data[self.struct_features]
         else:
+            # A list of columns, such as the pooled embeddings of WeeklyTextEmbeddingFeatures, is already a matrix
+            embeddings = data[self.embedding_feature].to_numpy(np.float32) \
+                if isinstance(self.embedding_feature, list) else np.stack(data[self.embedding_feature])
             input_data = [data[self.struct_features],
-                          np.stack(data[self.embedding_feature]),
+                          embeddings,
                           data[self.weeks_elapsed_feature]]
         return input_data
 
@@ -2,9 +2,10 @@ from crisis_prediction.validators.compute_group_metrics import ComputeGroupMetri
 
 
 def validate_time_split_data(model, loader, config, preprocessors, target_name='crisis_in_4_weeks',
-                             flag_average_precision=False):
-    train_data = loader.load(start=config['train_start'], end=config['train_end'])
-    test_data = loader.load(start=config['validation_start'], end=config['validation_end'])
+                             flag_average_precision=False, project_columns=False):
+    load_kwargs = {'columns': model.feature_names + [target_name]} if project_columns else {}
+    train_data = loader.load(start=config['train_start'], end=config['train_end'], **load_kwargs)
+    test_data = loader.load(start=config['validation_start'], end=config['validation_end'], **load_kwargs)
     for preprocessor in preprocessors:
         train_data, test_data = preprocessor.preprocess(train_data, test_data)
     model.fit(train_data)
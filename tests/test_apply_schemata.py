@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.base import Transformer
+from crisis_prediction.features.exceptions import SchemaException
+
+
+class Reader(Transformer):
+    """Returns the data that apply_schemata passes to transform."""
+
+    @Transformer.apply_schemata
+    def transform(self, data):
+        return data
+
+    @property
+    def schema(self):
+        return {'crisis_table': {'anonymous_pat_id': int, 'severity': float, 'crisis_type': object}}
+
+
+def crisis_table():
+    return pd.DataFrame({'anonymous_pat_id': [1, 1, 2], 'severity': [1., 3., 2.], 'crisis_type': ['TR', 'BM', 'IP'],
+                         'event_date': pd.to_datetime(['2019-01-01', '2019-02-01', '2019-03-01'])})
+
+
+def test_the_projection_shares_memory_and_rejects_in_place_writes():
+    table = crisis_table()
+    lookup = pd.DataFrame({'Severity': [1, 3]})
+
+    data = Reader().transform({'crisis_table': table, 'crisis_severity': lookup})
+
+    projection = data['crisis_table']
+    assert projection.columns.tolist() == ['anonymous_pat_id', 'severity', 'crisis_type']
+    assert data['crisis_severity'] is lookup
+    for column in ['anonymous_pat_id', 'severity']:
+        assert np.shares_memory(projection[column].values, table[column].values)
+        with pytest.raises(ValueError, match='read-only'):
+            projection[column].values[0] = 0
+    projection['severity'] = projection['severity'] * 2
+    pd.testing.assert_frame_equal(table, crisis_table())
+
+
+def test_missing_tables_and_columns_raise():
+    with pytest.raises(SchemaException, match='crisis_table DataFrame not passed to Reader'):
+        Reader().transform({})
+    with pytest.raises(SchemaException, match='crisis_table DataFrame passed to Reader missing the severity column'):
+        Reader().transform({'crisis_table': crisis_table().drop(columns='severity')})
+
+
+def test_non_numeric_dtypes_raise_also_after_a_table_was_validated():
+    table = crisis_table()
+    Reader().transform({'crisis_table': table})
+
+    table['severity'] = table['severity'].astype(str)
+
+    with pytest.raises(SchemaException, match='non numeric dtype object in the severity column'):
+        Reader().transform({'crisis_table': table})
+
+
+def test_empty_tables_are_passed_as_they_are():
+    table = crisis_table().iloc[:0]
+
+    assert Reader().transform({'crisis_table': table})['crisis_table'] is table
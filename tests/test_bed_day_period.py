@@ -0,0 +1,25 @@
+import datetime
+
+import pandas as pd
+
+from crisis_prediction.features.bed_days.bed_day_period import BedDayPeriod
+
+
+def test_bed_days_with_missing_dates_are_left_out():
+    bed_days = pd.DataFrame({
+        'anonymous_pat_id': [1, 1, 1, 1, 2, 2],
+        'date_in_bed': [datetime.date(2019, 1, 3), None, datetime.date(2019, 1, 1), datetime.date(2019, 1, 2),
+                        datetime.date(2019, 5, 1), datetime.date(2019, 5, 2)],
+        'date_admission': [0, 1, 1, 0, 1, 1],
+        'date_leave': [0, 1, 0, 1, 0, 0],
+        'level_of_observation': ['LEVEL2', 'LEVEL4', 'LEVEL1', None, 'LEVEL3', 'LEVEL1']})
+
+    bed_day_periods = BedDayPeriod().transform({'hospitalization_table': bed_days})
+
+    assert bed_day_periods.index.tolist() == [
+        (1, pd.Timestamp('2019-01-01'), pd.Timestamp('2019-01-03')),
+        (2, pd.Timestamp('2019-05-01'), pd.Timestamp('2019-05-01')),
+        (2, pd.Timestamp('2019-05-02'), pd.Timestamp('2019-05-02'))]
+    assert bed_day_periods['number_of_bed_days'].tolist() == [3, 1, 1]
+    assert bed_day_periods['number_of_leave_days'].tolist() == [1, 0, 0]
+    assert bed_day_periods['level_of_obs_max'].tolist() == [2, 3, 1]
@@ -0,0 +1,61 @@
+import datetime
+
+import pandas as pd
+
+from crisis_prediction.features.during_crisis.bed_days_during_crisis_period import BedDaysDuringCrisisPeriod
+
+
+def crisis_periods():
+    return pd.DataFrame({
+        'number_of_crisis': [3, 1, 2],
+        'start_crisis_period_monday': [datetime.date(2019, 1, 7), datetime.date(2019, 3, 4), datetime.date(2019, 1, 7)],
+        'end_crisis_period_monday': [datetime.date(2019, 1, 28), datetime.date(2019, 3, 11),
+                                     datetime.date(2019, 1, 14)]},
+        index=pd.MultiIndex.from_tuples([(1, 1), (1, 2), (2, 1)],
+                                        names=['anonymous_pat_id', 'number_crisis_burst_1week']))
+
+
+def bed_day_periods():
+    periods = [(1, '2019-01-08', '2019-01-10'), (1, '2019-01-20', '2019-01-28'), (1, '2019-01-25', '2019-02-05'),
+               (1, '2019-02-15', '2019-02-16'), (1, '2019-03-04', '2019-03-05'), (2, '2019-01-08', '2019-01-09'),
+               (2, '2019-03-04', '2019-03-05')]
+    return pd.DataFrame({
+        'number_of_bed_days': [3, 9, 12, 2, 2, 2, 2],
+        'number_of_leave_days': [1, 0, 2, 0, 1, 0, 0],
+        'level_of_obs_max': [2, 3, 4, 1, 1, 4, 2],
+        'level_of_obs_1': [1, 0, 0, 1, 1, 0, 0],
+        'level_of_obs_2': [1, 1, 0, 0, 0, 0, 1],
+        'level_of_obs_3': [0, 1, 0, 0, 0, 0, 0],
+        'level_of_obs_4': [0, 0, 1, 0, 0, 1, 0],
+        'level_of_obs_1_number_of_days': [1, 0, 0, 2, 2, 0, 0],
+        'level_of_obs_2_number_of_days': [2, 4, 0, 0, 0, 0, 2],
+        'level_of_obs_3_number_of_days': [0, 5, 0, 0, 0, 0, 0],
+        'level_of_obs_4_number_of_days': [0, 0, 12, 0, 0, 2, 0]},
+        index=pd.MultiIndex.from_tuples([(patient, pd.Timestamp(start), pd.Timestamp(end))
+                                         for patient, start, end in periods],
+                                        names=['anonymous_pat_id', 'start_bed_day_period', 'end_bed_day_period']))
+
+
+def test_bed_day_periods_are_aggregated_in_the_crisis_period_of_their_patient_that_contains_them():
+    features = BedDaysDuringCrisisPeriod(end_date=datetime.date(2020, 1, 1)).transform(
+        {'CrisisFeaturesDuringCrisisPeriod': crisis_periods(), 'BedDayPeriod': bed_day_periods()})
+
+    assert features.index.equals(crisis_periods().index)
+    assert features['number_of_bed_days'].tolist() == [12, 2, 2]
+    assert features['max_length_stay'].tolist() == [9, 2, 2]
+    assert features['number_of_leave_days'].tolist() == [1, 1, 0]
+    assert features['level_of_obs_max'].tolist() == [3, 1, 4]
+    assert [features['level_of_obs_{}'.format(num)].tolist() for num in range(1, 5)] == [
+        [1, 1, 0], [1, 0, 0], [1, 0, 0], [0, 0, 1]]
+    assert [features['level_of_obs_{}_number_of_days'.format(num)].tolist() for num in range(1, 5)] == [
+        [1, 2, 0], [6, 0, 0], [5, 0, 0], [0, 0, 2]]
+    assert features['start_crisis_period_monday'].tolist() == pd.to_datetime(
+        ['2019-01-07', '2019-03-04', '2019-01-07']).tolist()
+
+
+def test_crisis_periods_without_bed_day_periods_are_zero():
+    features = BedDaysDuringCrisisPeriod(end_date=datetime.date(2020, 1, 1)).transform(
+        {'CrisisFeaturesDuringCrisisPeriod': crisis_periods(), 'BedDayPeriod': bed_day_periods().loc[[2]].iloc[1:]})
+
+    assert features['number_of_bed_days'].tolist() == [0, 0, 0]
+    assert features['level_of_obs_max'].tolist() == [0, 0, 0]
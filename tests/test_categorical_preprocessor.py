@@ -0,0 +1,78 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.categorical_preprocessor import CategoricalPreprocessor
+from crisis_prediction.features.contacts.contact_event_features import ContactEventFeatures
+from crisis_prediction.features.contacts.contact_preprocessor import ContactPreprocessor
+from crisis_prediction.features.crises.crisis_event_features import CrisisEventFeatures
+from crisis_prediction.features.crises.crisis_preprocessor import CrisisPreprocessor
+from crisis_prediction.features.referrals.referral_event_discharge_features import ReferralDischargeEventFeatures
+from crisis_prediction.features.referrals.referral_event_features import ReferralEventFeatures
+from crisis_prediction.features.referrals.referral_preprocessor import ReferralPreprocessor
+from crisis_prediction.features.referrals.referral_state_features import ReferralStateFeatures
+
+END_DATE = datetime.date(2020, 1, 1)
+ENCODED_COLUMNS = {'contacts_table': ['contact_event_code', 'contact_service_code'],
+                   'referral_table': ['discharge_category', 'source_category']}
+
+
+def raw_data(size=200):
+    rng = np.random.default_rng(0)
+
+    def dates():
+        return (pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 1000, size), 'D')).astype(str)
+
+    return {
+        'patient_table': pd.DataFrame({'anonymous_pat_id': [1], 'first_year_month': ['201612']}),
+        'contacts_table': pd.DataFrame({
+            'anonymous_pat_id': 1, 'contacts_datetime': dates(),
+            'attendance': rng.choice(['Attended', 'Did not attend (DNA) or not in', 'Trust cancelled'], size),
+            'event_code': rng.choice(['F1', 'G1', 'T1', 'X9', None], size),
+            'service': rng.choice(['S1', 'S2', 'S9'], size)}),
+        'contact_eventformat_code': pd.DataFrame({'Category': ['FSO', 'GRO', 'TS']}, index=['F1', 'G1', 'T1']),
+        'service_code': pd.DataFrame({'Category': ['Planned', 'Unplanned']}, index=['S1', 'S2']),
+        'crisis_table': pd.DataFrame({
+            'anonymous_pat_id': 1, 'event_date': dates(),
+            'crisis_type': rng.choice(['TR', 'BM', 'IP', 'OOA'], size),
+            'crisis_contact_allocation': rng.choice(['Contact', 'IP_BedDay', 'ST', 'RNC'], size)}),
+        'crisis_severity': pd.DataFrame({'Severity': [1, 3, 2, 1]}, index=['Contact', 'IP_BedDay', 'ST', 'RNC']),
+        'referral_table': pd.DataFrame({
+            'anonymous_pat_id': 1, 'referral_date': pd.to_datetime(dates()), 'discharge_date': pd.to_datetime(dates()),
+            'service': rng.choice(['S1', 'S2'], size),
+            'discharge_reason': rng.choice(['D1', 'D2', 'D3', 'D9'], size),
+            'referral_source': rng.choice(['R1', 'R2', 'R9'], size)}),
+        'discharge_code': pd.DataFrame({'Category': ['Complete', 'DNA', 'Complete']}, index=['D1', 'D2', 'D3']),
+        'source_code': pd.DataFrame({'Category': ['GP', 'Self']}, index=['R1', 'R2']),
+    }
+
+
+def preprocess(data, string_codes=False):
+    for preprocessor in [ContactPreprocessor(), CrisisPreprocessor(), ReferralPreprocessor()]:
+        data = preprocessor(data)
+    if string_codes:
+        for table, columns in ENCODED_COLUMNS.items():
+            data[table] = data[table].astype({column: object for column in columns})
+    return data
+
+
+def test_encoded_columns_have_the_categories_of_their_lookup_table():
+    data = preprocess(CategoricalPreprocessor()(raw_data()))
+
+    assert data['contacts_table']['contact_event_code'].cat.categories.tolist() == ['FSO', 'GRO', 'TS']
+    assert data['contacts_table']['contact_service_code'].cat.categories.tolist() == ['Planned', 'Unplanned']
+    assert data['referral_table']['discharge_category'].cat.categories.tolist() == ['Complete', 'DNA']
+    assert data['referral_table']['source_category'].cat.categories.tolist() == ['GP', 'Self']
+    assert data['referral_table']['service_planned'].dtype == np.int64
+
+
+@pytest.mark.parametrize('feature_class', [ContactEventFeatures, CrisisEventFeatures, ReferralEventFeatures,
+                                           ReferralDischargeEventFeatures, ReferralStateFeatures])
+def test_features_match_the_string_codes(feature_class):
+    feature = feature_class(end_date=END_DATE)
+
+    categorical = feature.transform(preprocess(CategoricalPreprocessor()(raw_data())))
+
+    pd.testing.assert_frame_equal(categorical, feature.transform(preprocess(raw_data(), string_codes=True)))
@@ -0,0 +1,37 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.crises.crisis_in_n_weeks_feature import CrisisInNWeeksFeature
+
+HORIZONS = [1, 2, 4, 8]
+
+
+def crisis_in_n_weeks(crisis_data, n):
+    """The label of one horizon and patient as the maximum of the next n shifted weeks, NaN when any is missing."""
+    return pd.concat([crisis_data.shift(-i) for i in range(1, n + 1)], axis=1).max(axis=1, skipna=False)
+
+
+def in_crisis_period():
+    bursts = [0, 0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 0] + [0, 0, 0, 0, 0, 0, 1] + [1, 0]
+    weeks = [(1, week) for week in range(1, 13)] + [(2, week) for week in range(1, 8)] + [(3, 1), (3, 2)]
+    index = pd.MultiIndex.from_tuples([(patient, 2019, week) for patient, week in weeks],
+                                      names=['anonymous_pat_id', 'year', 'week'])
+    return pd.DataFrame({'crisis_burst_1week': bursts}, index=index)
+
+
+def test_labels_look_ahead_within_the_patient_and_are_zero_at_the_tail():
+    labels = CrisisInNWeeksFeature(end_date=datetime.date(2020, 1, 1), n=HORIZONS).transform(
+        {'InCrisisPeriod': in_crisis_period()})
+
+    assert labels.dtypes.tolist() == [np.int8] * len(HORIZONS)
+    assert labels.loc[1, 'crisis_in_1_weeks'].tolist() == [0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0]
+    assert labels.loc[1, 'crisis_in_4_weeks'].tolist() == [1, 1, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0]
+    assert labels.loc[1, 'crisis_in_8_weeks'].tolist() == [1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+    assert labels.loc[2, 'crisis_in_4_weeks'].tolist() == [0, 0, 1, 0, 0, 0, 0]
+    assert labels.loc[3, 'crisis_in_1_weeks'].tolist() == [0, 0]
+    for n in HORIZONS:
+        expected = pd.concat([crisis_in_n_weeks(bursts, n) for _, bursts in
+                              in_crisis_period()['crisis_burst_1week'].groupby(level=0)]).fillna(0)
+        np.testing.assert_array_equal(labels['crisis_in_{}_weeks'.format(n)], expected)
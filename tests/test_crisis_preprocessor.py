@@ -0,0 +1,41 @@
+import datetime
+
+import pandas as pd
+
+from crisis_prediction.features.crises.crisis_event_features import CrisisEventFeatures
+from crisis_prediction.features.crises.crisis_preprocessor import CrisisPreprocessor
+from crisis_prediction.features.crises.in_crisis_period import InCrisisPeriod
+from crisis_prediction.features.during_crisis.crisis_features_during_crisis_period import \
+    CrisisFeaturesDuringCrisisPeriod
+
+
+def test_date_columns_are_iso_year_and_week():
+    crisis_table = pd.DataFrame({'event_date': ['2014-12-29', '2016-01-01', '2019-06-05']})
+
+    crisis_table = CrisisPreprocessor.add_date_columns(crisis_table)
+
+    assert crisis_table['year'].tolist() == [2015, 2015, 2019]
+    assert crisis_table['week'].tolist() == [1, 53, 23]
+
+
+def test_late_december_crisis_is_counted_in_its_crisis_period():
+    data = CrisisPreprocessor()({
+        'patient_table': pd.DataFrame({'anonymous_pat_id': [1], 'first_year_month': ['201410']}),
+        'crisis_table': pd.DataFrame({'anonymous_pat_id': 1,
+                                      'event_date': ['2014-12-29', '2014-12-30', '2015-03-04'],
+                                      'crisis_type': ['TR', 'BM', 'IP'],
+                                      'crisis_contact_allocation': ['Contact', 'ST', 'IP_BedDay']}),
+        'crisis_severity': pd.DataFrame({'Severity': [1, 3, 2]}, index=['Contact', 'IP_BedDay', 'ST'])})
+    end_date = datetime.date(2015, 6, 1)
+
+    data['CrisisEventFeatures'] = CrisisEventFeatures(end_date=end_date).transform(data)
+    data['InCrisisPeriod'] = InCrisisPeriod(end_date=end_date).transform(data)
+    crisis_periods = CrisisFeaturesDuringCrisisPeriod(end_date=end_date).transform(data)
+
+    assert data['CrisisEventFeatures'].loc[(1, 2015, 1), 'crisis_sum'] == 2
+    assert data['InCrisisPeriod'].loc[(1, 2015, 1), 'in_crisis_period_burst_1week'] == 1
+    assert crisis_periods['number_of_crisis'].tolist() == [2, 1]
+    assert crisis_periods['number_of_days_in_crisis'].tolist() == [2, 1]
+    assert crisis_periods['max_severity_crisis'].tolist() == [2, 3]
+    assert crisis_periods['start_crisis_period_monday'].tolist() == [datetime.date(2014, 12, 29),
+                                                                     datetime.date(2015, 3, 2)]
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.diagnosis.diagnosis_preprocessor import DiagnosisPreprocessor
+
+CODES = ['F10.1', 'F1001', 'F100', 'F32', 'F332', 'F20.0', 'F2', 'Z91', 'F1.', 'F6x', 'f10', 'XF10Y', '', None, np.nan]
+
+
+def create_mappings(diagnosis_data, diagnosis_codes, root, diagnosis_code_columns):
+    """The str.contains mapping that the root code index replaced."""
+    for category in diagnosis_codes['Category'].unique():
+        root_codes = set(diagnosis_codes.loc[diagnosis_codes['Category'] == category, 'DiagnosisCodeRoot'])
+        diagnosis_data['{}_{}'.format(root, category.lower())] = pd.concat(
+            [diagnosis_data[col].str.contains(code) for col in diagnosis_code_columns for code in root_codes],
+            axis=1).any(axis=1).astype(int)
+    return diagnosis_data
+
+
+def diagnosis_table(preprocessor):
+    rng = np.random.default_rng(0)
+    codes = rng.choice(np.array(CODES, dtype=object), size=(60, len(preprocessor.diagnosis_code_columns)))
+    codes[:, 3:] = None
+    return pd.DataFrame({'anonymous_pat_id': np.arange(60),
+                         **{column: codes[:, i] for i, column in enumerate(preprocessor.diagnosis_code_columns)}})
+
+
+def test_categories_equal_str_contains_of_their_root_codes():
+    preprocessor = DiagnosisPreprocessor()
+    diagnosis_codes = pd.DataFrame({
+        'Category': ['Substance', 'Substance', 'Substance', 'Mood', 'Mood', 'Psychosis', 'Psychosis', 'Any', 'Any'],
+        'DiagnosisCodeRoot': ['F1', 'F10', 'F10.1', 'F3[2-3]', 'F10', 'F2', 'F20.0', 'F', 'F6+']})
+    table = diagnosis_table(preprocessor)
+
+    mapped = preprocessor.create_mappings(table.copy(), diagnosis_codes, 'diagnosis_broad')
+
+    expected = create_mappings(table.copy(), diagnosis_codes, 'diagnosis_broad', preprocessor.diagnosis_code_columns)
+    pd.testing.assert_frame_equal(mapped, expected)
+    assert mapped[['diagnosis_broad_substance', 'diagnosis_broad_mood', 'diagnosis_broad_psychosis',
+                   'diagnosis_broad_any']].sum().gt(0).all()
+
+
+def test_a_code_is_mapped_to_every_category_of_the_roots_it_contains():
+    preprocessor = DiagnosisPreprocessor()
+    diagnosis_codes = pd.DataFrame({'Category': ['Substance', 'Mood', 'Other'],
+                                    'DiagnosisCodeRoot': ['F1.', 'F10', 'Z']})
+    index = preprocessor.create_codes_index(diagnosis_codes, diagnosis_codes['Category'].unique())
+
+    assert preprocessor.get_code_categories('XF100', index, 3).tolist() == [True, True, False]
+    assert preprocessor.get_code_categories('F1', index, 3).tolist() == [False, False, False]
+    assert preprocessor.get_code_categories('F1x', index, 3).tolist() == [True, False, False]
+    assert preprocessor.get_code_categories(np.nan, index, 3).tolist() == [False, False, False]
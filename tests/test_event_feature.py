@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.event_feature import EventFeature
+
+
+def time_since_last_event(events):
+    """The per-patient computation of the time since the last True value that the vectorized one replaced."""
+    weeks_without_event = (events == 0).cumsum()
+    return (weeks_without_event - weeks_without_event.where(events, np.nan).ffill()).astype(float)
+
+
+def weekly_events():
+    weeks = [(1, week) for week in range(1, 7)] + [(2, week) for week in range(1, 5)] + [(3, 1), (3, 2)]
+    index = pd.MultiIndex.from_tuples([(patient, 2019, week) for patient, week in weeks],
+                                      names=['anonymous_pat_id', 'year', 'week'])
+    return pd.DataFrame({'contact_sum': [0, 2, 0, 0, 1, 0, 0, 0, 3, 0, 1, 0],
+                         'crisis_max': [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]}, index=index)
+
+
+def test_time_since_last_events_restarts_for_every_patient():
+    data = EventFeature().add_time_since_last_events(weekly_events(), ['contact_sum', 'crisis_max'],
+                                                     names=['contact', 'crisis'])
+
+    np.testing.assert_array_equal(data['time_since_last_contact'],
+                                  [np.nan, 0, 1, 2, 0, 1, np.nan, np.nan, 0, 1, 0, 1])
+    np.testing.assert_array_equal(data['time_since_last_crisis'], [0, 1, 2, 3, 4, 5] + [np.nan] * 6)
+    for column, name in [('contact_sum', 'contact'), ('crisis_max', 'crisis')]:
+        expected = pd.concat([time_since_last_event(events.astype(bool))
+                              for _, events in weekly_events()[column].groupby(level=0)])
+        np.testing.assert_array_equal(data['time_since_last_{}'.format(name)], expected)
+
+
+def test_time_since_last_event_of_one_patient_continues_from_the_seed():
+    events = weekly_events().loc[[2]]['contact_sum'].astype(bool)
+
+    time_since_last = EventFeature().get_time_since_last_event(events, seed=4)
+
+    np.testing.assert_array_equal(time_since_last, [5, 6, 0, 1])
+    pd.testing.assert_series_equal(EventFeature().get_time_since_last_event(events),
+                                   time_since_last_event(events).rename(events.name))
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.feature_store import FeatureStore, INDEX_COLUMNS
+
+
+def weekly_features(patient, value, years=(2019, 2020)):
+    index = pd.MultiIndex.from_tuples([(patient, year, week) for year in years for week in (1, 2, 3)],
+                                      names=INDEX_COLUMNS)
+    return pd.DataFrame({'feature_a': float(value), 'feature_b': np.arange(len(index)) + value}, index=index)
+
+
+def test_write_keeps_the_patients_sharing_a_partition(tmp_path):
+    store = FeatureStore(str(tmp_path), num_patient_partitions=2)
+    for patient in [1, 2, 3, 4]:
+        store.write({'SomeFeature': weekly_features(patient, patient)})
+
+    expected = pd.concat([weekly_features(patient, patient) for patient in [1, 2, 3, 4]])
+    pd.testing.assert_frame_equal(store.read('SomeFeature'), expected, check_like=True)
+
+
+def test_write_replaces_the_rows_of_the_written_patients_and_years(tmp_path):
+    store = FeatureStore(str(tmp_path), num_patient_partitions=2)
+    store.write({'SomeFeature': pd.concat([weekly_features(patient, patient) for patient in [1, 2, 3]])})
+    store.write({'SomeFeature': weekly_features(2, 20, years=(2020,))})
+
+    expected = pd.concat([weekly_features(1, 1), weekly_features(2, 2, years=(2019,)),
+                          weekly_features(2, 20, years=(2020,)), weekly_features(3, 3)]).sort_index()
+    pd.testing.assert_frame_equal(store.read('SomeFeature'), expected, check_like=True)
+    pd.testing.assert_frame_equal(store.read('SomeFeature', patients=[2], columns=['feature_a']),
+                                  expected.loc[[2], ['feature_a']])
+
+
+def test_load_without_matching_features_is_empty(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.write({'SomeFeature': weekly_features(1, 1)})
+
+    loaded = store.load(columns=['unknown_feature'])
+
+    assert loaded.empty
+    assert list(loaded.index.names) == INDEX_COLUMNS
@@ -0,0 +1,43 @@
+import datetime
+
+import pandas as pd
+
+from crisis_prediction.features.crises.in_crisis_period import InCrisisPeriod
+
+END_DATE = datetime.date(2020, 1, 1)
+
+
+def crisis_event_features():
+    crisis_max = [0, 1, 1, 0, 1, 0, 0, 1, 0, 0, 0] + [1, 0, 0, 0]
+    index = pd.MultiIndex.from_tuples([(1, 2019, week) for week in range(1, 12)] + [
+        (2, 2019, week) for week in range(1, 5)], names=['anonymous_pat_id', 'year', 'week'])
+    time_since_last_crisis = [None, 0, 0, 1, 0, 1, 2, 0, 1, 2, 3] + [0, 1, 2, 3]
+    return pd.DataFrame({'crisis_max': crisis_max, 'time_since_last_crisis': time_since_last_crisis},
+                        index=index, dtype=float)
+
+
+def test_crisis_periods_of_every_weeks_before_new_burst_restart_for_every_patient():
+    crisis_periods = InCrisisPeriod(end_date=END_DATE, weeks_before_new_burst=[1, 2]).transform(
+        {'CrisisEventFeatures': crisis_event_features()})
+
+    expected = {
+        'crisis_burst_1week': [0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 0] + [1, 0, 0, 0],
+        'number_crisis_burst_1week': [0, 1, 1, 0, 2, 0, 0, 3, 0, 0, 0] + [1, 0, 0, 0],
+        'in_crisis_period_burst_1week': [0, 1, 1, 0, 1, 0, 0, 1, 0, 0, 0] + [1, 0, 0, 0],
+        'number_crises_burst_1week_passed': [0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 3] + [1, 1, 1, 1],
+        'crisis_burst_2week': [0, 1, 0, 0, 0, 0, 0, 1, 0, 0, 0] + [1, 0, 0, 0],
+        'number_crisis_burst_2week': [0, 1, 1, 1, 1, 1, 0, 2, 2, 0, 0] + [1, 1, 0, 0],
+        'in_crisis_period_burst_2week': [0, 1, 1, 1, 1, 1, 0, 1, 1, 0, 0] + [1, 1, 0, 0],
+        'number_crises_burst_2week_passed': [0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2] + [1, 1, 1, 1],
+    }
+    pd.testing.assert_frame_equal(crisis_periods, pd.DataFrame(expected, index=crisis_event_features().index))
+
+
+def test_several_weeks_before_new_burst_equal_one_run_per_value_and_patient():
+    crisis_periods = InCrisisPeriod(end_date=END_DATE, weeks_before_new_burst=[1, 2, 3]).transform(
+        {'CrisisEventFeatures': crisis_event_features()})
+
+    expected = pd.concat([pd.concat([InCrisisPeriod(end_date=END_DATE, weeks_before_new_burst=n).transform(
+        {'CrisisEventFeatures': features}) for n in [1, 2, 3]], axis=1)
+        for _, features in crisis_event_features().groupby(level=0)])
+    pd.testing.assert_frame_equal(crisis_periods, expected)
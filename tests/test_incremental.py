@@ -0,0 +1,96 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.crises.crisis_event_features import CrisisEventFeatures
+from crisis_prediction.features.crises.in_crisis_period import InCrisisPeriod
+from crisis_prediction.features.crisis_plan.crisis_plan_features import CrisisPlanEventFeatures
+from crisis_prediction.features.diagnosis.aux_diagnosis_columns import broad_category_columns, \
+    granular_category_columns
+from crisis_prediction.features.diagnosis.diagnosis_state_features import DiagnosisStateFeatures
+from crisis_prediction.features.mha_episode.mha_episode_state_features import MhaEpisodeStateFeatures
+from crisis_prediction.features.patient.patient_age_and_time_in_system_features import PatientAgeAndTimeInSystemFeatures
+from crisis_prediction.features.referrals.referral_event_discharge_features import ReferralDischargeEventFeatures
+from crisis_prediction.features.referrals.referral_event_features import ReferralEventFeatures
+from crisis_prediction.features.referrals.referral_state_features import ReferralStateFeatures
+
+FIRST_END_DATE = datetime.date(2019, 10, 2)
+
+
+def random_dates(rng, size, start='2013-01-01', days=2400):
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size), 'D')
+
+
+def patient_data(seed):
+    rng = np.random.default_rng(seed)
+    referral_dates = random_dates(rng, 12)
+    diagnosis_dates = random_dates(rng, 6)
+    mha_dates = random_dates(rng, 4)
+    diagnosis_categories = granular_category_columns + broad_category_columns
+    return {
+        'patient_table': pd.DataFrame({'anonymous_pat_id': [seed], 'first_year_month': ['201211'],
+                                       'month_year_birth': ['198004']}),
+        'crisis_table': pd.DataFrame({
+            'anonymous_pat_id': seed,
+            'event_date': random_dates(rng, 40).astype(str),
+            'crisis_type': rng.choice(['TR', 'BM', 'IP', 'OOA'], 40),
+            'crisis_contact_allocation': rng.choice(['Contact', 'IP_BedDay', 'ST', 'RNC'], 40)}),
+        'crisis_severity': pd.DataFrame({'Severity': [1, 3, 2, 1]}, index=['Contact', 'IP_BedDay', 'ST', 'RNC']),
+        'crisis_plan_table': pd.DataFrame({'anonymous_pat_id': seed, 'plan_updated_date': random_dates(rng, 5)}),
+        'referral_table': pd.DataFrame({
+            'anonymous_pat_id': seed,
+            'referral_date': referral_dates,
+            'discharge_date': referral_dates + pd.to_timedelta(rng.integers(0, 400, 12), 'D'),
+            'source_category': rng.choice(['GP', 'Self', 'Carer'], 12),
+            'discharge_category': rng.choice(['Treatment Completed', 'Transferred', 'Other'], 12)}),
+        'diagnosis_table': pd.DataFrame({
+            **{'anonymous_pat_id': seed,
+               'diagnosis_start_date': diagnosis_dates,
+               'diagnosis_end_date': diagnosis_dates + pd.to_timedelta(rng.integers(0, 300, 6), 'D')},
+            **{col: rng.integers(0, 2, 6) for col in diagnosis_categories}}),
+        'mha_table': pd.DataFrame({
+            'anonymous_pat_id': seed,
+            'start_date_time': mha_dates,
+            'end_date_time': mha_dates + pd.to_timedelta(rng.integers(0, 200, 4), 'D'),
+            'cto_status': rng.choice(['Active', 'Not applicable', 'Recalled'], 4),
+            'on_conditional_discharge': rng.integers(0, 2, 4),
+            'mha_section_code': rng.choice(['Inf', '2', '3'], 4)}),
+    }
+
+
+@pytest.mark.parametrize('feature_class', [CrisisEventFeatures, CrisisPlanEventFeatures, ReferralEventFeatures,
+                                           ReferralDischargeEventFeatures, ReferralStateFeatures,
+                                           DiagnosisStateFeatures, MhaEpisodeStateFeatures,
+                                           PatientAgeAndTimeInSystemFeatures])
+@pytest.mark.parametrize('weeks_per_run', [1, 3])
+def test_incremental_output_equals_full_recomputation(feature_class, weeks_per_run):
+    data, state = patient_data(seed=weeks_per_run), None
+    for run in range(12):
+        feature = feature_class(end_date=FIRST_END_DATE + datetime.timedelta(weeks=run * weeks_per_run))
+        full = feature.transform(data)
+        previous_week = None if state is None else state['week']
+        incremental, state = feature.transform_incremental(data, state)
+
+        if previous_week is not None:
+            full = full[feature.get_week_ordinals(full) > previous_week]
+        assert len(incremental) >= weeks_per_run
+        pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_incremental_in_crisis_period_equals_full_recomputation():
+    data, states = patient_data(seed=0), {}
+    for run in range(12):
+        end_date = FIRST_END_DATE + datetime.timedelta(weeks=run)
+        crisis_features = CrisisEventFeatures(end_date=end_date)
+        in_crisis_period = InCrisisPeriod(end_date=end_date)
+        full = in_crisis_period.transform({'CrisisEventFeatures': crisis_features.transform(data)})
+        previous_week = states.get('crisis', {}).get('week')
+        new_crisis_features, states['crisis'] = crisis_features.transform_incremental(data, states.get('crisis'))
+        incremental, states['period'] = in_crisis_period.transform_incremental(
+            {'CrisisEventFeatures': new_crisis_features}, states.get('period'))
+
+        if previous_week is not None:
+            full = full[in_crisis_period.get_week_ordinals(full) > previous_week]
+        pd.testing.assert_frame_equal(incremental, full)
@@ -0,0 +1,33 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.last_crisis.last_crisis_during_crisis_features import LastCrisisDuringCrisisFeatures
+
+
+def test_every_week_gets_the_last_crisis_period_of_its_patient_finished_before_it():
+    weeks = pd.MultiIndex.from_product([[1, 2], [2019], range(1, 9)], names=['anonymous_pat_id', 'year', 'week'])
+    in_crisis_period = pd.DataFrame({'in_crisis_period_burst_1week': [0, 1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
+                                     'number_crisis_burst_1week': [0, 1, 1, 2, 2, 2, 2, 2, 0, 0, 0, 0, 0, 1, 1, 1]},
+                                    index=weeks)
+    crisis_periods = pd.DataFrame({
+        'number_of_crisis': [2, 5, 1], 'number_of_days_in_crisis': [2, 4, 1], 'max_severity_crisis': [1, 3, 2],
+        'start_crisis_period_monday': [datetime.date(2019, 1, 7), datetime.date(2019, 1, 21),
+                                       datetime.date(2019, 2, 4)],
+        'end_crisis_period_monday': [datetime.date(2019, 1, 7), datetime.date(2019, 1, 28),
+                                     datetime.date(2019, 2, 4)]},
+        index=pd.MultiIndex.from_tuples([(1, 1), (1, 2), (2, 1)],
+                                        names=['anonymous_pat_id', 'number_crisis_burst_1week']))
+
+    features = LastCrisisDuringCrisisFeatures(end_date=datetime.date(2019, 2, 25)).transform(
+        {'CrisisFeaturesDuringCrisisPeriod': crisis_periods, 'InCrisisPeriod': in_crisis_period})
+
+    assert features.index.equals(weeks)
+    nan = np.nan
+    np.testing.assert_array_equal(features['number_of_crisis_last_crisis'],
+                                  [nan, nan, 2, 2, 2, 5, 5, 5, nan, nan, nan, nan, nan, nan, 1, 1])
+    np.testing.assert_array_equal(features['number_of_days_in_crisis_last_crisis'],
+                                  [nan, nan, 2, 2, 2, 4, 4, 4, nan, nan, nan, nan, nan, nan, 1, 1])
+    np.testing.assert_array_equal(features['max_severity_crisis_last_crisis'],
+                                  [nan, nan, 1, 1, 1, 3, 3, 3, nan, nan, nan, nan, nan, nan, 2, 2])
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.one_hot_encoder import OneHotEncoder
+from crisis_prediction.features.utils import dummitize
+
+COLUMNS = ['crisis_type_TR', 'crisis_type_BM', 'crisis_type_IP']
+
+
+def test_transform_matches_get_dummies():
+    values = pd.Series(['BM', 'TR', None, 'OOA', 'BM'], name='crisis_type')
+
+    expected = pd.get_dummies(values, prefix='crisis_type').reindex(columns=COLUMNS, fill_value=0).astype(np.int8)
+
+    pd.testing.assert_frame_equal(OneHotEncoder(COLUMNS, 'crisis_type').transform(values), expected)
+
+
+def test_columns_without_the_prefix_raise():
+    with pytest.raises(ValueError):
+        OneHotEncoder(COLUMNS + ['type_OOA'], 'crisis_type')
+
+
+def test_dummitize_keeps_columns_without_the_prefix_as_zeros():
+    values = pd.Series(['BM', 'TR'], name='crisis_type')
+
+    dummies = dummitize(values, COLUMNS + ['type_OOA'])
+
+    assert dummies.columns.tolist() == COLUMNS + ['type_OOA']
+    assert dummies.to_numpy().tolist() == [[0, 1, 0, 0], [1, 0, 0, 0]]
@@ -0,0 +1,21 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.patient.patient_age_and_time_in_system_features import \
+    PatientAgeAndTimeInSystemFeatures
+
+
+def test_patients_without_first_year_month_are_left_out():
+    feature = PatientAgeAndTimeInSystemFeatures(end_date=datetime.date(2020, 1, 1))
+    patient_table = pd.DataFrame({'anonymous_pat_id': [1, 2, 3],
+                                  'first_year_month': [201503, np.nan, 201711],
+                                  'month_year_birth': [198004, 199001, 200012]})
+
+    cohort = feature.transform({'patient_table': patient_table})
+
+    expected = pd.concat([feature.transform({'patient_table': patient_table.iloc[[i]].astype({
+        'first_year_month': int})}) for i in [0, 2]])
+    pd.testing.assert_frame_equal(cohort, expected)
+    assert cohort.index.get_level_values('year').min() == 2015
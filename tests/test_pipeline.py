@@ -0,0 +1,200 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.base import Feature
+from crisis_prediction.features.crisis_plan.crisis_plan_features import CrisisPlanEventFeatures
+from crisis_prediction.features.exceptions import SchemaException
+from crisis_prediction.features.pipeline import Pipeline
+
+
+class CrisisSeverity(Feature):
+    """Reads the crisis_severity lookup table, which transform_cohort does not split by patient."""
+
+    def transform(self, data):
+        crises = data['crisis_table']
+        return pd.DataFrame({'severity': crises['crisis_contact_allocation'].map(
+            data['crisis_severity']['Severity']).values}, index=pd.Index(crises['anonymous_pat_id'].values,
+                                                                         name='anonymous_pat_id'))
+
+    @property
+    def schema_out(self):
+        return {'severity': int}
+
+
+class Counter(Feature):
+    """Returns one more than the sum of the outputs of its dependencies and records that it ran."""
+
+    def __init__(self, dependencies=(), runs=None):
+        super().__init__()
+        self.dependencies = list(dependencies)
+        self.runs = runs if runs is not None else []
+
+    def transform(self, data):
+        self.runs.append(self.name)
+        return 1 + sum(data[dependency] for dependency in self.dependencies)
+
+    @property
+    def name(self):
+        return self.__class__.__name__
+
+    @property
+    def schema_out(self):
+        return {}
+
+
+def counter(name, *dependencies, runs=None):
+    return type(name, (Counter,), {})(dependencies, runs)
+
+
+class Stats(Feature):
+    """Returns the rows of the stats_table of its patients, with the schema_out that drives the downcast."""
+
+    def transform(self, data):
+        return data['stats_table'].set_index('anonymous_pat_id')
+
+    @property
+    def schema_out(self):
+        return {'time_since_last_crisis': int, 'crisis_sum': int, 'severity_max': int, 'mean_severity': float,
+                'contacts_ever': int, 'seconds_in_crisis': float, 'crisis_type': object}
+
+
+def stats_table():
+    """Three weeks of three patients, the first with missing values, the second without, the third all missing."""
+    return pd.DataFrame({
+        'anonymous_pat_id': [1, 1, 1, 2, 2, 2, 3, 3, 3],
+        'time_since_last_crisis': [np.nan, 0, 1, 0, 1, 2, np.nan, np.nan, np.nan],
+        'crisis_sum': [0, 1, 300, 0, 1, 2, 0, 0, 0],
+        'severity_max': [1, np.nan, 2, 1, 1, 1, 0, 0, 0],
+        'mean_severity': [0.5, 1.25, 2, 1, 1, 1, 0, 0, 0],
+        'contacts_ever': [2 ** 30, 0, 1, 5, 6, 7, 0, 0, 0],
+        'seconds_in_crisis': [2. ** 25 + 1, 0, 1, 0, 0, 0, 0, 0, 0],
+        'crisis_type': ['TR', 'BM', None, 'IP', 'IP', 'TR', None, None, None]})
+
+
+def cohort_data():
+    return {
+        'patient_table': pd.DataFrame({'anonymous_pat_id': [3, 1, 5, 2], 'first_year_month': '201811'}),
+        'crisis_table': pd.DataFrame({'anonymous_pat_id': [1, 2, 3, 1, 5, 3, 1],
+                                      'crisis_contact_allocation': ['ST', 'Contact', 'ST', 'IP_BedDay', 'ST',
+                                                                    'Contact', 'Contact']}),
+        'crisis_plan_table': pd.DataFrame({'anonymous_pat_id': [2, 3, 2],
+                                           'plan_updated_date': pd.to_datetime(['2019-01-07', '2019-06-03',
+                                                                                '2019-06-05'])}),
+        'crisis_severity': pd.DataFrame({'Severity': [1, 3, 2]}, index=['Contact', 'IP_BedDay', 'ST']),
+    }
+
+
+def test_downcast_output_downcasts_the_returned_features():
+    feature = CrisisPlanEventFeatures(end_date=datetime.date(2020, 1, 1))
+    data = {'patient_table': pd.DataFrame({'anonymous_pat_id': [1], 'first_year_month': ['201811']}),
+            'crisis_plan_table': pd.DataFrame({'anonymous_pat_id': [1, 1],
+                                               'plan_updated_date': pd.to_datetime(['2019-01-07', '2019-06-03'])})}
+
+    output = Pipeline(features=[feature], downcast_output=True).transform(data)['CrisisPlanEventFeatures']
+
+    pd.testing.assert_frame_equal(output, feature.downcast(feature.transform(data)))
+    assert output['crisis_plan_update'].dtype == np.int8
+    assert output['time_since_last_crisis_plan_update'].dtype == pd.Int8Dtype()
+    assert output['time_since_last_crisis_plan_update'].isna().sum() == 10
+
+
+def test_downcast_picks_the_smallest_dtype_of_every_column():
+    output = Stats().downcast(Stats().transform({'stats_table': stats_table().loc[lambda df: df[
+        'anonymous_pat_id'] == 1]}))
+
+    assert output.dtypes.to_dict() == {
+        'time_since_last_crisis': pd.Int8Dtype(), 'crisis_sum': np.int16, 'severity_max': np.float32,
+        'mean_severity': np.float32, 'contacts_ever': np.int32, 'seconds_in_crisis': np.float64,
+        'crisis_type': object}
+    np.testing.assert_array_equal(output['time_since_last_crisis'].to_numpy(dtype=float, na_value=np.nan),
+                                  [np.nan, 0, 1])
+    np.testing.assert_array_equal(output['severity_max'], [1, np.nan, 2])
+    assert output['seconds_in_crisis'].tolist() == [2. ** 25 + 1, 0, 1]
+
+
+@pytest.mark.parametrize('n_processes', [1, 2])
+def test_patients_downcast_to_different_dtypes_are_concatenated_in_the_common_dtype(n_processes):
+    pipeline = Pipeline(features=[Stats()], downcast_output=True)
+
+    output = pipeline.transform_cohort({'patient_table': pd.DataFrame({'anonymous_pat_id': [1, 2, 3]}),
+                                        'stats_table': stats_table()}, n_processes=n_processes)['Stats']
+
+    assert output.dtypes.to_dict() == {
+        'time_since_last_crisis': pd.Int8Dtype(), 'crisis_sum': np.int16, 'severity_max': np.float32,
+        'mean_severity': np.float32, 'contacts_ever': np.int32, 'seconds_in_crisis': np.float64,
+        'crisis_type': object}
+    np.testing.assert_array_equal(output['time_since_last_crisis'].to_numpy(dtype=float, na_value=np.nan),
+                                  [np.nan, 0, 1, 0, 1, 2, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(output['crisis_sum'], [0, 1, 300, 0, 1, 2, 0, 0, 0])
+    pd.testing.assert_frame_equal(output.astype(float, errors='ignore'),
+                                  Stats().transform({'stats_table': stats_table()}).astype(float, errors='ignore'),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 4])
+def test_transform_cohort_concatenates_the_valid_patients_in_the_order_of_the_patient_table(chunk_size):
+    pipeline = Pipeline(features=[CrisisSeverity(), CrisisPlanEventFeatures(end_date=datetime.date(2020, 1, 1))])
+    data = cohort_data()
+
+    cohort = pipeline.transform_cohort(data, n_processes=2, chunk_size=chunk_size, valid_patients=np.array([1, 2, 3]),
+                                       max_pending_chunks=1)
+
+    patients = [3, 1, 2]
+    for name in ['CrisisSeverity', 'CrisisPlanEventFeatures']:
+        expected = pd.concat([pipeline.transform({table: df[df['anonymous_pat_id'] == patient]
+                                                  if 'anonymous_pat_id' in df.columns else df
+                                                  for table, df in data.items()})[name] for patient in patients])
+        pd.testing.assert_frame_equal(cohort[name], expected)
+    assert cohort['CrisisSeverity'].index.tolist() == [3, 3, 1, 1, 1, 2]
+    assert cohort['CrisisSeverity']['severity'].tolist() == [2, 1, 2, 3, 1, 1]
+    assert cohort['CrisisPlanEventFeatures'].index.get_level_values('anonymous_pat_id').unique().tolist() == patients
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_features_run_after_the_features_they_depend_on(n_jobs):
+    runs = []
+    features = [counter('D', 'B', 'C', runs=runs), counter('C', 'A', runs=runs), counter('B', 'A', runs=runs),
+                counter('A', runs=runs), counter('E', 'Upstream', runs=runs)]
+
+    outputs = Pipeline(features=features, n_jobs=n_jobs).transform({'Upstream': 10})
+
+    assert outputs == {'D': 5, 'C': 2, 'B': 2, 'A': 1, 'E': 11}
+    assert sorted(runs) == ['A', 'B', 'C', 'D', 'E']
+    assert runs.index('A') < min(runs.index('B'), runs.index('C')) and runs.index('D') == max(
+        runs.index(name) for name in 'ABCD')
+
+
+def test_outputs_only_run_the_requested_features_and_their_upstream_features():
+    runs = []
+    features = [counter('A', runs=runs), counter('B', 'A', runs=runs), counter('C', 'B', runs=runs),
+                counter('D', runs=runs)]
+
+    outputs = Pipeline(features=features).transform({}, outputs=['B'])
+
+    assert outputs == {'B': 2}
+    assert runs == ['A', 'B']
+
+
+def test_unknown_outputs_raise():
+    with pytest.raises(SchemaException, match='Z is not a feature of the pipeline'):
+        Pipeline(features=[counter('A')]).transform({}, outputs=['Z'])
+
+
+def test_a_dependency_that_is_neither_a_feature_nor_passed_raises():
+    runs = []
+
+    with pytest.raises(SchemaException, match='Upstream DataFrame not passed to B'):
+        Pipeline(features=[counter('A', runs=runs), counter('B', 'Upstream', runs=runs)]).transform({})
+    assert runs == []
+
+
+def test_circular_dependencies_raise():
+    runs = []
+    features = [counter('A', runs=runs), counter('B', 'A', 'C', runs=runs), counter('C', 'B', runs=runs)]
+
+    with pytest.raises(SchemaException, match='Circular dependency between B, C'):
+        Pipeline(features=features).transform({})
+    assert runs == ['A']
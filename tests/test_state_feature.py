@@ -0,0 +1,36 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from crisis_prediction.features.state_feature import StateFeature
+
+
+def test_states_are_extended_to_every_week_of_their_interval_until_end_date():
+    states = pd.DataFrame({'value': [1, 2, 3, 4]}, index=pd.MultiIndex.from_arrays([
+        [1, 1, 2, 2],
+        pd.to_datetime(['2019-01-02', '2019-01-29', '2019-01-22', '2019-03-04']),
+        pd.to_datetime(['2019-01-16', '2020-03-01', '2019-01-23', '2019-03-10'])]))
+    first_known_dates = pd.Series({1: datetime.date(2019, 1, 1), 2: datetime.date(2019, 1, 1)})
+
+    features = StateFeature(end_date=datetime.date(2019, 2, 6)).state_stats_per_week_batch(states, first_known_dates)
+
+    assert features.index.tolist() == [(1, 2019, week) for week in range(1, 7)] + [
+        (2, 2019, week) for week in list(range(1, 7)) + [10]]
+    np.testing.assert_array_equal(features['value'], [1, 1, 1, np.nan, 2, 2] + [np.nan] * 3 + [3, np.nan, np.nan, 4])
+
+
+def test_a_batch_equals_the_concatenation_of_its_patients():
+    states = pd.DataFrame({'value': [1, 2, 3]}, index=pd.MultiIndex.from_arrays([
+        [1, 2, 2], pd.to_datetime(['2018-12-20', '2019-01-08', '2019-01-30']),
+        pd.to_datetime(['2019-01-10', '2019-01-08', '2019-02-20'])]))
+    feature = StateFeature(end_date=datetime.date(2019, 2, 11))
+    first_known_dates = pd.Series({1: datetime.date(2018, 12, 1), 2: datetime.date(2019, 1, 1)})
+
+    features = feature.state_stats_per_week_batch(states, first_known_dates)
+
+    pd.testing.assert_frame_equal(features, pd.concat([
+        feature.state_stats_per_week(states.loc[[patient]], first_known_date)
+        for patient, first_known_date in first_known_dates.items()]))
+    assert features.loc[1, 'value'].dropna().index.tolist() == [(2018, 51), (2018, 52), (2019, 1), (2019, 2)]
+    np.testing.assert_array_equal(features.loc[2, 'value'], [np.nan, 2, np.nan, np.nan, 3, 3, 3])
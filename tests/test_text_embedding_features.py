@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+from crisis_prediction.features.text_embedding.text_embedding_features import TextEmbeddingFeatures  # noqa: E402
+
+WORDS = ['the', 'patient', 'was', 'seen', 'today', 'and', 'felt', 'better', 'low', 'mood', 'sleep', 'poor', 'plan',
+         'review', 'call', 'next', 'week']
+TEXTS = ['the patient was seen today', 'low mood', '', 'the patient felt better and the plan was reviewed',
+         ' '.join(WORDS * 3), 'low mood', 'poor sleep']
+
+
+@pytest.fixture(scope='module')
+def model_name(tmp_path_factory):
+    """A randomly initialised DistilBERT small enough to run in the tests and its tokenizer."""
+    path = tmp_path_factory.mktemp('distilbert')
+    (path / 'vocab.txt').write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + WORDS))
+    transformers.DistilBertTokenizer(str(path / 'vocab.txt')).save_pretrained(str(path))
+    torch.manual_seed(0)
+    config = transformers.DistilBertConfig(vocab_size=5 + len(WORDS), dim=32, hidden_dim=64, n_layers=2, n_heads=2,
+                                           max_position_embeddings=64)
+    transformers.DistilBertModel(config).save_pretrained(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def make_feature(model_name, monkeypatch):
+    monkeypatch.setenv('CUDA_VISIBLE_DEVICES', '')
+
+    def make_feature(**kwargs):
+        return TextEmbeddingFeatures(device_name='cpu', cuda_devices='', model_name=model_name,
+                                     **{'max_length': 16, 'batch_size': 3, **kwargs})
+    return make_feature
+
+
+def embedded_windows(feature, monkeypatch):
+    """Spies bert_batch_embedding and returns the list where the windows it embeds are recorded."""
+    windows, bert_batch_embedding = [], feature.bert_batch_embedding
+
+    def spy(batch_tokens, backend=None):
+        windows.extend(batch_tokens)
+        return bert_batch_embedding(batch_tokens, backend)
+    monkeypatch.setattr(feature, 'bert_batch_embedding', spy)
+    return windows
+
+
+def test_batched_embeddings_equal_the_per_note_mean_of_the_last_hidden_state(make_feature):
+    feature = make_feature()
+
+    embeddings = feature.bert_embeddings(TEXTS)
+
+    with torch.no_grad():
+        expected = np.stack([feature.bert_model(torch.tensor([feature.bert_tokenizer.encode(
+            txt, max_length=feature.max_length, truncation=True)]))[0].numpy().mean(axis=1)[0] for txt in TEXTS])
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_repeated_and_cached_notes_are_not_embedded_again(make_feature, monkeypatch, tmp_path):
+    feature = make_feature(cache_path=str(tmp_path))
+    windows = embedded_windows(feature, monkeypatch)
+
+    embeddings = feature.bert_embeddings(TEXTS)
+    assert len(windows) == len(set(TEXTS))
+
+    del windows[:]
+    np.testing.assert_array_equal(feature.bert_embeddings(TEXTS[::-1]), embeddings[::-1])
+    assert windows == []
+
+    cached_feature = make_feature(cache_path=str(tmp_path))
+    windows = embedded_windows(cached_feature, monkeypatch)
+    np.testing.assert_array_equal(cached_feature.bert_embeddings(TEXTS + ['call next week']),
+                                  np.concatenate([embeddings, feature.bert_embeddings(['call next week'])]))
+    assert len(windows) == 1
+
+
+def test_no_texts_return_an_empty_matrix(make_feature):
+    assert make_feature().bert_embeddings([]).shape == (0, 32)
+
+
+def test_notes_split_in_windows_are_pooled_weighting_each_window_by_its_tokens(make_feature, monkeypatch):
+    feature = make_feature(chunk_overlap=4)
+    windows = embedded_windows(feature, monkeypatch)
+    long_text = ' '.join(WORDS * 3)
+
+    embeddings = feature.bert_embeddings([long_text, 'low mood'])
+
+    note_windows = feature.get_token_windows(long_text)
+    assert len(note_windows) > 1 and sorted(map(tuple, windows)) == sorted(map(tuple, note_windows + [
+        feature.get_token_windows('low mood')[0]]))
+    window_embeddings = np.stack([feature.bert_batch_embedding([tokens])[0] for tokens in note_windows])
+    lengths = np.array([len(tokens) for tokens in note_windows])
+    np.testing.assert_allclose(embeddings[0], (window_embeddings * lengths[:, None]).sum(axis=0) / lengths.sum(),
+                               rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(embeddings[1], make_feature().bert_embeddings(['low mood'])[0], rtol=1e-5, atol=1e-6)
+
+
+def test_the_quantized_backend_stays_close_to_the_fp32_model(make_feature):
+    drift = make_feature(backend='quantized').embedding_drift(TEXTS)
+
+    assert drift['min_cosine_similarity'] > 0.99
+
+
+def test_the_onnx_backend_matches_the_fp32_model(make_feature, tmp_path):
+    pytest.importorskip('onnxruntime')
+    feature = make_feature(backend='onnx', onnx_dir=str(tmp_path))
+
+    drift = feature.embedding_drift(TEXTS)
+
+    assert os.listdir(str(tmp_path)) == [os.path.basename(feature.get_onnx_path(feature.bert_model.name_or_path,
+                                                                                str(tmp_path)))]
+    assert drift['min_cosine_similarity'] > 0.9999 and drift['max_abs_difference'] < 1e-4
+    np.testing.assert_array_equal(make_feature(backend='onnx', onnx_dir=str(tmp_path)).bert_embeddings(TEXTS),
+                                  feature.bert_embeddings(TEXTS))
@@ -0,0 +1,54 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.text_embedding.text_embedding_preprocessor import TextEmbeddingPreprocessor
+
+TEXTS = ['Seen today', '  leading and trailing  ', 'line\nbreak\r\nand\ttab', 'no&nbsp;break&nbsp;&nbsp;space',
+         '<p>Low <b>mood</b></p>', '<br/>', '&nbsp;', '', ' ', 'non\xa0breaking\xa0 space', 'a\x1cb c　d',
+         'zero​width', '<a href="x">link</a>\n\n<i>  </i>', 'unclosed < tag', '&nbsp<b>x</b>&nbsp;']
+
+
+def preprocess_text(txt):
+    """The regex chain the preprocessor used before."""
+    txt = re.sub(r'(&nbsp;)', ' ', txt)
+    txt = re.sub(r'<[^>]*>', ' ', txt)
+    return re.sub(r'\s+', ' ', txt)
+
+
+@pytest.mark.parametrize('txt', TEXTS)
+def test_preprocessing_equals_the_regex_chain(txt):
+    assert TextEmbeddingPreprocessor.preprocess_text(txt) == preprocess_text(txt)
+    assert TextEmbeddingPreprocessor.preprocess_texts(pd.Series([txt])).iloc[0] == preprocess_text(txt)
+
+
+def test_missing_texts_stay_missing():
+    processed = TextEmbeddingPreprocessor.preprocess_texts(pd.Series(['<b>a</b>', np.nan, None]))
+
+    assert processed.iloc[0] == ' a ' and processed.iloc[1:].isna().all()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 4, 100])
+def test_chunked_preprocessing_equals_the_whole_table(chunk_size):
+    notes = pd.DataFrame({'anonymized_text': TEXTS + [np.nan]}, index=np.arange(len(TEXTS) + 1) * 3)
+
+    processed = TextEmbeddingPreprocessor(chunk_size=chunk_size).transform(
+        {'clinical_notes_table': notes.copy()})['clinical_notes_table']
+
+    assert processed.index.equals(notes.index)
+    assert processed['processed_anonymized_text'].tolist()[:-1] == [preprocess_text(txt) for txt in TEXTS]
+    assert pd.isna(processed['processed_anonymized_text'].iloc[-1])
+
+
+def test_iter_processed_chunks_processes_every_chunk_lazily():
+    notes = pd.DataFrame({'anonymized_text': TEXTS})
+    chunks = (notes.iloc[i:i + 4].copy() for i in range(0, len(notes), 4))
+
+    processed_chunks = TextEmbeddingPreprocessor().iter_processed_chunks(chunks)
+
+    first_chunk = next(processed_chunks)
+    assert first_chunk['processed_anonymized_text'].tolist() == [preprocess_text(txt) for txt in TEXTS[:4]]
+    assert pd.concat([first_chunk, *processed_chunks])['processed_anonymized_text'].tolist() == [
+        preprocess_text(txt) for txt in TEXTS]
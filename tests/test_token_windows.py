@@ -0,0 +1,70 @@
+import pytest
+
+from crisis_prediction.features.text_embedding.token_windows import get_token_windows
+
+CLS, SEP = -1, -2
+MAX_LENGTH = 10
+WINDOW_SIZE = MAX_LENGTH - 2
+
+
+class WhitespaceTokenizer:
+    """Tokenizer with the BERT interface that takes every word, an integer, as its token id."""
+
+    def encode(self, txt, add_special_tokens=True, max_length=None, truncation=False):
+        tokens = [int(word) for word in txt.split()]
+        if not add_special_tokens:
+            return tokens
+        if truncation:
+            tokens = tokens[:max_length - self.num_special_tokens_to_add()]
+        return self.build_inputs_with_special_tokens(tokens)
+
+    @staticmethod
+    def num_special_tokens_to_add():
+        return 2
+
+    @staticmethod
+    def build_inputs_with_special_tokens(tokens):
+        return [CLS] + tokens + [SEP]
+
+
+def text(num_tokens):
+    return ' '.join(str(token) for token in range(num_tokens))
+
+
+def test_without_overlap_the_text_is_truncated():
+    assert get_token_windows(WhitespaceTokenizer(), text(20), MAX_LENGTH) == [[CLS] + list(range(8)) + [SEP]]
+
+
+@pytest.mark.parametrize('num_tokens', [0, 1, WINDOW_SIZE - 1, WINDOW_SIZE])
+@pytest.mark.parametrize('chunk_overlap', [0, 3, WINDOW_SIZE - 1])
+def test_a_text_that_fits_in_one_window_gives_the_truncated_tokens(num_tokens, chunk_overlap):
+    tokenizer = WhitespaceTokenizer()
+
+    windows = get_token_windows(tokenizer, text(num_tokens), MAX_LENGTH, chunk_overlap)
+
+    assert windows == get_token_windows(tokenizer, text(num_tokens), MAX_LENGTH)
+    assert windows == [[CLS] + list(range(num_tokens)) + [SEP]]
+
+
+def test_one_token_more_than_the_window_adds_a_window_ending_at_the_last_token():
+    windows = get_token_windows(WhitespaceTokenizer(), text(WINDOW_SIZE + 1), MAX_LENGTH, chunk_overlap=2)
+
+    assert windows == [[CLS] + list(range(0, 8)) + [SEP], [CLS] + list(range(1, 9)) + [SEP]]
+
+
+@pytest.mark.parametrize('num_tokens', range(WINDOW_SIZE + 1, 40))
+@pytest.mark.parametrize('chunk_overlap', [0, 1, 3, WINDOW_SIZE - 1])
+def test_windows_cover_the_text_and_the_last_one_ends_at_the_last_token(num_tokens, chunk_overlap):
+    windows = get_token_windows(WhitespaceTokenizer(), text(num_tokens), MAX_LENGTH, chunk_overlap)
+
+    assert all(len(window) == MAX_LENGTH and window[0] == CLS and window[-1] == SEP for window in windows)
+    starts = [window[1] for window in windows]
+    assert starts[0] == 0 and windows[-1][-2] == num_tokens - 1
+    assert all(0 < step <= WINDOW_SIZE - chunk_overlap for step in [b - a for a, b in zip(starts, starts[1:])])
+    assert all(step == WINDOW_SIZE - chunk_overlap for step in [b - a for a, b in zip(starts[:-1], starts[1:-1])])
+
+
+@pytest.mark.parametrize('chunk_overlap', [-1, WINDOW_SIZE, WINDOW_SIZE + 1])
+def test_overlap_outside_the_window_raises(chunk_overlap):
+    with pytest.raises(ValueError):
+        get_token_windows(WhitespaceTokenizer(), text(20), MAX_LENGTH, chunk_overlap)
@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.valid_users import ValidUsers
+
+
+def days(*dates):
+    return [np.datetime64(date, 'D').astype(np.int64) for date in dates]
+
+
+@pytest.mark.parametrize('first_year_month', [
+    pd.Series(['201503', '199912', '201501']),
+    pd.Series([201503, 199912, 201501]),
+    pd.Series([201503., 199912., 201501.]),
+])
+def test_year_month_to_days_reads_strings_integers_and_floats(first_year_month):
+    np.testing.assert_array_equal(ValidUsers.year_month_to_days(first_year_month),
+                                  days('2015-03-01', '1999-12-01', '2015-01-01'))
+
+
+def test_year_month_to_days_keeps_missing_values_as_nan():
+    year_months = ValidUsers.year_month_to_days(pd.Series([201503., np.nan, None], dtype=object))
+
+    np.testing.assert_array_equal(year_months, days('2015-03-01') + [np.nan, np.nan])
+
+
+def test_transform_returns_the_sorted_ids_of_the_valid_patients():
+    patient_table = pd.DataFrame({'anonymous_pat_id': [7, 3, 5, 1, 9],
+                                  'first_year_month': [201801., 201902., np.nan, 201801., 201801.],
+                                  'month_year_death': [np.nan, np.nan, np.nan, 290012, 201910]})
+    crisis_table = pd.DataFrame({'anonymous_pat_id': [7, 7, 3, 3, 5, 5, 1, 1, 1, 9, 9],
+                                 'event_date': ['2019-01-01', '2019-02-01', '2019-01-01', '2019-02-01', '2019-01-01',
+                                                '2019-02-01', '2019-01-01', '2012-01-01', '2019-02-01', '2019-01-01',
+                                                '2019-02-01']})
+
+    valid_patients = ValidUsers(minimum_num_crisis=2, minimum_num_days=150).transform(
+        {'patient_table': patient_table, 'crisis_table': crisis_table}, end_date=datetime.date(2019, 6, 15))
+
+    assert isinstance(valid_patients, np.ndarray)
+    assert valid_patients.tolist() == [1, 7]
+
+
+def cohort():
+    return {
+        'patient_table': pd.DataFrame({'anonymous_pat_id': [3, 1, 2]}),
+        'crisis_table': pd.DataFrame({'anonymous_pat_id': [1, 2, 3, 1, 3], 'event_date': range(5)}),
+        'crisis_severity': pd.DataFrame({'Severity': [1, 3]}, index=['Contact', 'IP_BedDay']),
+    }
+
+
+def test_prune_tables_keeps_the_rows_of_the_valid_patients_and_the_lookup_tables():
+    data = cohort()
+
+    pruned = ValidUsers.prune_tables(data, np.array([1, 3, 8]))
+
+    assert pruned['patient_table']['anonymous_pat_id'].tolist() == [3, 1]
+    assert pruned['crisis_table']['event_date'].tolist() == [0, 2, 3, 4]
+    assert pruned['crisis_severity'] is data['crisis_severity']
+
+
+@pytest.mark.parametrize('valid_patients', [np.array([], dtype=np.int64), np.array([0, 4, 8])])
+def test_prune_tables_without_valid_patients_in_the_cohort_leaves_the_patient_tables_empty(valid_patients):
+    pruned = ValidUsers.prune_tables(cohort(), valid_patients)
+
+    assert pruned['patient_table'].empty and pruned['crisis_table'].empty
+    assert pruned['crisis_table'].columns.tolist() == ['anonymous_pat_id', 'event_date']
+    assert len(pruned['crisis_severity']) == 2
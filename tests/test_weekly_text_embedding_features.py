@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crisis_prediction.features.text_embedding.weekly_text_embedding_features import WeeklyTextEmbeddingFeatures
+
+END_DATE = datetime.date(2019, 3, 1)
+EMBEDDING_DIM = 4
+
+
+def data():
+    rng = np.random.default_rng(0)
+    notes = pd.DataFrame({'anonymous_pat_id': [1, 1, 1, 1, 2, 2, 2, 2, 3],
+                          'entered_datetime': pd.to_datetime([
+                              '2019-01-02 10:00', '2019-01-06 23:00', '2019-01-03 08:30', '2019-02-20 12:00',
+                              '2019-01-20 09:00', '2019-02-05 11:00', '2019-02-10 17:00', '2019-03-20 10:00',
+                              '2019-01-15 10:00'])})
+    notes['year'] = [date.isocalendar()[0] for date in notes['entered_datetime']]
+    notes['week'] = [date.isocalendar()[1] for date in notes['entered_datetime']]
+    notes['Embeddinganonymized_text'] = list(rng.normal(size=(len(notes), EMBEDDING_DIM)).astype(np.float32))
+    patient_table = pd.DataFrame({'anonymous_pat_id': [1, 2], 'first_year_month': ['201901', '201902']})
+    return {'patient_table': patient_table, 'TextEmbeddingFeatures': notes}
+
+
+def reference_poolings(notes, half_life_days):
+    """Pools the notes of every week with a groupby, the recency weights computed from the weekday of every note."""
+    embeddings = pd.DataFrame(np.stack(notes['Embeddinganonymized_text'].values),
+                              index=pd.MultiIndex.from_frame(notes[['anonymous_pat_id', 'year', 'week']]))
+    weights = 0.5 ** ((6 - notes['entered_datetime'].dt.weekday.values) / half_life_days)
+    weighted = embeddings.mul(weights, axis=0)
+    return {'mean': embeddings.groupby(level=[0, 1, 2]).mean(),
+            'max': embeddings.groupby(level=[0, 1, 2]).max(),
+            'recency': weighted.groupby(level=[0, 1, 2]).sum().div(
+                pd.Series(weights, index=embeddings.index).groupby(level=[0, 1, 2]).sum(), axis=0)}
+
+
+def is_memory_mapped(values):
+    while values is not None and not isinstance(values, np.memmap):
+        values = values.base
+    return values is not None
+
+
+def pooled(features, pooling):
+    return features[['note_embedding_{}_{}'.format(pooling, i) for i in range(EMBEDDING_DIM)]]
+
+
+def test_poolings_equal_the_groupby_of_the_notes_in_the_history():
+    feature = WeeklyTextEmbeddingFeatures(end_date=END_DATE, embedding_dim=EMBEDDING_DIM, dtype=np.float32)
+
+    features = feature.transform(data())
+
+    full_history = feature.create_full_history_batch(pd.Series({1: datetime.date(2019, 1, 1),
+                                                                2: datetime.date(2019, 2, 1)}))
+    assert features.index.equals(full_history.index)
+    notes = data()['TextEmbeddingFeatures']
+    in_history = notes[pd.MultiIndex.from_frame(notes[['anonymous_pat_id', 'year', 'week']]).isin(features.index)]
+    assert len(in_history) == 6
+    for pooling, expected in reference_poolings(in_history, feature.recency_half_life_days).items():
+        weeks_with_notes = pooled(features, pooling).loc[expected.index]
+        np.testing.assert_allclose(weeks_with_notes.to_numpy(), expected.to_numpy(), rtol=1e-5)
+        assert (pooled(features, pooling).drop(index=expected.index).to_numpy() == 0).all()
+    assert features['num_notes'].loc[(1, 2019, 1)] == 3
+    assert features['num_notes'].sum() == 6
+
+
+def test_only_the_requested_poolings_are_computed():
+    features = WeeklyTextEmbeddingFeatures(end_date=END_DATE, poolings=['max'], embedding_dim=EMBEDDING_DIM) \
+        .transform(data())
+
+    assert features.columns.tolist() == ['note_embedding_max_{}'.format(i) for i in range(EMBEDDING_DIM)] + [
+        'num_notes']
+    assert pooled(features, 'max').dtypes.unique().tolist() == [np.float16]
+
+
+def test_unknown_poolings_raise():
+    with pytest.raises(ValueError):
+        WeeklyTextEmbeddingFeatures(end_date=END_DATE, poolings=['median'], embedding_dim=EMBEDDING_DIM) \
+            .transform(data())
+
+
+def test_weeks_without_notes_are_zero():
+    notes = data()['TextEmbeddingFeatures'].iloc[:0]
+
+    features = WeeklyTextEmbeddingFeatures(end_date=END_DATE, embedding_dim=EMBEDDING_DIM).transform(
+        {**data(), 'TextEmbeddingFeatures': notes})
+
+    assert len(features) == 14 and (features.to_numpy() == 0).all()
+
+
+def test_save_and_load_round_trip_memory_mapped(tmp_path):
+    features = WeeklyTextEmbeddingFeatures(end_date=END_DATE, embedding_dim=EMBEDDING_DIM).transform(data())
+
+    WeeklyTextEmbeddingFeatures.save(features, str(tmp_path))
+    loaded = WeeklyTextEmbeddingFeatures.load(str(tmp_path))
+
+    pd.testing.assert_frame_equal(loaded, features, check_index_type=False)
+    embeddings = loaded.drop(columns='num_notes')
+    assert (embeddings.dtypes == np.float16).all()
+    assert all(is_memory_mapped(loaded[column].values) for column in embeddings.columns)